@@ -1,7 +1,15 @@
 import type { NextConfig } from "next";
 
 const nextConfig: NextConfig = {
-  /* config options here */
+  // objects in the part store are named by their content hash and never rewritten; the manifest is not matched
+  async headers() {
+    return [
+      {
+        source: "/store/:object([0-9a-f]{64}\\.(?:glb|json))",
+        headers: [{ key: "Cache-Control", value: "public, max-age=31536000, immutable" }],
+      },
+    ];
+  },
 };
 
 export default nextConfig;
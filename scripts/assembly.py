@@ -0,0 +1,233 @@
+import os
+import json
+
+import numpy as np
+
+from catalog import CATALOG_PATH, GLB_DIR, catalog_row, load_catalog
+from collision import euler_matrix, strip_glb
+from compression import ARRAY_BUFFER, _BufferBuilder, _mesh_instances, read_glb, write_glb
+from utils import atomic_output
+
+# the viewer's colours, so an exported robot looks the way it did on the page
+PART_COLOR = [0x70 / 255, 0x80 / 255, 0x90 / 255, 1.0]
+WHEEL_COLOR = [0.0, 0.0, 0.0, 1.0]
+MM_TO_M = 0.001  # parts are modelled in mm; glTF units are metres
+
+# tolerance for treating a part's per-instance matrix as translation * rotation * scale with no shear
+TRS_TOLERANCE = 1e-5
+
+
+def placement_matrix(position, rotation):
+    matrix = np.eye(4)
+    matrix[:3, :3] = euler_matrix(rotation)
+    matrix[:3, 3] = position
+    return matrix
+
+
+def instance_matrix(instance):
+    # an instance's base GLB, stretched along the instance axis for length-series parts (as in the viewer)
+    matrix = np.eye(4)
+    if instance and instance["axis"] is not None:
+        matrix[instance["axis"], instance["axis"]] = instance["scale"]
+        matrix[instance["axis"], 3] = instance["offset"]
+    return matrix
+
+
+def quaternion(rotation):
+    # (x, y, z, w) of a proper rotation matrix
+    m = rotation
+    trace = m[0, 0] + m[1, 1] + m[2, 2]
+    if trace > 0:
+        s = 2 * np.sqrt(trace + 1)
+        q = [(m[2, 1] - m[1, 2]) / s, (m[0, 2] - m[2, 0]) / s, (m[1, 0] - m[0, 1]) / s, s / 4]
+    elif m[0, 0] > m[1, 1] and m[0, 0] > m[2, 2]:
+        s = 2 * np.sqrt(1 + m[0, 0] - m[1, 1] - m[2, 2])
+        q = [s / 4, (m[0, 1] + m[1, 0]) / s, (m[0, 2] + m[2, 0]) / s, (m[2, 1] - m[1, 2]) / s]
+    elif m[1, 1] > m[2, 2]:
+        s = 2 * np.sqrt(1 + m[1, 1] - m[0, 0] - m[2, 2])
+        q = [(m[0, 1] + m[1, 0]) / s, s / 4, (m[1, 2] + m[2, 1]) / s, (m[0, 2] - m[2, 0]) / s]
+    else:
+        s = 2 * np.sqrt(1 + m[2, 2] - m[0, 0] - m[1, 1])
+        q = [(m[0, 2] + m[2, 0]) / s, (m[1, 2] + m[2, 1]) / s, s / 4, (m[1, 0] - m[0, 1]) / s]
+    return np.array(q) / np.linalg.norm(q)
+
+
+def decompose(matrix):
+    # (translation, quaternion, scale), or None when the matrix shears; EXT_mesh_gpu_instancing only carries TRS
+    linear = matrix[:3, :3]
+    scale = np.linalg.norm(linear, axis=0)
+    if np.any(scale <= 0):
+        return None
+    rotation = linear / scale
+    if not np.allclose(rotation.T @ rotation, np.eye(3), atol=TRS_TOLERANCE) or np.linalg.det(rotation) < 0:
+        return None
+    return matrix[:3, 3], quaternion(rotation), scale
+
+
+def part_source(catalog, name, lod):
+    # (GLB path, instance) for a part at the requested LOD level; the cheapest level stands in for missing ones
+    row = catalog_row(catalog, name) if catalog else None
+    if not row or not row["lods"]:
+        return os.path.join(GLB_DIR, f"{name}.glb"), None
+    lods = row["lods"]
+    chosen = next((l for l in lods if l["level"] == lod), lods[-1])
+    return os.path.join(GLB_DIR, chosen["file"]), row.get("instance")
+
+
+class _Assembly:
+    def __init__(self):
+        self.builder = _BufferBuilder()
+        self.meshes = []
+        self.sources = {}  # (GLB path, material) -> [(mesh index, matrix within the source scene)]
+        self.extensions = set()  # required by the source GLBs, e.g. KHR_mesh_quantization
+
+    def add_instance_attribute(self, values):
+        # per-instance data is not a vertex attribute, so its bufferView must not declare a target
+        accessor = self.builder.add(np.array(values, dtype=np.float32), ARRAY_BUFFER)
+        del self.builder.views[-1]["target"]
+        return accessor
+
+    def add_source(self, path, material):
+        # copies a GLB's buffers and meshes in once; every placement of it then refers to the same meshes
+        key = (path, material)
+        if key in self.sources:
+            return self.sources[key]
+
+        gltf, binary = read_glb(path)
+        if "EXT_meshopt_compression" in gltf.get("extensionsUsed", []):
+            raise Exception(f"{path} is meshopt-compressed; rebuild it with MESHOPT_COMPRESSION off to assemble it")
+        self.extensions |= set(gltf.get("extensionsRequired", []))
+
+        view_base = len(self.builder.views)
+        for view in gltf.get("bufferViews", []):
+            data = binary[view.get("byteOffset", 0) : view.get("byteOffset", 0) + view["byteLength"]]
+            copied = {**view, "buffer": 0, "byteOffset": len(self.builder.binary)}
+            self.builder.binary += data + b"\0" * (-len(data) % 4)
+            self.builder.views.append(copied)
+
+        accessor_base = len(self.builder.accessors)
+        for accessor in gltf.get("accessors", []):
+            if "bufferView" not in accessor or "sparse" in accessor:
+                raise Exception(f"{path}: only dense, buffer-backed accessors can be assembled")
+            self.builder.accessors.append({**accessor, "bufferView": accessor["bufferView"] + view_base})
+
+        mesh_base = len(self.meshes)
+        for mesh in gltf.get("meshes", []):
+            primitives = []
+            for primitive in mesh["primitives"]:
+                copied = {
+                    "attributes": {k: v + accessor_base for k, v in primitive["attributes"].items()},
+                    "material": material,
+                }
+                if "indices" in primitive:
+                    copied["indices"] = primitive["indices"] + accessor_base
+                if "mode" in primitive:
+                    copied["mode"] = primitive["mode"]
+                primitives.append(copied)
+            self.meshes.append({"primitives": primitives})
+
+        self.sources[key] = [(mesh_base + mesh, matrix) for mesh, matrix in _mesh_instances(gltf)]
+        return self.sources[key]
+
+
+def assemble(parts, lod=0, catalog_path=CATALOG_PATH, gpu_instancing=True):
+    # Parts are the route's placements (name, position in mm, rotation in radians, XYZ order), each optionally
+    # with its own "lod". Every distinct part GLB is stored once; with gpu_instancing all placements of a mesh
+    # become one EXT_mesh_gpu_instancing node, which three.js draws as a single InstancedMesh
+    catalog = load_catalog(catalog_path) if os.path.exists(catalog_path) else None
+    assembly = _Assembly()
+    placements = {}  # mesh index -> [world matrix]
+
+    for part in parts:
+        name = strip_glb(part["name"])
+        path, instance = part_source(catalog, name, part.get("lod", lod))
+        material = 1 if "Wheel" in name else 0
+        transform = placement_matrix(part["position"], part["rotation"]) @ instance_matrix(instance)
+        for mesh, matrix in assembly.add_source(path, material):
+            placements.setdefault(mesh, []).append(transform @ matrix)
+
+    nodes = []
+    draw_calls = 0
+    for mesh, matrices in placements.items():
+        primitives = len(assembly.meshes[mesh]["primitives"])
+        trs = [decompose(m) for m in matrices] if gpu_instancing else [None]
+        if gpu_instancing and all(t is not None for t in trs):
+            attributes = {
+                "TRANSLATION": assembly.add_instance_attribute([t[0] for t in trs]),
+                "ROTATION": assembly.add_instance_attribute([t[1] for t in trs]),
+                "SCALE": assembly.add_instance_attribute([t[2] for t in trs]),
+            }
+            nodes.append({"mesh": mesh, "extensions": {"EXT_mesh_gpu_instancing": {"attributes": attributes}}})
+            draw_calls += primitives
+        else:
+            # plain node instancing: still one copy of the mesh, but a draw call per placement
+            for m in matrices:
+                nodes.append({"mesh": mesh, "matrix": m.T.reshape(-1).tolist()})
+                draw_calls += primitives
+
+    root = {"name": "robot", "scale": [MM_TO_M] * 3, "children": list(range(1, len(nodes) + 1))}
+    gltf = {
+        "asset": {"version": "2.0", "generator": "AutoFTC assembly.py"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [root] + nodes,
+        "meshes": assembly.meshes,
+        "materials": [
+            {"name": "part", "pbrMetallicRoughness": {"baseColorFactor": PART_COLOR, "metallicFactor": 0.3}},
+            {"name": "wheel", "pbrMetallicRoughness": {"baseColorFactor": WHEEL_COLOR, "metallicFactor": 0.0}},
+        ],
+        "accessors": assembly.builder.accessors,
+        "bufferViews": assembly.builder.views,
+        "buffers": [{"byteLength": len(assembly.builder.binary)}],
+    }
+
+    used = set(assembly.extensions)
+    if any("extensions" in node for node in nodes):
+        used.add("EXT_mesh_gpu_instancing")
+    if used:
+        gltf["extensionsUsed"] = sorted(used)
+        gltf["extensionsRequired"] = sorted(used)
+
+    report = {
+        "parts": len(parts),
+        "distinct_glbs": len({path for path, _ in assembly.sources}),
+        "meshes": len(assembly.meshes),
+        "draw_calls": draw_calls,
+        "separate_draw_calls": sum(len(assembly.meshes[m]["primitives"]) * len(ms) for m, ms in placements.items()),
+    }
+    return gltf, bytes(assembly.builder.binary), report
+
+
+def write_assembly(parts, output_path, lod=0, catalog_path=CATALOG_PATH, gpu_instancing=True):
+    gltf, binary, report = assemble(parts, lod, catalog_path, gpu_instancing)
+    with atomic_output(output_path) as tmp_path:
+        write_glb(tmp_path, gltf, binary)
+    report["bytes"] = os.path.getsize(output_path)
+    return report
+
+
+def load_placements(path):
+    # a bare list of placed parts, or the {"parts": [...]} / {"placed": [...]} wrappers the services use
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("parts") or data.get("placed") or []
+    return data
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export a placed-part list as one instanced GLB")
+    parser.add_argument("placements", help="JSON list of parts in the route's format (name, position, rotation)")
+    parser.add_argument("-o", "--output", default="./robot.glb")
+    parser.add_argument("--lod", type=int, default=0, help="LOD level for parts that don't pick their own")
+    parser.add_argument("--no-gpu-instancing", action="store_true", help="one node per placement instead")
+    args = parser.parse_args()
+
+    report = write_assembly(load_placements(args.placements), args.output, args.lod, gpu_instancing=not args.no_gpu_instancing)
+    print(
+        f"Saved {args.output}: {report['parts']} parts from {report['distinct_glbs']} GLBs, "
+        f"{report['draw_calls']} draw calls (vs {report['separate_draw_calls']} as separate parts), "
+        f"{report['bytes'] / 1e6:.2f}MB"
+    )
@@ -0,0 +1,284 @@
+import os
+import json
+import glob
+import time
+import traceback
+import multiprocessing as mp
+from collections import deque
+from multiprocessing.connection import wait
+
+import metrics
+from utils import atomic_write_json, file_sha256, load_json
+
+MODELS_DIR = "./models"
+QUARANTINE_PATH = "./quarantine.json"
+
+FILE_TIMEOUT = 600.0  # seconds a single file may take before its worker is killed
+MAX_ATTEMPTS = 2  # attempts per file when its worker crashes or hangs
+MAX_TASKS_PER_WORKER = 200  # recycle workers so long OCC runs don't accumulate leaked memory
+MEMORY_CHECK_INTERVAL = 1.0  # seconds between worker RSS checks when a memory ceiling is set
+
+
+def find_step_files(models_dir=MODELS_DIR):
+    step_files = glob.glob(os.path.join(models_dir, "*.step")) + glob.glob(
+        os.path.join(models_dir, "*.STEP")
+    )
+    # dedupe for case-insensitive filesystems, where both globs match the same file
+    return sorted(set(step_files))
+
+
+def _run_one(job):
+    process, filepath = job
+    start = time.perf_counter()
+    metrics.begin(filepath)
+    try:
+        outputs = process(filepath)
+        result = {"file": filepath, "ok": True, "outputs": outputs}
+    except Exception as e:
+        result = {
+            "file": filepath,
+            "ok": False,
+            "error": f"{type(e).__name__}: {e}",
+            "traceback": traceback.format_exc(),
+        }
+    result["seconds"] = time.perf_counter() - start
+    result["metrics"] = metrics.finish(result["seconds"])
+    result["metrics"]["ok"] = result["ok"]
+    return result
+
+
+def _worker_main(conn):
+    while True:
+        job = conn.recv()
+        if job is None:
+            return
+        conn.send(_run_one(job))
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.job = None
+        self.tasks = 0
+
+    def start_job(self, job, timeout):
+        self.job = job
+        self.tasks += 1
+        self.started = time.perf_counter()
+        self.deadline = self.started + timeout
+        self.conn.send(job[:2])
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    # Every file runs in a child process, so an OCC segfault or hang costs one worker and one
+    # attempt instead of the whole run. `process` must be a module-level function so it pickles by
+    # reference: each worker imports its module (and therefore OCC/Open3D) once and handles many files
+    def __init__(self, workers=None, timeout=FILE_TIMEOUT, max_attempts=MAX_ATTEMPTS, memory_limit=None):
+        self.context = mp.get_context()
+        self.size = max(1, workers or os.cpu_count() or 1)
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        # MB of RSS a worker may reach before it is killed, so several big files can't exhaust the machine together
+        self.memory_limit = memory_limit
+        self.workers = []
+        self.pending = deque()
+
+    def submit(self, process, filepath):
+        self.pending.append((process, filepath, 1))
+
+    def busy(self):
+        return bool(self.pending) or any(w.job for w in self.workers)
+
+    def _dispatch(self):
+        # retire workers that hit their task limit, then hand pending jobs to idle workers
+        for w in [w for w in self.workers if not w.job and w.tasks >= MAX_TASKS_PER_WORKER]:
+            w.stop()
+            self.workers.remove(w)
+        while self.pending and len(self.workers) < self.size:
+            self.workers.append(_Worker(self.context))
+        for w in self.workers:
+            if not self.pending:
+                break
+            if not w.job:
+                w.start_job(self.pending.popleft(), self.timeout)
+
+    def _abandon(self, w, reason):
+        process, filepath, attempt = w.job
+        seconds = time.perf_counter() - w.started
+        w.kill()
+        self.workers.remove(w)
+
+        if attempt < self.max_attempts:
+            print(f"Retrying {os.path.basename(filepath)} after worker {reason} (attempt {attempt + 1}/{self.max_attempts})")
+            self.pending.append((process, filepath, attempt + 1))
+            return None
+
+        return {
+            "file": filepath,
+            "ok": False,
+            "crashed": True,
+            "error": f"worker {reason} on all {attempt} attempts",
+            "seconds": seconds,
+            "metrics": {"file": filepath, "ok": False, "stages": {}, "seconds": round(seconds, 4), "input_bytes": 0},
+        }
+
+    def poll(self, timeout=1.0):
+        self._dispatch()
+        active = [w for w in self.workers if w.job]
+        if not active:
+            return []
+
+        now = time.perf_counter()
+        if self.memory_limit:
+            timeout = min(timeout, MEMORY_CHECK_INTERVAL)
+        wait_for = max(0.0, min([timeout] + [w.deadline - now for w in active]))
+        ready = wait([w.conn for w in active] + [w.process.sentinel for w in active], timeout=wait_for)
+
+        results = []
+        for w in active:
+            result = None
+            if w.conn in ready or w.conn.poll():
+                try:
+                    result = w.conn.recv()
+                    w.job = None
+                except (EOFError, OSError):
+                    w.process.join()
+                    result = self._abandon(w, f"crashed (exit code {w.process.exitcode})")
+            elif w.process.sentinel in ready:
+                w.process.join()
+                result = self._abandon(w, f"crashed (exit code {w.process.exitcode})")
+            elif time.perf_counter() > w.deadline:
+                result = self._abandon(w, f"timed out after {self.timeout:.0f}s")
+            elif self.memory_limit and (metrics.rss_mb(w.process.pid) or 0) > self.memory_limit:
+                result = self._abandon(w, f"exceeded its {self.memory_limit:.0f}MB memory ceiling")
+            if result:
+                results.append(result)
+        return results
+
+    def close(self):
+        for w in self.workers:
+            if w.job:
+                w.kill()
+            else:
+                w.stop()
+        self.workers = []
+
+
+def load_quarantine(path=QUARANTINE_PATH):
+    return load_json(path, default={})
+
+
+def quarantined_files(step_files, quarantine):
+    # an entry only holds while the file is unchanged; a fixed or replaced STEP gets another chance
+    return {f for f in step_files if f in quarantine and quarantine[f]["hash"] == file_sha256(f)}
+
+
+def print_summary(results, elapsed):
+    failures = [r for r in results if not r["ok"]]
+    print(f"\nConverted {len(results) - len(failures)}/{len(results)} parts in {elapsed:.1f}s")
+    for r in failures:
+        print(f"  FAILED {os.path.basename(r['file'])}: {r['error']}")
+
+
+def run_batch(
+    step_files,
+    process,
+    workers=None,
+    timeout=FILE_TIMEOUT,
+    max_attempts=MAX_ATTEMPTS,
+    retry_quarantined=False,
+    memory_limit=None,
+    metrics_path=metrics.METRICS_PATH,
+    quarantine_path=QUARANTINE_PATH,
+):
+    quarantine = load_quarantine(quarantine_path)
+    skipped = set() if retry_quarantined else quarantined_files(step_files, quarantine)
+    if skipped:
+        print(f"Skipping {len(skipped)} quarantined files (pass --retry-quarantined to try them again)")
+    jobs = [f for f in step_files if f not in skipped]
+
+    start = time.perf_counter()
+    results = [
+        {"file": f, "ok": False, "quarantined": True, "error": f"quarantined: {quarantine[f]['error']}"}
+        for f in sorted(skipped)
+    ]
+    done = []
+    # records are written by this process as results stream in, so workers never contend for the file
+    metrics_log = metrics.open_log(metrics_path) if metrics_path else None
+
+    def collect(result):
+        done.append(result)
+        if metrics_log:
+            metrics_log.write(json.dumps(result["metrics"]) + "\n")
+
+        elapsed = time.perf_counter() - start
+        remaining = elapsed / len(done) * (len(jobs) - len(done))
+        status = "ok" if result["ok"] else "FAILED"
+        print(
+            f"[{len(done)}/{len(jobs)}] {os.path.basename(result['file'])} {status} "
+            f"({result['seconds']:.1f}s, ~{remaining:.0f}s left)"
+        )
+
+        if result.get("crashed"):
+            quarantine[result["file"]] = {"hash": file_sha256(result["file"]), "error": result["error"]}
+            atomic_write_json(quarantine_path, quarantine, indent=2, sort_keys=True)
+            print(f"Quarantined {result['file']}")
+        elif result["ok"] and quarantine.pop(result["file"], None):
+            atomic_write_json(quarantine_path, quarantine, indent=2, sort_keys=True)
+
+    pool = WorkerPool(min(workers or os.cpu_count() or 1, max(1, len(jobs))), timeout, max_attempts, memory_limit)
+    try:
+        for filepath in jobs:
+            pool.submit(process, filepath)
+        while pool.busy():
+            for result in pool.poll():
+                collect(result)
+    finally:
+        pool.close()
+
+    elapsed = time.perf_counter() - start
+    if metrics_log:
+        metrics_log.close()
+        metrics.report([r["metrics"] for r in done])
+    results += done
+    print_summary(results, elapsed)
+    return results
+
+
+def make_parser(description):
+    import argparse
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("files", nargs="*", help="STEP files to convert (default: every file in ./models)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=FILE_TIMEOUT, help="seconds per file before its worker is killed")
+    parser.add_argument("--retry-quarantined", action="store_true", help="also convert files that crashed or hung before")
+    parser.add_argument("--max-memory", type=float, default=None, help="MB of RSS per worker before it is killed (default: no limit)")
+    return parser
+
+
+def batch_options(args):
+    return {
+        "workers": args.workers,
+        "timeout": args.timeout,
+        "retry_quarantined": args.retry_quarantined,
+        "memory_limit": args.max_memory,
+    }
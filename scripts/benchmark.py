@@ -0,0 +1,254 @@
+import os
+import sys
+import json
+import subprocess
+import math
+import shutil
+import platform
+import tempfile
+import statistics
+import time
+
+from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox, BRepPrimAPI_MakeCylinder, BRepPrimAPI_MakePrism
+from OCC.Core.BRepAlgoAPI import BRepAlgoAPI_Cut, BRepAlgoAPI_Fuse
+from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_MakePolygon, BRepBuilderAPI_MakeFace
+from OCC.Core.STEPControl import STEPControl_Writer, STEPControl_AsIs
+from OCC.Core.IFSelect import IFSelect_RetDone
+from OCC.Core.TopTools import TopTools_ListOfShape
+from OCC.Core.gp import gp_Pnt, gp_Vec, gp_Ax2, gp_Dir
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(SCRIPTS_DIR, "benchmark_baseline.json")
+
+HOLE_PITCH = 24.0  # mm, goBILDA pattern
+HOLE_DIAMETER = 4.0
+REGRESSION_THRESHOLD = 1.25  # a case is a regression when it is this much slower than its baseline
+
+
+def cut_all(shape, tools):
+    # one boolean with every tool is far cheaper than one cut per hole
+    arguments = TopTools_ListOfShape()
+    arguments.Append(shape)
+    tool_list = TopTools_ListOfShape()
+    for tool in tools:
+        tool_list.Append(tool)
+    cut = BRepAlgoAPI_Cut()
+    cut.SetArguments(arguments)
+    cut.SetTools(tool_list)
+    cut.Build()
+    return cut.Shape()
+
+
+def hole(x, y, z, height, direction=(0, 0, 1)):
+    axis = gp_Ax2(gp_Pnt(x, y, z), gp_Dir(*direction))
+    return BRepPrimAPI_MakeCylinder(axis, HOLE_DIAMETER / 2, height).Shape()
+
+
+def make_grid_plate(rows, cols, thickness=2.5):
+    width, height = cols * HOLE_PITCH, rows * HOLE_PITCH
+    plate = BRepPrimAPI_MakeBox(width, height, thickness).Shape()
+    holes = [
+        hole((c + 0.5) * HOLE_PITCH, (r + 0.5) * HOLE_PITCH, -1, thickness + 2)
+        for r in range(rows)
+        for c in range(cols)
+    ]
+    return cut_all(plate, holes)
+
+
+def make_channel(hole_count, size=48.0, wall=2.5):
+    length = hole_count * HOLE_PITCH
+    outer = BRepPrimAPI_MakeBox(size, length, size).Shape()
+    inner = BRepPrimAPI_MakeBox(gp_Pnt(wall, -1, wall), size - 2 * wall, length + 2, size).Shape()
+    channel = BRepAlgoAPI_Cut(outer, inner).Shape()
+    holes = [hole(size / 2, (i + 0.5) * HOLE_PITCH, -1, wall + 2) for i in range(hole_count)]
+    holes += [hole(-1, (i + 0.5) * HOLE_PITCH, size / 2, size + 2, (1, 0, 0)) for i in range(hole_count)]
+    return cut_all(channel, holes)
+
+
+def make_gear(teeth, module=0.8, width=8.0, bore=8.0):
+    pitch_radius = module * teeth / 2
+    outer, root = pitch_radius + module, pitch_radius - 1.25 * module
+    polygon = BRepBuilderAPI_MakePolygon()
+    # trapezoidal teeth: four profile points per tooth
+    for i in range(teeth):
+        base = 2 * math.pi * i / teeth
+        step = 2 * math.pi / teeth
+        for angle, radius in ((0.0, root), (0.2, outer), (0.5, outer), (0.7, root)):
+            polygon.Add(gp_Pnt(radius * math.cos(base + angle * step), radius * math.sin(base + angle * step), 0))
+    polygon.Close()
+    face = BRepBuilderAPI_MakeFace(polygon.Wire()).Face()
+    gear = BRepPrimAPI_MakePrism(face, gp_Vec(0, 0, width)).Shape()
+    hub = BRepPrimAPI_MakeCylinder(gp_Ax2(gp_Pnt(0, 0, width), gp_Dir(0, 0, 1)), bore, width / 2).Shape()
+    gear = BRepAlgoAPI_Fuse(gear, hub).Shape()
+    return cut_all(gear, [hole(0, 0, -1, width * 2)])
+
+
+# name -> builder, ordered by rough complexity
+CASES = {
+    "plate_3x5": lambda: make_grid_plate(3, 5),
+    "plate_9x15": lambda: make_grid_plate(9, 15),
+    "plate_15x25": lambda: make_grid_plate(15, 25),
+    "channel_5h": lambda: make_channel(5),
+    "channel_17h": lambda: make_channel(17),
+    "channel_41h": lambda: make_channel(41),
+    "gear_24t": lambda: make_gear(24),
+    "gear_72t": lambda: make_gear(72),
+    "gear_144t": lambda: make_gear(144),
+}
+
+
+def write_step(shape, path):
+    writer = STEPControl_Writer()
+    writer.Transfer(shape, STEPControl_AsIs)
+    if writer.Write(path) != IFSelect_RetDone:
+        raise Exception(f"Failed to write STEP file: {path}")
+
+
+def timed(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def cold_start_seconds(module, repeats):
+    # a fresh interpreter per sample, as a pool worker or a CLI invocation would pay it
+    def start():
+        subprocess.run([sys.executable, "-c", f"import {module}"], cwd=SCRIPTS_DIR, check=True)
+
+    return timed(start, repeats)
+
+
+def run_benchmarks(cases, repeats=3):
+    unknown = [name for name in cases if name not in CASES]
+    if unknown:
+        raise ValueError(f"Unknown benchmark cases: {', '.join(unknown)} (valid cases: {', '.join(CASES)})")
+
+    # the pipeline writes into ./glb, ./serialized and caches relative to the working directory
+    workspace = tempfile.mkdtemp(prefix="autoftc-bench-")
+    cwd = os.getcwd()
+    os.chdir(workspace)
+    try:
+        import open3d as o3d
+
+        import serialize_and_reduce
+        import reduce
+        from decimation import search_decimation
+        from compression import read_glb_arrays
+        from meshdata import arrays_to_mesh, shape_to_arrays
+
+        results = {
+            "cold_start": {
+                "seconds": {
+                    f"import {module}": round(cold_start_seconds(module, repeats), 4)
+                    for module in ("serialize_and_reduce", "serialize")
+                }
+            }
+        }
+        for name in cases:
+            step_path = os.path.join(workspace, f"{name}.step")
+            shape = CASES[name]()
+            write_step(shape, step_path)
+
+            def convert():
+                # keep the feature cache cold so every repeat measures the full extraction
+                shutil.rmtree("./feature_cache", ignore_errors=True)
+                serialize_and_reduce.process_step_file(step_path)
+
+            timings = {"process_step_file": timed(convert, repeats)}
+
+            # the in-memory OCC -> Open3D hand-off against the GLB round trip it replaced, on the same triangulation
+            serialize_and_reduce.mesh_shape(shape, 0.1, serialize_and_reduce.ANGULAR_DEFLECTION)
+            round_trip_path = os.path.join(workspace, "round_trip.glb")
+
+            def glb_round_trip():
+                serialize_and_reduce.write_glb(shape, round_trip_path)
+                o3d.io.read_triangle_mesh(round_trip_path)
+
+            timings["shape_to_arrays"] = timed(lambda: arrays_to_mesh(*shape_to_arrays(shape)), repeats)
+            timings["glb_round_trip"] = timed(glb_round_trip, repeats)
+
+            glb_path = os.path.join(serialize_and_reduce.GLB_DIR, f"{name}.glb")
+            scratch = os.path.join(workspace, "scratch.glb")
+            # the simplifiers read with Open3D, which can't decode the pipeline's quantized GLBs
+            raw_path = os.path.join(workspace, "raw.glb")
+            raw_mesh = arrays_to_mesh(*read_glb_arrays(glb_path))
+            # the viewer's parse cost for the quantized GLB; timed here rather than on every conversion
+            timings["read_glb_arrays"] = timed(lambda: read_glb_arrays(glb_path), repeats)
+            o3d.io.write_triangle_mesh(raw_path, raw_mesh)
+
+            def simplify():
+                shutil.copyfile(raw_path, scratch)
+                serialize_and_reduce.simplify_glb(scratch, serialize_and_reduce.TARGET_TRIANGLES_RATIO)
+
+            timings["simplify_glb"] = timed(simplify, repeats)
+            timings["simplify_glb_vertex_clustering"] = timed(
+                lambda: reduce.simplify_glb_vertex_clustering(raw_path, scratch), repeats
+            )
+            timings["simplify_glb_decimation"] = timed(
+                lambda: reduce.simplify_glb_decimation(raw_path, scratch), repeats
+            )
+            timings["search_decimation"] = timed(lambda: search_decimation(raw_mesh), repeats)
+
+            results[name] = {
+                "step_bytes": os.path.getsize(step_path),
+                "glb_bytes": os.path.getsize(glb_path),
+                "seconds": {k: round(v, 4) for k, v in timings.items()},
+            }
+        return results
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def machine_info():
+    return {"platform": platform.platform(), "processor": platform.processor(), "python": platform.python_version()}
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    if baseline["machine"] != machine_info():
+        print("Note: baseline was recorded on a different machine; ratios are indicative only")
+
+    regressions = []
+    print(f"\n{'case':14s} {'function':32s} {'seconds':>9s} {'baseline':>9s} {'ratio':>7s}")
+    for name, result in results.items():
+        for fn, seconds in result["seconds"].items():
+            base = baseline["results"].get(name, {}).get("seconds", {}).get(fn)
+            ratio = seconds / base if base else None
+            flag = ""
+            if ratio and ratio > threshold:
+                flag = "  REGRESSION"
+                regressions.append((name, fn, ratio))
+            ratio_text = f"{ratio:6.2f}x" if ratio else "      -"
+            base_text = f"{base:8.3f}s" if base else "        -"
+            print(f"{name:14s} {fn:32s} {seconds:8.3f}s {base_text} {ratio_text}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the STEP conversion pipeline on synthetic parts")
+    parser.add_argument("cases", nargs="*", help=f"cases to run (default: all of {', '.join(CASES)})")
+    parser.add_argument("-r", "--repeats", type=int, default=3, help="timed repeats per function (median is kept)")
+    parser.add_argument("--save-baseline", action="store_true", help=f"store these results as {BASELINE_PATH}")
+    args = parser.parse_args()
+    # checked here rather than with choices=, which rejects an empty list of cases on some Python versions
+    unknown = [name for name in args.cases if name not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)} (choose from {', '.join(CASES)})")
+
+    results = run_benchmarks(args.cases or list(CASES), repeats=args.repeats)
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({"machine": machine_info(), "results": results}, f, indent=4)
+        print(f"Saved baseline: {BASELINE_PATH}")
+    elif os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            regressions = compare(results, json.load(f))
+        sys.exit(1 if regressions else 0)
+    else:
+        print(json.dumps(results, indent=4))
@@ -0,0 +1,92 @@
+import os
+
+from batch import run_batch
+from utils import atomic_write_json, file_sha256, json_sha256, load_json
+
+MANIFEST_PATH = "./build_manifest.json"
+
+
+def load_manifest(path=MANIFEST_PATH):
+    return load_json(path, default={"parts": {}})
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    atomic_write_json(path, manifest, indent=2, sort_keys=True)
+
+
+def source_hash(filepath, previous=None):
+    # reuse the stored hash when size and mtime are unchanged, so a no-op rebuild never reads the STEP files
+    stat = os.stat(filepath)
+    if previous and previous.get("size") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns:
+        return previous["hash"], stat
+    return file_sha256(filepath), stat
+
+
+def part_id_for(filepath):
+    return os.path.splitext(os.path.basename(filepath))[0]
+
+
+def plan_build(step_files, manifest, params, force=False):
+    params_hash = json_sha256(params)
+    entries = manifest["parts"]
+    todo = []
+    sources = {}
+
+    for filepath in step_files:
+        pid = part_id_for(filepath)
+        previous = entries.get(pid)
+        digest, stat = source_hash(filepath, previous)
+        sources[filepath] = {
+            "source": filepath,
+            "hash": digest,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "params": params_hash,
+        }
+
+        up_to_date = (
+            previous is not None
+            and previous["hash"] == digest
+            and previous["params"] == params_hash
+            and all(os.path.exists(p) for p in previous.get("outputs", []))
+        )
+        if force or not up_to_date:
+            todo.append(filepath)
+
+    return todo, sources
+
+
+def prune_removed(step_files, manifest):
+    current = {part_id_for(f) for f in step_files}
+    removed = [pid for pid in manifest["parts"] if pid not in current]
+
+    for pid in removed:
+        for path in manifest["parts"][pid].get("outputs", []):
+            if os.path.exists(path):
+                os.remove(path)
+                print(f"Pruned stale output: {path}")
+        del manifest["parts"][pid]
+
+    return removed
+
+
+def record_results(manifest, sources, results):
+    for result in results:
+        if not result["ok"]:
+            continue
+        entry = dict(sources[result["file"]])
+        entry["outputs"] = result.get("outputs") or []
+        manifest["parts"][part_id_for(result["file"])] = entry
+
+
+def incremental_build(step_files, process, params, force=False, prune=True, manifest_path=MANIFEST_PATH, **batch_options):
+    manifest = load_manifest(manifest_path)
+    if prune:
+        prune_removed(step_files, manifest)
+    todo, sources = plan_build(step_files, manifest, params, force=force)
+    print(f"{len(todo)} of {len(step_files)} parts need rebuilding")
+
+    results = run_batch(todo, process, **batch_options) if todo else []
+    record_results(manifest, sources, results)
+    save_manifest(manifest, manifest_path)
+    return results
@@ -0,0 +1,118 @@
+import os
+import json
+import glob
+import struct
+
+from content_store import STORE_DIR, load_store_manifest
+from part_list import condense_part_list
+from utils import atomic_write_json, json_sha256
+
+SERIALIZED_DIR = "./serialized"
+GLB_DIR = "./glb"
+CATALOG_PATH = "./catalog.json"
+
+GLB_MAGIC = 0x46546C67
+JSON_CHUNK = 0x4E4F534A
+GLTF_TRIANGLES = 4
+
+
+def read_glb_json(path):
+    with open(path, "rb") as f:
+        magic, _version, _length = struct.unpack("<III", f.read(12))
+        if magic != GLB_MAGIC:
+            raise Exception(f"Not a GLB file: {path}")
+        chunk_length, chunk_type = struct.unpack("<II", f.read(8))
+        if chunk_type != JSON_CHUNK:
+            raise Exception(f"GLB is missing its JSON chunk: {path}")
+        return json.loads(f.read(chunk_length))
+
+
+def glb_triangle_count(path):
+    # count from the accessor metadata alone; the binary buffer is never read
+    gltf = read_glb_json(path)
+    accessors = gltf.get("accessors", [])
+    triangles = 0
+    for mesh in gltf.get("meshes", []):
+        for primitive in mesh.get("primitives", []):
+            if primitive.get("mode", GLTF_TRIANGLES) != GLTF_TRIANGLES:
+                continue
+            if "indices" in primitive:
+                triangles += accessors[primitive["indices"]]["count"] // 3
+            else:
+                triangles += accessors[primitive["attributes"]["POSITION"]]["count"] // 3
+    return triangles
+
+
+def build_catalog(serialized_dir=SERIALIZED_DIR, glb_dir=GLB_DIR, store_dir=STORE_DIR):
+    # columnar layout: one array per field plus a pid -> row index, so lookups are O(1)
+    columns = {
+        "pid": [],
+        "bs": [],
+        "bc": [],
+        "glb_bytes": [],
+        "triangles": [],
+        "lods": [],
+        "obb": [],
+        "instance": [],
+        "attributes": [],
+        "hole_lattice": [],
+        "store": [],
+    }
+    # the content-addressed names of each part's outputs, when they have been published to the store
+    stored = load_store_manifest(store_dir)["parts"]
+
+    for json_path in sorted(glob.glob(os.path.join(serialized_dir, "*.json"))):
+        with open(json_path) as f:
+            data = json.load(f)
+
+        # LOD 0 is the part's own GLB, or its base's when the part is an instance of shared geometry
+        lods = data.get("lods", [])
+        glb_path = os.path.join(glb_dir, lods[0]["file"] if lods else data["pid"] + ".glb")
+        if not os.path.exists(glb_path):
+            print(f"Skipped {data['pid']}: no GLB at {glb_path}")
+            continue
+
+        columns["pid"].append(data["pid"])
+        columns["bs"].append(data["bs"])
+        columns["bc"].append(data["bc"])
+        columns["glb_bytes"].append(os.path.getsize(glb_path))
+        columns["triangles"].append(glb_triangle_count(glb_path))
+        columns["lods"].append(lods)
+        columns["obb"].append(data.get("obb"))
+        columns["instance"].append(data.get("instance"))
+        columns["attributes"].append(data.get("attributes"))
+        columns["hole_lattice"].append(data.get("hole_lattice"))
+        entry = stored.get(data["pid"])
+        columns["store"].append({"json": entry["json"], "lods": entry["lods"]} if entry else None)
+
+    # the prompt's condensed listing is built once per library here instead of once per page load
+    condensed = condense_part_list(columns["pid"])
+    return {
+        "version": json_sha256({"columns": columns, "condensed": condensed})[:16],
+        "count": len(columns["pid"]),
+        "columns": columns,
+        "condensed": condensed,
+        # doubles as the set of valid part names
+        "index": {pid: row for row, pid in enumerate(columns["pid"])},
+    }
+
+
+def write_catalog(catalog, path=CATALOG_PATH):
+    atomic_write_json(path, catalog, separators=(",", ":"))
+    print(f"Saved catalog of {catalog['count']} parts: {path} (version {catalog['version']})")
+
+
+def load_catalog(path=CATALOG_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def catalog_row(catalog, pid):
+    row = catalog["index"].get(pid)
+    if row is None:
+        return None
+    return {name: values[row] for name, values in catalog["columns"].items()}
+
+
+if __name__ == "__main__":
+    write_catalog(build_catalog())
@@ -0,0 +1,237 @@
+import os
+import json
+import math
+import time
+
+from catalog import CATALOG_PATH, GLB_DIR, catalog_row, load_catalog
+
+# parts closer than this are "touching", which the generator does on purpose to connect them
+CONTACT_TOLERANCE = 0.5  # mm
+GRID_CELL_SIZE = 48.0  # mm, two hole pitches
+COLLISION_PORT = 8765
+
+
+def euler_matrix(rotation):
+    # three.js default "XYZ" order, matching how the viewer applies part.rotation
+    x, y, z = rotation
+    a, b = math.cos(x), math.sin(x)
+    c, d = math.cos(y), math.sin(y)
+    e, f = math.cos(z), math.sin(z)
+    return [
+        [c * e, -c * f, d],
+        [a * f + b * e * d, a * e - b * f * d, -b * c],
+        [b * f - a * e * d, b * e + a * f * d, a * c],
+    ]
+
+
+def transform_box(center, half_extents, rotation, position):
+    # world AABB of an oriented box: |R| maps half extents onto the world axes exactly
+    matrix = euler_matrix(rotation)
+    world_center = [position[i] + sum(matrix[i][j] * center[j] for j in range(3)) for i in range(3)]
+    world_half = [sum(abs(matrix[i][j]) * half_extents[j] for j in range(3)) for i in range(3)]
+    return (
+        [world_center[i] - world_half[i] for i in range(3)],
+        [world_center[i] + world_half[i] for i in range(3)],
+    )
+
+
+def rotated_aabb(obb, rotation, position=(0, 0, 0)):
+    # same as transform_box, with the OBB's own axes folded into the rotation
+    rot = euler_matrix(rotation)
+    axes = obb["axes"]
+    matrix = [[sum(rot[i][k] * axes[j][k] for k in range(3)) for j in range(3)] for i in range(3)]
+    center = obb["center"]
+    half_size = obb["half_size"]
+    world_center = [position[i] + sum(rot[i][j] * center[j] for j in range(3)) for i in range(3)]
+    world_half = [sum(abs(matrix[i][j]) * half_size[j] for j in range(3)) for i in range(3)]
+    return (
+        [world_center[i] - world_half[i] for i in range(3)],
+        [world_center[i] + world_half[i] for i in range(3)],
+    )
+
+
+def part_aabb(part_info, rotation, position):
+    # prefer the tight OBB; older serialized data only has the native-frame AABB
+    if part_info.get("obb"):
+        return rotated_aabb(part_info["obb"], rotation, position)
+    half_extents = [v / 2 for v in part_info["bs"]]
+    return transform_box(part_info["bc"], half_extents, rotation, position)
+
+
+def overlap_depth(a, b):
+    return min(min(a[1][i], b[1][i]) - max(a[0][i], b[0][i]) for i in range(3))
+
+
+class CollisionIndex:
+    # uniform grid over world AABBs; queries only touch the cells a candidate covers
+    def __init__(self, parts_info, cell_size=GRID_CELL_SIZE, tolerance=CONTACT_TOLERANCE):
+        self.parts_info = parts_info
+        self.cell_size = cell_size
+        self.tolerance = tolerance
+        self.cells = {}
+        self.boxes = {}
+        self.placements = {}
+        self._mesh_cache = {}
+
+    def _cell_range(self, box):
+        low = [math.floor(v / self.cell_size) for v in box[0]]
+        high = [math.floor(v / self.cell_size) for v in box[1]]
+        for i in range(low[0], high[0] + 1):
+            for j in range(low[1], high[1] + 1):
+                for k in range(low[2], high[2] + 1):
+                    yield (i, j, k)
+
+    def box_for(self, name, position, rotation):
+        info = self.parts_info(name)
+        if info is None:
+            raise KeyError(f"Unknown part: {name}")
+        return part_aabb(info, rotation, position)
+
+    def insert(self, key, name, position, rotation):
+        box = self.box_for(name, position, rotation)
+        self.boxes[key] = box
+        self.placements[key] = (name, position, rotation)
+        for cell in self._cell_range(box):
+            self.cells.setdefault(cell, set()).add(key)
+        return box
+
+    def remove(self, key):
+        box = self.boxes.pop(key)
+        del self.placements[key]
+        for cell in self._cell_range(box):
+            bucket = self.cells.get(cell)
+            if bucket:
+                bucket.discard(key)
+                if not bucket:
+                    del self.cells[cell]
+
+    def query_box(self, box):
+        candidates = set()
+        for cell in self._cell_range(box):
+            candidates.update(self.cells.get(cell, ()))
+        return sorted(key for key in candidates if overlap_depth(box, self.boxes[key]) > self.tolerance)
+
+    def query(self, name, position, rotation, narrow_phase=False):
+        box = self.box_for(name, position, rotation)
+        hits = self.query_box(box)
+        if narrow_phase:
+            hits = [key for key in hits if self._meshes_intersect((name, position, rotation), self.placements[key])]
+        return hits
+
+    def _placed_mesh(self, name, position, rotation):
+        import numpy as np
+
+        mesh = self._mesh_cache.get(name)
+        if mesh is None:
+            mesh = load_collision_mesh(name)
+            self._mesh_cache[name] = mesh
+        placed = type(mesh)(mesh)
+        transform = np.eye(4)
+        transform[:3, :3] = euler_matrix(rotation)
+        transform[:3, 3] = position
+        return placed.transform(transform)
+
+    def _meshes_intersect(self, a, b):
+        return self._placed_mesh(*a).is_intersecting(self._placed_mesh(*b))
+
+
+def load_collision_mesh(name, glb_dir=GLB_DIR, catalog_path=CATALOG_PATH):
+    # cheapest non-proxy LOD; a proxy box would only repeat the broad phase. Read through compression.py,
+    # since pipeline GLBs are quantized and Open3D's reader doesn't apply the dequantizing node transforms
+    from compression import read_glb_arrays
+    from meshdata import arrays_to_mesh
+
+    path = os.path.join(glb_dir, f"{name}.glb")
+    instance = None
+    if os.path.exists(catalog_path):
+        row = catalog_row(load_catalog(catalog_path), name) or {}
+        lods = [lod for lod in row.get("lods", []) if not lod.get("proxy")]
+        if lods:
+            path = os.path.join(glb_dir, lods[-1]["file"])
+        instance = row.get("instance")
+
+    vertices, triangles = read_glb_arrays(path)
+    if instance and instance["axis"] is not None:
+        # a length-series instance: the base's mesh stretched along one axis
+        vertices[:, instance["axis"]] = instance["offset"] + instance["scale"] * vertices[:, instance["axis"]]
+    mesh = arrays_to_mesh(vertices, triangles)
+    if mesh.is_empty():
+        raise Exception(f"Failed to load collision mesh from {path}")
+    return mesh
+
+
+def catalog_parts_info(catalog_path=CATALOG_PATH):
+    catalog = load_catalog(catalog_path)
+    return lambda name: catalog_row(catalog, name)
+
+
+def strip_glb(name):
+    return name[:-4] if name.endswith(".glb") else name
+
+
+def check_placements(parts_info, placed, candidates, narrow_phase=False):
+    # candidates are checked against the placed parts and against each other, in order, as the viewer would add them
+    index = CollisionIndex(parts_info)
+    for i, part in enumerate(placed):
+        index.insert(("placed", i), strip_glb(part["name"]), part["position"], part["rotation"])
+
+    results = []
+    for i, part in enumerate(candidates):
+        name = strip_glb(part["name"])
+        try:
+            hits = index.query(name, part["position"], part["rotation"], narrow_phase=narrow_phase)
+        except KeyError as e:
+            results.append({"name": part["name"], "ok": False, "error": str(e)})
+            continue
+
+        overlaps = [{"source": kind, "index": j, "name": index.placements[(kind, j)][0]} for kind, j in hits]
+        ok = not overlaps
+        if ok:
+            index.insert(("candidate", i), name, part["position"], part["rotation"])
+        results.append({"name": part["name"], "ok": ok, "overlaps": overlaps})
+    return results
+
+
+def serve(port=COLLISION_PORT, catalog_path=CATALOG_PATH):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    parts_info = catalog_parts_info(catalog_path)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/check":
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            start = time.perf_counter()
+            results = check_placements(
+                parts_info, body.get("placed", []), body.get("candidates", []), body.get("narrowPhase", False)
+            )
+            payload = json.dumps({"results": results, "ms": (time.perf_counter() - start) * 1000}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    print(f"Collision service listening on http://127.0.0.1:{port}/check")
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check part placements for overlaps")
+    parser.add_argument("placements", nargs="?", help="JSON file with {placed, candidates} lists in the route's format")
+    parser.add_argument("--serve", action="store_true", help="run as a local HTTP service instead")
+    parser.add_argument("--port", type=int, default=COLLISION_PORT)
+    parser.add_argument("--narrow-phase", action="store_true", help="confirm AABB hits against the decimated meshes")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port)
+    else:
+        with open(args.placements) as f:
+            body = json.load(f)
+        for result in check_placements(catalog_parts_info(), body["placed"], body["candidates"], args.narrow_phase):
+            print(json.dumps(result))
@@ -0,0 +1,336 @@
+import os
+import json
+import time
+import shutil
+import struct
+import subprocess
+
+import numpy as np
+
+from catalog import GLB_MAGIC, GLTF_TRIANGLES, JSON_CHUNK
+from utils import atomic_output
+
+BIN_CHUNK = 0x004E4942
+
+# bump whenever the encoding changes; it is part of the pipeline params
+COMPRESSION_VERSION = 1
+
+# KHR_mesh_quantization: positions become uint16 on a grid of (largest extent / (2^bits - 1)), normals int8.
+# 14 bits keeps the grid under 0.03mm for a 420mm extrusion
+POSITION_BITS = 14
+
+# meshopt index/vertex codecs via gltfpack, when it is on PATH. drei's useGLTF decodes EXT_meshopt_compression,
+# but this module's own reader (used by the collision narrow phase) cannot, so it is off by default
+MESHOPT_COMPRESSION = False
+
+COMPONENT_DTYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+COMPONENT_TYPES = {np.dtype(dtype): code for code, dtype in COMPONENT_DTYPES.items()}
+TYPE_WIDTHS = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT4": 16}
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+
+def read_glb(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, _version, length = struct.unpack_from("<III", data, 0)
+    if magic != GLB_MAGIC:
+        raise Exception(f"Not a GLB file: {path}")
+
+    gltf, binary = None, b""
+    offset = 12
+    while offset < length:
+        chunk_length, chunk_type = struct.unpack_from("<II", data, offset)
+        chunk = data[offset + 8 : offset + 8 + chunk_length]
+        if chunk_type == JSON_CHUNK:
+            gltf = json.loads(chunk)
+        elif chunk_type == BIN_CHUNK:
+            binary = chunk
+        offset += 8 + chunk_length
+    if gltf is None:
+        raise Exception(f"GLB is missing its JSON chunk: {path}")
+    return gltf, binary
+
+
+def write_glb(path, gltf, binary):
+    # both chunks are padded to 4 bytes: JSON with spaces, BIN with zeros
+    json_chunk = json.dumps(gltf, separators=(",", ":")).encode()
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    binary += b"\0" * (-len(binary) % 4)
+    length = 12 + 8 + len(json_chunk) + (8 + len(binary) if binary else 0)
+
+    with open(path, "wb") as f:
+        f.write(struct.pack("<III", GLB_MAGIC, 2, length))
+        f.write(struct.pack("<II", len(json_chunk), JSON_CHUNK))
+        f.write(json_chunk)
+        if binary:
+            f.write(struct.pack("<II", len(binary), BIN_CHUNK))
+            f.write(binary)
+
+
+def read_accessor(gltf, binary, index):
+    accessor = gltf["accessors"][index]
+    if "bufferView" not in accessor or "sparse" in accessor:
+        raise Exception(f"Unsupported accessor {index}: only dense, buffer-backed accessors are read")
+
+    dtype = np.dtype(COMPONENT_DTYPES[accessor["componentType"]])
+    width = TYPE_WIDTHS[accessor["type"]]
+    view = gltf["bufferViews"][accessor["bufferView"]]
+    stride = view.get("byteStride") or dtype.itemsize * width
+    values = np.ndarray(
+        (accessor["count"], width),
+        dtype=dtype,
+        buffer=binary,
+        offset=view.get("byteOffset", 0) + accessor.get("byteOffset", 0),
+        strides=(stride, dtype.itemsize),
+    )
+    if accessor.get("normalized"):
+        # glTF's decoding rule: signed types are clamped so both -128 and -127 map to -1
+        scale = float(np.iinfo(dtype).max)
+        return np.maximum(values / scale, -1.0)
+    return values.astype(np.float64 if dtype.kind == "f" else dtype)
+
+
+def node_matrix(node):
+    if "matrix" in node:
+        return np.array(node["matrix"], dtype=np.float64).reshape(4, 4).T  # glTF matrices are column-major
+    x, y, z, w = node.get("rotation", [0, 0, 0, 1])
+    rotation = np.array(
+        [
+            [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+            [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+            [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+        ]
+    )
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation * np.array(node.get("scale", [1, 1, 1]))
+    matrix[:3, 3] = node.get("translation", [0, 0, 0])
+    return matrix
+
+
+def _mesh_instances(gltf):
+    # (mesh index, world matrix) for every node that draws a mesh in the default scene
+    scenes = gltf.get("scenes") or [{"nodes": list(range(len(gltf.get("nodes", []))))}]
+    stack = [(index, np.eye(4)) for index in scenes[gltf.get("scene", 0)].get("nodes", [])]
+    while stack:
+        index, parent = stack.pop()
+        node = gltf["nodes"][index]
+        matrix = parent @ node_matrix(node)
+        if "mesh" in node:
+            yield node["mesh"], matrix
+        stack.extend((child, matrix) for child in node.get("children", []))
+
+
+def _primitive_arrays(gltf, binary, primitive):
+    positions = read_accessor(gltf, binary, primitive["attributes"]["POSITION"]).astype(np.float64)
+    if "indices" in primitive:
+        triangles = read_accessor(gltf, binary, primitive["indices"]).reshape(-1, 3).astype(np.int64)
+    else:
+        triangles = np.arange(len(positions)).reshape(-1, 3)
+    normals = None
+    if "NORMAL" in primitive["attributes"]:
+        normals = read_accessor(gltf, binary, primitive["attributes"]["NORMAL"]).astype(np.float64)
+    return positions, normals, triangles
+
+
+def read_glb_arrays(path):
+    # world-space (vertices, triangles) of every triangle primitive, with node transforms and quantization applied;
+    # this is how Python-side consumers read pipeline GLBs, since Open3D's reader knows neither
+    gltf, binary = read_glb(path)
+    if "EXT_meshopt_compression" in gltf.get("extensionsUsed", []):
+        raise Exception(f"{path} is meshopt-compressed; rebuild it with MESHOPT_COMPRESSION off to read it here")
+
+    vertex_chunks, triangle_chunks = [], []
+    offset = 0
+    for mesh_index, matrix in _mesh_instances(gltf):
+        for primitive in gltf["meshes"][mesh_index]["primitives"]:
+            if primitive.get("mode", GLTF_TRIANGLES) != GLTF_TRIANGLES:
+                continue
+            positions, _, triangles = _primitive_arrays(gltf, binary, primitive)
+            vertex_chunks.append(positions @ matrix[:3, :3].T + matrix[:3, 3])
+            triangle_chunks.append(triangles + offset)
+            offset += len(positions)
+
+    if not vertex_chunks:
+        return np.zeros((0, 3), dtype=np.float64), np.zeros((0, 3), dtype=np.int32)
+    return np.concatenate(vertex_chunks), np.concatenate(triangle_chunks).astype(np.int32)
+
+
+class _BufferBuilder:
+    def __init__(self):
+        self.binary = bytearray()
+        self.views = []
+        self.accessors = []
+
+    def add(self, values, target, normalized=False, bounds=False):
+        # values is (count, width); rows are padded to 4 bytes as glTF requires of vertex attributes
+        count, width = values.shape
+        row_bytes = values.dtype.itemsize * width
+        view = {"buffer": 0, "byteOffset": len(self.binary), "target": target}
+        if target == ARRAY_BUFFER and row_bytes % 4:
+            stride = row_bytes + (-row_bytes % 4)
+            padded = np.zeros((count, stride), dtype=np.uint8)
+            padded[:, :row_bytes] = np.ascontiguousarray(values).view(np.uint8).reshape(count, row_bytes)
+            data = padded.tobytes()
+            view["byteStride"] = stride
+        else:
+            data = np.ascontiguousarray(values).tobytes()
+        view["byteLength"] = len(data)
+        self.binary += data + b"\0" * (-len(data) % 4)
+        self.views.append(view)
+
+        accessor = {
+            "bufferView": len(self.views) - 1,
+            "componentType": COMPONENT_TYPES[values.dtype],
+            "count": count,
+            "type": "SCALAR" if width == 1 else f"VEC{width}",
+        }
+        if normalized:
+            accessor["normalized"] = True
+        if bounds:
+            accessor["min"] = values.min(axis=0).tolist()
+            accessor["max"] = values.max(axis=0).tolist()
+        self.accessors.append(accessor)
+        return len(self.accessors) - 1
+
+
+def quantize_gltf(gltf, binary, position_bits=POSITION_BITS):
+    # Rewrites every mesh as welded, quantized POSITION/NORMAL plus the smallest index type. Other attributes
+    # (colors, UVs, tangents) are dropped: the viewer replaces materials and reads neither. Each mesh gets its own
+    # dequantization grid, applied through a new child node so the parent's transform is untouched
+    builder = _BufferBuilder()
+    levels = (1 << position_bits) - 1
+    dequantize = {}
+
+    for mesh_index, mesh in enumerate(gltf.get("meshes", [])):
+        if any(p.get("mode", GLTF_TRIANGLES) != GLTF_TRIANGLES for p in mesh["primitives"]):
+            raise Exception("Only triangle meshes can be quantized")
+        pairs = [(_primitive_arrays(gltf, binary, p), p) for p in mesh["primitives"]]
+        pairs = [(arrays, p) for arrays, p in pairs if len(arrays[0])]
+        if not pairs:
+            raise Exception("Cannot quantize a mesh without vertices")
+
+        low = np.min([arrays[0].min(axis=0) for arrays, _ in pairs], axis=0)
+        high = np.max([arrays[0].max(axis=0) for arrays, _ in pairs], axis=0)
+        # one uniform step for all three axes, so normals survive the node scale without correction
+        step = float(max(high - low)) / levels or 1.0
+        dequantize[mesh_index] = (low.tolist(), step)
+
+        primitives = []
+        for (positions, normals, triangles), primitive in pairs:
+            quantized = np.round((positions - low) / step).astype(np.uint16)
+            columns = [quantized.astype(np.int32)]
+            if normals is not None:
+                lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+                normals = np.round(normals / np.where(lengths > 0, lengths, 1) * 127).astype(np.int8)
+                columns.append(normals.astype(np.int32))
+
+            # weld on the quantized values: vertices that became identical are merged, and triangles that
+            # collapsed onto a repeated vertex are dropped
+            keys, inverse = np.unique(np.hstack(columns), axis=0, return_inverse=True)
+            triangles = inverse.reshape(-1)[triangles]
+            triangles = triangles[
+                (triangles[:, 0] != triangles[:, 1])
+                & (triangles[:, 1] != triangles[:, 2])
+                & (triangles[:, 0] != triangles[:, 2])
+            ]
+            index_type = np.uint16 if len(keys) <= 0xFFFF else np.uint32
+
+            attributes = {"POSITION": builder.add(keys[:, :3].astype(np.uint16), ARRAY_BUFFER, bounds=True)}
+            if normals is not None:
+                attributes["NORMAL"] = builder.add(keys[:, 3:6].astype(np.int8), ARRAY_BUFFER, normalized=True)
+            rewritten = {
+                "attributes": attributes,
+                "indices": builder.add(triangles.reshape(-1, 1).astype(index_type), ELEMENT_ARRAY_BUFFER),
+                "mode": GLTF_TRIANGLES,
+            }
+            if "material" in primitive:
+                rewritten["material"] = primitive["material"]
+            primitives.append(rewritten)
+        mesh["primitives"] = primitives
+
+    nodes = gltf.get("nodes", [])
+    for node in list(nodes):
+        if "mesh" not in node:
+            continue
+        mesh_index = node.pop("mesh")
+        offset, step = dequantize[mesh_index]
+        nodes.append({"mesh": mesh_index, "translation": offset, "scale": [step] * 3})
+        node.setdefault("children", []).append(len(nodes) - 1)
+
+    gltf["accessors"] = builder.accessors
+    gltf["bufferViews"] = builder.views
+    gltf["buffers"] = [{"byteLength": len(builder.binary)}]
+    for key in ("images", "textures", "samplers"):
+        gltf.pop(key, None)
+    for material in gltf.get("materials", []):
+        pbr = material.get("pbrMetallicRoughness", {})
+        for texture in ("baseColorTexture", "metallicRoughnessTexture"):
+            pbr.pop(texture, None)
+        for texture in ("normalTexture", "occlusionTexture", "emissiveTexture"):
+            material.pop(texture, None)
+    gltf["extensionsUsed"] = sorted(set(gltf.get("extensionsUsed", [])) | {"KHR_mesh_quantization"})
+    gltf["extensionsRequired"] = sorted(set(gltf.get("extensionsRequired", [])) | {"KHR_mesh_quantization"})
+    return gltf, bytes(builder.binary)
+
+
+def _decode_seconds(path, repeats=3):
+    # Python-side stand-in for the viewer's parse cost: read both chunks and decode every accessor
+    start = time.perf_counter()
+    for _ in range(repeats):
+        read_glb_arrays(path)
+    return (time.perf_counter() - start) / repeats
+
+
+def _gltfpack(path, output_path):
+    # -cc: meshopt codecs at the higher compression level; gltfpack quantizes on its own as well
+    subprocess.run(["gltfpack", "-i", path, "-o", output_path, "-cc"], check=True, capture_output=True)
+
+
+def compress_glb(path, position_bits=POSITION_BITS, meshopt=MESHOPT_COMPRESSION, measure_decode=False):
+    # Rewrites path in place and returns the byte savings. Decode times are measured only on request: decoding
+    # every LOD three times before and after is too slow to pay for on every conversion
+    raw_bytes = os.path.getsize(path)
+    raw_seconds = _decode_seconds(path) if measure_decode else None
+
+    use_gltfpack = meshopt and shutil.which("gltfpack")
+    with atomic_output(path) as tmp_path:
+        if use_gltfpack:
+            _gltfpack(path, tmp_path)
+        else:
+            write_glb(tmp_path, *quantize_gltf(*read_glb(path), position_bits=position_bits))
+
+    report = {"raw_bytes": raw_bytes, "bytes": os.path.getsize(path)}
+    # meshopt output can't be decoded here, so its parse time is not measured
+    if measure_decode and not use_gltfpack:
+        report["raw_decode_ms"] = round(raw_seconds * 1000, 3)
+        report["decode_ms"] = round(_decode_seconds(path) * 1000, 3)
+    return report
+
+
+def print_report(path, report):
+    saved = 1 - report["bytes"] / report["raw_bytes"] if report["raw_bytes"] else 0
+    decode = f", decode {report['raw_decode_ms']}ms -> {report['decode_ms']}ms" if "decode_ms" in report else ""
+    print(f"Compressed {path}: {report['raw_bytes']} -> {report['bytes']} bytes ({saved:.0%} smaller){decode}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Quantize GLB files in place (KHR_mesh_quantization)")
+    parser.add_argument("files", nargs="+", help="GLB files to compress")
+    parser.add_argument("--bits", type=int, default=POSITION_BITS, help="position quantization bits (at most 16)")
+    parser.add_argument("--meshopt", action="store_true", help="use gltfpack's meshopt compression when it is on PATH")
+    parser.add_argument("--decode", action="store_true", help="also time decoding each file before and after")
+    args = parser.parse_args()
+
+    for path in args.files:
+        report = compress_glb(path, position_bits=args.bits, meshopt=args.meshopt, measure_decode=args.decode)
+        print_report(path, report)
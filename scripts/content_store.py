@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+
+from utils import atomic_output, atomic_write_json, file_sha256, load_json
+
+# Published outputs live under their content hash and are never rewritten, so they can be cached forever;
+# manifest.json is the only mutable file, and swapping it in is what makes a rebuild visible
+SERIALIZED_DIR = "./serialized"
+GLB_DIR = "./glb"
+STORE_DIR = "./store"
+STORE_MANIFEST = "manifest.json"
+STORE_VERSION = 1
+GC_GRACE_SECONDS = 24 * 3600  # objects are kept this long after they drop out, for clients holding an old catalog
+
+
+def manifest_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, STORE_MANIFEST)
+
+
+def load_store_manifest(store_dir=STORE_DIR):
+    manifest = load_json(manifest_path(store_dir), {})
+    if manifest.get("version") != STORE_VERSION:
+        return {"version": STORE_VERSION, "parts": {}, "unreferenced": {}}
+    manifest.setdefault("unreferenced", {})
+    return manifest
+
+
+def referenced_objects(parts):
+    return {o for entry in parts.values() for o in [entry["json"]] + entry["lods"]}
+
+
+def canonical_json(data):
+    # one byte sequence per value, so equal metadata always lands on the same object
+    return json.dumps(data, sort_keys=True, separators=(",", ":")).encode()
+
+
+def put_bytes(data, extension, store_dir=STORE_DIR):
+    name = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+    path = os.path.join(store_dir, name)
+    if os.path.exists(path):
+        os.utime(path)
+    else:
+        with atomic_output(path) as tmp_path, open(tmp_path, "wb") as f:
+            f.write(data)
+    return name
+
+
+def put_file(path, digest, store_dir=STORE_DIR):
+    # identical GLBs (aliases sharing a base, unchanged rebuilds) collapse to one object
+    name = f"{digest}{os.path.splitext(path)[1]}"
+    target = os.path.join(store_dir, name)
+    if os.path.exists(target):
+        os.utime(target)  # a reused orphan looks new again, so a collection running alongside leaves it alone
+    else:
+        with atomic_output(target) as tmp_path:
+            shutil.copyfile(path, tmp_path)
+    return name
+
+
+def _file_digest(path, sources, previous):
+    # content hashes are reused while a file's size and mtime hold, so an incremental publish reads only new files
+    stat = os.stat(path)
+    signature = [stat.st_size, stat.st_mtime_ns]
+    cached = previous.get(path)
+    digest = cached[2] if cached and cached[:2] == signature else file_sha256(path)
+    sources[path] = signature + [digest]
+    return digest
+
+
+def publish_part(data, glb_dir=GLB_DIR, store_dir=STORE_DIR, previous=None):
+    # stores a part's GLBs, then its metadata with every LOD file swapped for the stored object's name
+    previous = previous or {}
+    sources = {}
+    lods = []
+    for lod in data.get("lods", []):
+        path = os.path.join(glb_dir, lod["file"])
+        lods.append({**lod, "file": put_file(path, _file_digest(path, sources, previous), store_dir)})
+    stored = {**data, "lods": lods}
+    return {
+        "json": put_bytes(canonical_json(stored), "json", store_dir),
+        "lods": [lod["file"] for lod in lods],
+        "sources": sources,
+    }
+
+
+def publish_store(serialized_dir=SERIALIZED_DIR, glb_dir=GLB_DIR, store_dir=STORE_DIR, pids=None):
+    # Every serialized part (or just pids) is stored, then the manifest is replaced in one rename; until then
+    # readers keep seeing the previous build in full. Parts without serialized JSON are dropped
+    manifest = load_store_manifest(store_dir)
+    parts = {}
+    for name in sorted(os.listdir(serialized_dir)) if os.path.isdir(serialized_dir) else []:
+        if not name.endswith(".json") or name.startswith("."):
+            continue
+        pid = name[: -len(".json")]
+        entry = manifest["parts"].get(pid)
+        if pids is None or pid in pids or entry is None:
+            with open(os.path.join(serialized_dir, name)) as f:
+                data = json.load(f)
+            try:
+                entry = publish_part(data, glb_dir, store_dir, (entry or {}).get("sources"))
+            except FileNotFoundError as e:
+                print(f"Skipped {pid}: {e}")
+                continue
+        parts[pid] = entry
+
+    # Objects dropped by this build are stamped with the time they stopped being referenced, which is when the
+    # grace period starts; one referenced again loses its stamp
+    objects = referenced_objects(parts)
+    now = time.time()
+    unreferenced = manifest["unreferenced"]
+    for name in referenced_objects(manifest["parts"]) - objects:
+        unreferenced.setdefault(name, now)
+    for name in objects:
+        unreferenced.pop(name, None)
+
+    manifest["parts"] = parts
+    atomic_write_json(manifest_path(store_dir), manifest, indent=1, sort_keys=True)
+    print(f"Published {len(parts)} parts as {len(objects)} objects: {store_dir}")
+    return manifest
+
+
+def collect_garbage(store_dir=STORE_DIR, grace_seconds=GC_GRACE_SECONDS):
+    # Removes objects the manifest no longer references once they have been unreferenced for the grace period,
+    # so no live page can still want them. Objects no manifest ever referenced (left by an interrupted publish)
+    # have no stamp and go by their mtime instead
+    manifest = load_store_manifest(store_dir)
+    referenced = referenced_objects(manifest["parts"])
+    unreferenced = manifest["unreferenced"]
+    cutoff = time.time() - grace_seconds
+    removed = 0
+    for name in os.listdir(store_dir):
+        path = os.path.join(store_dir, name)
+        if name == STORE_MANIFEST or name.startswith(".tmp-") or name in referenced:
+            continue
+        if unreferenced.get(name, os.path.getmtime(path)) < cutoff:
+            os.remove(path)
+            unreferenced.pop(name, None)
+            removed += 1
+    # stamps of objects already gone are dropped too
+    for name in [n for n in unreferenced if not os.path.exists(os.path.join(store_dir, n))]:
+        del unreferenced[name]
+    atomic_write_json(manifest_path(store_dir), manifest, indent=1, sort_keys=True)
+    print(f"Removed {removed} unreferenced objects from {store_dir}")
+    return removed
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Publish serialized parts and GLBs to the content-addressed store")
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--gc", action="store_true", help=f"also remove objects unreferenced for {GC_GRACE_SECONDS // 3600}h")
+    args = parser.parse_args()
+
+    publish_store(store_dir=args.store)
+    if args.gc:
+        collect_garbage(args.store)
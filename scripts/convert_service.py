@@ -0,0 +1,332 @@
+import os
+import json
+import time
+import queue
+import threading
+
+import metrics
+from batch import (
+    FILE_TIMEOUT,
+    MAX_ATTEMPTS,
+    QUARANTINE_PATH,
+    WorkerPool,
+    find_step_files,
+    load_quarantine,
+    quarantined_files,
+)
+from build_cache import (
+    MANIFEST_PATH,
+    load_manifest,
+    part_id_for,
+    plan_build,
+    prune_removed,
+    record_results,
+    save_manifest,
+)
+from catalog import build_catalog, write_catalog
+from content_store import STORE_DIR, load_store_manifest, publish_store
+from dedup import instance_bases, stale_instances
+from normalize_names import ATTRIBUTES_PATH, merge_attributes, normalize_file
+from serialize_and_reduce import (
+    GLB_DIR,
+    MODELS_DIR,
+    SERIALIZED_DIR,
+    pipeline_params,
+    process_step_file,
+    warm_up,
+)
+from shape_index import update_shape_index
+from utils import atomic_write_json, load_json
+
+SERVICE_PORT = 8768
+WATCH_INTERVAL = 2.0  # seconds between scans of the models directory
+POLL_TIMEOUT = 0.25  # seconds the service loop waits on its workers before checking for new requests
+JOB_HISTORY = 500  # finished jobs kept for /jobs
+
+
+class ConversionService:
+    # One thread owns the WorkerPool (which is not thread-safe): it drains requests from the HTTP handlers and the
+    # watcher, dispatches them to the resident workers and publishes each result as soon as it arrives. Like the
+    # batch pipeline, it works in the directory the web app serves: models, outputs, store and catalog are all
+    # relative to the working directory
+    def __init__(self, workers=None, timeout=FILE_TIMEOUT, memory_limit=None):
+        self.pool = WorkerPool(workers, timeout, MAX_ATTEMPTS, memory_limit)
+        self.params = pipeline_params()
+        self.manifest = load_manifest()
+        self.requests = queue.Queue()
+        self.removals = queue.Queue()
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.active = {}  # filepath -> job id, while queued or running
+        self.sources = {}
+        # alias pid -> base pid, kept current as results arrive, so a part's aliases are found without a library scan
+        self.bases = instance_bases(SERIALIZED_DIR)
+        self.next_id = 1
+        self.metrics_log = metrics.open_log()
+
+        # preload every worker, so the first real job doesn't pay for the OCC and Open3D imports
+        for _ in range(self.pool.size):
+            self.pool.submit(warm_up, "")
+
+    def request(self, filepath, force=False):
+        # thread-safe; returns the job that will convert the file
+        with self.lock:
+            if filepath in self.active:
+                return self.jobs[self.active[filepath]]
+            job = {"id": self.next_id, "file": filepath, "state": "queued", "submitted": time.time()}
+            self.jobs[job["id"]] = job
+            self.active[filepath] = job["id"]
+            self.next_id += 1
+        self.requests.put((job["id"], filepath, force))
+        return job
+
+    def remove(self, filepath):
+        # thread-safe; the removed part is pruned on the service thread, which owns the manifest
+        self.removals.put(filepath)
+
+    def stats(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        finished = [j for j in jobs if j["state"] in ("done", "failed", "up to date")]
+        latencies = [j["latency"] for j in finished if "latency" in j]
+        stats = {
+            "queued": sum(1 for j in jobs if j["state"] == "queued"),
+            "running": sum(1 for j in jobs if j["state"] == "running"),
+            "done": sum(1 for j in finished if j["state"] != "failed"),
+            "failed": sum(1 for j in finished if j["state"] == "failed"),
+            "workers": len(self.pool.workers),
+        }
+        if latencies:
+            stats["latency_seconds"] = {
+                "p50": round(metrics.percentile(latencies, 0.5), 3),
+                "p95": round(metrics.percentile(latencies, 0.95), 3),
+                "max": round(max(latencies), 3),
+            }
+        return stats
+
+    def job_list(self):
+        with self.lock:
+            return sorted(self.jobs.values(), key=lambda j: -j["id"])
+
+    def _update(self, job_id, **values):
+        with self.lock:
+            job = self.jobs[job_id]
+            job.update(values)
+            if values.get("state") in ("done", "failed", "up to date"):
+                self.active.pop(job["file"], None)
+                job["latency"] = round(time.time() - job["submitted"], 3)
+                # forget the oldest finished jobs
+                finished = [i for i, j in self.jobs.items() if "latency" in j]
+                for i in finished[: max(0, len(finished) - JOB_HISTORY)]:
+                    del self.jobs[i]
+
+    def _start(self, job_id, filepath, force):
+        if not os.path.exists(filepath):
+            self._update(job_id, state="failed", error="file not found")
+            return
+        with self.lock:
+            self.active.pop(filepath, None)
+        # vendor names are normalized on arrival; the job follows the file to its new name
+        filepath = normalize_file(filepath)
+        with self.lock:
+            self.jobs[job_id]["file"] = filepath
+            self.active[filepath] = job_id
+
+        todo, sources = plan_build([filepath], self.manifest, self.params, force=force)
+        if not todo:
+            self._publish({part_id_for(filepath)})
+            self._update(job_id, state="up to date")
+            return
+        self.sources.update(sources)
+        self._update(job_id, state="running", started=time.time())
+        self.pool.submit(process_step_file, filepath)
+
+    def _publish(self, pids):
+        # The workers already wrote the GLBs and then the JSON in place, each swapped in with a rename. The parts
+        # (or their removal) go into the content-addressed store, and the catalog, which points the viewer at the
+        # store's immutable objects, is rebuilt only when a part's stored metadata changed
+        before = load_store_manifest(STORE_DIR)["parts"]
+        after = publish_store(SERIALIZED_DIR, GLB_DIR, STORE_DIR, pids=pids)["parts"]
+        if any((before.get(pid) or {}).get("json") != (after.get(pid) or {}).get("json") for pid in pids):
+            write_catalog(build_catalog(SERIALIZED_DIR, GLB_DIR, STORE_DIR))
+
+    def _finish(self, result):
+        if result["file"] == "":
+            return  # a warm-up job
+        self.metrics_log.write(json.dumps(result["metrics"]) + "\n")
+        with self.lock:
+            job_id = self.active.get(result["file"])
+        if job_id is None:
+            return
+
+        record_results(self.manifest, self.sources, [result])
+        save_manifest(self.manifest, MANIFEST_PATH)
+        if not result["ok"]:
+            if result.get("crashed"):
+                quarantine = load_quarantine()
+                quarantine[result["file"]] = {"hash": self.sources[result["file"]]["hash"], "error": result["error"]}
+                atomic_write_json(QUARANTINE_PATH, quarantine, indent=2, sort_keys=True)
+            self._update(job_id, state="failed", error=result["error"], seconds=round(result["seconds"], 3))
+            print(f"FAILED {os.path.basename(result['file'])}: {result['error']}")
+            return
+
+        quarantine = load_quarantine()
+        if quarantine.pop(result["file"], None):
+            atomic_write_json(QUARANTINE_PATH, quarantine, indent=2, sort_keys=True)
+
+        pid = part_id_for(result["file"])
+        merge_attributes(load_json(ATTRIBUTES_PATH, {}), SERIALIZED_DIR, pids=[pid])
+        self._publish({pid})
+        update_shape_index(SERIALIZED_DIR, GLB_DIR, pids={pid})
+        self._update(job_id, state="done", seconds=round(result["seconds"], 3))
+        print(f"Published {pid} in {result['seconds']:.1f}s")
+
+        instance = load_json(os.path.join(SERIALIZED_DIR, f"{pid}.json"), {}).get("instance")
+        if instance:
+            self.bases[pid] = instance["pid"]
+        else:
+            self.bases.pop(pid, None)
+        self._rebuild_aliases({pid})
+
+    def _rebuild_aliases(self, pids):
+        # aliases of these parts are converted again now that the parts are final (or gone), as serialize_and_reduce
+        # does after a build. Only their own JSON is checked, and the models directory is walked once, if any is stale
+        stale = set(stale_instances(SERIALIZED_DIR, [alias for alias, base in self.bases.items() if base in pids]))
+        if not stale:
+            return
+        for filepath in find_step_files(MODELS_DIR):
+            if part_id_for(filepath) in stale:
+                self.request(filepath, force=True)
+
+    def _prune(self):
+        # the same prune as a full batch build: parts whose STEP file is gone lose their outputs and manifest entry,
+        # then drop out of the store, the catalog and the shape index
+        removed = prune_removed(find_step_files(MODELS_DIR), self.manifest)
+        if not removed:
+            return
+        save_manifest(self.manifest, MANIFEST_PATH)
+        self._publish(set(removed))
+        update_shape_index(SERIALIZED_DIR, GLB_DIR, pids=set(removed))
+        for pid in removed:
+            self.bases.pop(pid, None)
+        print(f"Removed {', '.join(removed)}")
+        self._rebuild_aliases(set(removed))
+
+    def run(self):
+        while True:
+            removed = False
+            while True:
+                try:
+                    self.removals.get_nowait()
+                except queue.Empty:
+                    break
+                removed = True
+            if removed:
+                try:
+                    self._prune()
+                except Exception as e:
+                    print(f"Pruning removed parts failed: {type(e).__name__}: {e}")
+            while True:
+                try:
+                    job_id, filepath, force = self.requests.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    self._start(job_id, filepath, force)
+                except Exception as e:
+                    self._update(job_id, state="failed", error=f"{type(e).__name__}: {e}")
+            for result in self.pool.poll(timeout=POLL_TIMEOUT):
+                # publishing runs on this thread too: an error there fails the job rather than the whole service
+                try:
+                    self._finish(result)
+                except Exception as e:
+                    with self.lock:
+                        job_id = self.active.get(result["file"])
+                    if job_id is not None:
+                        self._update(job_id, state="failed", error=f"{type(e).__name__}: {e}")
+                    print(f"FAILED {os.path.basename(result['file'])}: {type(e).__name__}: {e}")
+            if not self.pool.busy():
+                time.sleep(POLL_TIMEOUT)
+
+    def watch(self, models_dir=MODELS_DIR, interval=WATCH_INTERVAL):
+        # A file is requested once its size and mtime hold still for one interval, so a STEP still being copied
+        # in is not converted half-written. The manifest then decides whether it actually needs converting
+        seen = {}
+        requested = {}
+        while True:
+            step_files = find_step_files(models_dir)
+            quarantined = quarantined_files(step_files, load_quarantine())
+            current = set(step_files)
+            for filepath in [f for f in seen if f not in current]:
+                del seen[filepath]
+                requested.pop(filepath, None)
+                self.remove(filepath)
+            for filepath in step_files:
+                try:
+                    stat = os.stat(filepath)
+                except FileNotFoundError:
+                    continue
+                signature = (stat.st_size, stat.st_mtime_ns)
+                stable = seen.get(filepath) == signature
+                seen[filepath] = signature
+                if stable and requested.get(filepath) != signature and filepath not in quarantined:
+                    requested[filepath] = signature
+                    self.request(filepath)
+            time.sleep(interval)
+
+
+def serve(service, port=SERVICE_PORT):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, service.stats())
+            elif self.path == "/jobs":
+                self._send_json(200, service.job_list())
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            if self.path != "/jobs":
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            files = body.get("files") or [body["file"]]
+            jobs = [dict(service.request(f, force=body.get("force", False))) for f in files]
+            self._send_json(202, jobs)
+
+        def log_message(self, *args):
+            pass
+
+    print(f"Conversion service listening on http://127.0.0.1:{port} (POST /jobs, GET /jobs, GET /stats)")
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Resident conversion service with warm workers and a job queue")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=FILE_TIMEOUT, help="seconds per file before its worker is killed")
+    parser.add_argument("--max-memory", type=float, default=None, help="MB of RSS per worker before it is killed")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--root", default=".", help=f"directory the web app serves, holding {MODELS_DIR} and every output")
+    parser.add_argument("--no-watch", action="store_true", help=f"only convert files posted to /jobs, not new files in {MODELS_DIR}")
+    args = parser.parse_args()
+
+    # before the workers start, so they resolve every path from the same root
+    os.chdir(args.root)
+    service = ConversionService(args.workers, args.timeout, args.max_memory)
+    if not args.no_watch:
+        threading.Thread(target=service.watch, daemon=True).start()
+    threading.Thread(target=serve, args=(service, args.port), daemon=True).start()
+    service.run()
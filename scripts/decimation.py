@@ -0,0 +1,163 @@
+import os
+
+import numpy as np
+
+from meshdata import clean_mesh
+from utils import atomic_write_json, json_sha256, load_json
+
+# bump whenever scoring or selection changes, so cached choices are not reused
+DECIMATION_VERSION = 2
+DECIMATION_CACHE_DIR = "./decimation_cache"
+
+# (strategy, parameter) pairs tried per part: quadric keeps that fraction of the triangles,
+# vertex clustering merges vertices on a grid of (largest extent / divisor)
+DECIMATION_GRID = [
+    ("quadric", 0.5),
+    ("quadric", 0.3),
+    ("quadric", 0.15),
+    ("quadric", 0.05),
+    ("cluster", 512),
+    ("cluster", 256),
+    ("cluster", 128),
+]
+
+# a candidate is acceptable while its Hausdorff distance to the original stays under this fraction of the diagonal
+ERROR_TOLERANCE_RATIO = 0.002
+SAMPLE_POINTS = 20000
+# Candidates are scored together, in one distance query per direction, which Open3D spreads over its own threads.
+# Python threads per candidate would gain nothing: Open3D holds the GIL through simplify_quadric_decimation and
+# compute_distance (a second Python thread made no progress during either), and batch workers are daemonic, so they
+# can't start processes of their own
+CANDIDATE_SPACING = 3.0  # candidates sit this many diagonals apart in the shared scene, out of each other's reach
+
+
+def apply_strategy(mesh, strategy, param):
+    import open3d as o3d
+
+    if strategy == "quadric":
+        simplified = mesh.simplify_quadric_decimation(max(4, int(len(mesh.triangles) * param)))
+    elif strategy == "cluster":
+        voxel_size = max(mesh.get_max_bound() - mesh.get_min_bound()) / param
+        simplified = mesh.simplify_vertex_clustering(
+            voxel_size=voxel_size, contraction=o3d.geometry.SimplificationContraction.Average
+        )
+    else:
+        raise ValueError(f"Unknown decimation strategy: {strategy}")
+    return clean_mesh(simplified)
+
+
+def estimated_glb_bytes(mesh):
+    # float32 positions and normals plus uint32 indices; the JSON chunk is negligible next to the buffer
+    return len(mesh.vertices) * 24 + len(mesh.triangles) * 12
+
+
+def surface_distances(point_sets, meshes, origin, spacing):
+    # Exact distance from each point to the nearest triangle of its own mesh, for every (points, mesh) pair in one
+    # query: pair i is moved i * spacing along x, far enough that no point reaches another pair's mesh. Coordinates
+    # are taken relative to origin first, so the shifts cost little float32 precision
+    import open3d as o3d
+
+    scene = o3d.t.geometry.RaycastingScene()
+    queries = []
+    for i, (points, mesh) in enumerate(zip(point_sets, meshes)):
+        shift = np.array([i * spacing, 0.0, 0.0]) - origin
+        scene.add_triangles(
+            o3d.core.Tensor((np.asarray(mesh.vertices) + shift).astype(np.float32)),
+            o3d.core.Tensor(np.asarray(mesh.triangles).astype(np.uint32)),
+        )
+        queries.append(np.asarray(points) + shift)
+    distances = scene.compute_distance(o3d.core.Tensor(np.concatenate(queries).astype(np.float32))).numpy()
+    return np.split(distances, np.cumsum([len(points) for points in point_sets])[:-1])
+
+
+def surface_errors(original, simplified, samples=SAMPLE_POINTS):
+    # Points sampled on each surface, measured to the other surface's triangles rather than to the other sampling,
+    # so sampling noise doesn't count as error (point-to-point distances between two samplings of the very same
+    # surface are several times the tolerance). The max is a Hausdorff estimate, the mean of both directions a
+    # Chamfer distance. One entry per simplified mesh; the original is sampled once for all of them
+    origin = original.get_min_bound()
+    spacing = CANDIDATE_SPACING * max(float(np.linalg.norm(original.get_max_bound() - origin)), 1e-6)
+    a = np.asarray(original.sample_points_uniformly(samples).points)
+    b = [np.asarray(mesh.sample_points_uniformly(samples).points) for mesh in simplified]
+    forward = surface_distances([a] * len(simplified), simplified, origin, spacing)
+    # every candidate sample is measured against the same original, so they share one unshifted mesh
+    backward = np.split(
+        surface_distances([np.concatenate(b)], [original], origin, spacing)[0], np.cumsum([len(p) for p in b])[:-1]
+    )
+    return [
+        {
+            "hausdorff": round(float(max(f.max(), r.max())), 5),
+            "chamfer": round(float((f.mean() + r.mean()) / 2), 5),
+        }
+        for f, r in zip(forward, backward)
+    ]
+
+
+def surface_error(original, simplified, samples=SAMPLE_POINTS):
+    return surface_errors(original, [simplified], samples)[0]
+
+
+def search_decimation(mesh, tolerance_ratio=ERROR_TOLERANCE_RATIO, grid=DECIMATION_GRID):
+    diagonal = float(np.linalg.norm(mesh.get_max_bound() - mesh.get_min_bound()))
+    tolerance = diagonal * tolerance_ratio
+
+    simplified = []
+    candidates = []
+    for strategy, param in grid:
+        candidate = apply_strategy(mesh, strategy, param)
+        if len(candidate.triangles) == 0:
+            continue
+        simplified.append(candidate)
+        candidates.append(
+            {
+                "strategy": strategy,
+                "param": param,
+                "triangles": len(candidate.triangles),
+                "bytes": estimated_glb_bytes(candidate),
+            }
+        )
+    for candidate, error in zip(candidates, surface_errors(mesh, simplified) if simplified else []):
+        candidate.update(error)
+
+    accepted = [c for c in candidates if c["hausdorff"] <= tolerance]
+    best = min(accepted, key=lambda c: (c["bytes"], c["chamfer"])) if accepted else None
+    return {"tolerance": round(tolerance, 5), "best": best, "candidates": candidates}
+
+
+def choose_decimation(mesh, part_hash, tolerance_ratio=ERROR_TOLERANCE_RATIO, cache_dir=DECIMATION_CACHE_DIR):
+    # returns (mesh, choice); the input mesh comes back unchanged when no candidate is within tolerance.
+    # The key covers the triangle count too, since a tessellation change gives the same part a different input mesh
+    key = json_sha256(
+        {
+            "part": part_hash,
+            "triangles": len(mesh.triangles),
+            "grid": DECIMATION_GRID,
+            "tolerance_ratio": tolerance_ratio,
+        }
+    )
+    cache_path = os.path.join(cache_dir, f"{key}.v{DECIMATION_VERSION}.json")
+    search = load_json(cache_path)
+    if search is None:
+        search = search_decimation(mesh, tolerance_ratio)
+        atomic_write_json(cache_path, search)
+
+    best = search["best"]
+    if best is None:
+        print(f"No decimation within {search['tolerance']}mm; keeping all {len(mesh.triangles)} triangles")
+        return mesh, None
+    print(
+        f"Decimation: {best['strategy']}({best['param']}) -> {best['triangles']} triangles, "
+        f"hausdorff {best['hausdorff']}mm, chamfer {best['chamfer']}mm"
+    )
+    return apply_strategy(mesh, best["strategy"], best["param"]), best
+
+
+def print_candidates(search):
+    print(f"\n{'strategy':10s} {'param':>7s} {'triangles':>10s} {'bytes':>10s} {'hausdorff':>10s} {'chamfer':>9s}")
+    for c in sorted(search["candidates"], key=lambda c: c["bytes"]):
+        flag = "  <- best" if c == search["best"] else ""
+        ok = "" if c["hausdorff"] <= search["tolerance"] else "  (over tolerance)"
+        print(
+            f"{c['strategy']:10s} {c['param']:>7} {c['triangles']:>10d} {c['bytes']:>10d} "
+            f"{c['hausdorff']:>10.4f} {c['chamfer']:>9.4f}{flag}{ok}"
+        )
@@ -0,0 +1,220 @@
+import os
+import glob
+import time
+import hashlib
+
+import numpy as np
+
+from utils import atomic_write_json, load_json
+
+# bump whenever the canonical hash changes, so old index entries are not matched
+DEDUP_VERSION = 2
+GEOMETRY_INDEX_DIR = "./geometry_index"
+
+GEOMETRY_DECIMALS = 3  # mm; vertices are compared after rounding to this many decimals
+PRISM_TOLERANCE = 1e-3  # mm; how far a vertex may sit from an end plane and still count as on it
+
+# how long a worker waits for another worker converting identical geometry before converting it itself
+CLAIM_WAIT_SECONDS = 300.0
+CLAIM_POLL_SECONDS = 0.5
+
+# claims this process holds; released by release_claims() whether or not the conversion succeeded
+_held_claims = set()
+
+
+def geometry_hash(vertices, triangles, decimals=GEOMETRY_DECIMALS, salt=""):
+    # Canonical over vertex order, triangle order and face splits: vertices are rounded and sorted, and triangles
+    # are re-expressed as sorted triples of the sorted vertices' ranks. Winding is ignored
+    rounded = np.round(vertices, decimals) + 0.0  # + 0.0 folds -0.0 into 0.0
+    unique, inverse = np.unique(rounded, axis=0, return_inverse=True)
+    triangles = np.unique(np.sort(inverse.reshape(-1)[triangles], axis=1), axis=0)
+
+    digest = hashlib.sha256(f"v{DEDUP_VERSION}:{salt}".encode())
+    digest.update(np.ascontiguousarray(unique, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(triangles, dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def prism_keys(vertices, triangles):
+    # A part is a prism along an axis when every vertex lies on one of the two end planes, like a plain standoff
+    # or spacer. Replacing the axis coordinate with 0/1 gives a key shared by every length of the same cross-section
+    low, high = vertices.min(axis=0), vertices.max(axis=0)
+    keys = []
+    for axis in range(3):
+        extent = float(high[axis] - low[axis])
+        if extent <= PRISM_TOLERANCE:
+            continue
+        at_high = np.abs(vertices[:, axis] - high[axis]) <= PRISM_TOLERANCE
+        at_low = np.abs(vertices[:, axis] - low[axis]) <= PRISM_TOLERANCE
+        if not np.all(at_low | at_high):
+            continue
+        normalized = vertices.copy()
+        normalized[:, axis] = at_high
+        keys.append(
+            {
+                "key": geometry_hash(normalized, triangles, salt=f"prism{axis}"),
+                "axis": axis,
+                "low": float(low[axis]),
+                "extent": extent,
+            }
+        )
+    return keys
+
+
+def geometry_keys(vertices, triangles):
+    return {"geometry": geometry_hash(vertices, triangles), "prisms": prism_keys(vertices, triangles)}
+
+
+def _record_path(key, index_dir):
+    return os.path.join(index_dir, f"{key}.json")
+
+
+def _claim_path(key, index_dir):
+    # .tmp- prefixed, so utils.remove_temp_files clears claims left by killed workers
+    return os.path.join(index_dir, f".tmp-{key}.claim")
+
+
+def _load_base(record, pid, serialized_dir, glb_dir):
+    # the index only points at a part; its serialized JSON and GLBs decide whether it is still a usable base.
+    # A part is never its own base, which matters when it is rebuilt with unchanged geometry
+    if record is None or record["pid"] == pid:
+        return None
+    base = load_json(os.path.join(serialized_dir, record["pid"] + ".json"))
+    if not base or base.get("geometry_hash") != record["geometry"] or "instance" in base:
+        return None
+    if not all(os.path.exists(os.path.join(glb_dir, lod["file"])) for lod in base.get("lods", [])):
+        return None
+    return base
+
+
+def _lookup(keys, pid, serialized_dir, glb_dir, index_dir):
+    record = load_json(_record_path(keys["geometry"], index_dir))
+    base = _load_base(record, pid, serialized_dir, glb_dir)
+    if base:
+        return {"pid": base["pid"], "geometry": record["geometry"], "axis": None, "scale": 1.0, "offset": 0.0}, base
+
+    for prism in keys["prisms"]:
+        record = load_json(_record_path(prism["key"], index_dir))
+        base = _load_base(record, pid, serialized_dir, glb_dir)
+        if base:
+            # x' = offset + scale * x along the axis maps the base's end planes onto this part's
+            scale = prism["extent"] / record["extent"]
+            return {
+                "pid": base["pid"],
+                "geometry": record["geometry"],
+                "axis": prism["axis"],
+                "scale": round(scale, 6),
+                "offset": round(prism["low"] - record["low"] * scale, 4),
+            }, base
+    return None, None
+
+
+def _claim(key, index_dir):
+    path = _claim_path(key, index_dir)
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w") as f:
+        f.write(str(os.getpid()))
+    _held_claims.add(path)
+    return True
+
+
+def _claimant_alive(key, index_dir):
+    try:
+        with open(_claim_path(key, index_dir)) as f:
+            owner = f.read()
+        if owner:  # empty while its claimant is still writing it
+            os.kill(int(owner), 0)
+        return True
+    except (FileNotFoundError, ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+
+
+def find_instance(keys, pid, serialized_dir, glb_dir, index_dir=GEOMETRY_INDEX_DIR, wait=CLAIM_WAIT_SECONDS):
+    # Returns (instance, base data) when this geometry is already converted, or (None, None) when the caller has to
+    # convert it. In the latter case the caller holds the claim on the exact geometry when possible, so identical
+    # parts in the same batch wait for its result instead of converting it again
+    os.makedirs(index_dir, exist_ok=True)
+    deadline = time.monotonic() + wait
+    while True:
+        instance, base = _lookup(keys, pid, serialized_dir, glb_dir, index_dir)
+        if instance:
+            return instance, base
+        if _claim(keys["geometry"], index_dir):
+            return None, None
+        if not _claimant_alive(keys["geometry"], index_dir):
+            # its worker died without releasing it; take it over on the next pass
+            try:
+                os.remove(_claim_path(keys["geometry"], index_dir))
+            except FileNotFoundError:
+                pass
+            continue
+        if time.monotonic() > deadline:
+            print("Timed out waiting for identical geometry; converting it here")
+            return None, None
+        time.sleep(CLAIM_POLL_SECONDS)
+
+
+def publish(keys, pid, serialized_dir, glb_dir, index_dir=GEOMETRY_INDEX_DIR):
+    # the exact record always points at the latest conversion; a prism record keeps its base while that base
+    # is valid, so the lengths already aliased to it stay valid
+    record = {"pid": pid, "geometry": keys["geometry"]}
+    atomic_write_json(_record_path(keys["geometry"], index_dir), record)
+    for prism in keys["prisms"]:
+        path = _record_path(prism["key"], index_dir)
+        if _load_base(load_json(path), pid, serialized_dir, glb_dir):
+            continue
+        atomic_write_json(path, {**record, "axis": prism["axis"], "low": prism["low"], "extent": prism["extent"]})
+
+
+def release_claims():
+    while _held_claims:
+        path = _held_claims.pop()
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def instance_points(points, instance):
+    # applies an instance's axis scale to base-space points, e.g. the base's convex hull
+    if instance["axis"] is None:
+        return points
+    axis = instance["axis"]
+    return [
+        [round(instance["offset"] + instance["scale"] * v, 3) if i == axis else v for i, v in enumerate(point)]
+        for point in points
+    ]
+
+
+def instance_bases(serialized_dir):
+    # alias pid -> base pid, for every alias in the library
+    bases = {}
+    for json_path in sorted(glob.glob(os.path.join(serialized_dir, "*.json"))):
+        data = load_json(json_path)
+        if data.get("instance"):
+            bases[data["pid"]] = data["instance"]["pid"]
+    return bases
+
+
+def stale_instances(serialized_dir, pids=None):
+    # aliases (in the whole library, or among pids) whose base was removed, rebuilt with different geometry, or
+    # became an alias itself
+    if pids is None:
+        json_paths = sorted(glob.glob(os.path.join(serialized_dir, "*.json")))
+    else:
+        json_paths = [os.path.join(serialized_dir, f"{pid}.json") for pid in sorted(pids)]
+    stale = []
+    for json_path in json_paths:
+        data = load_json(json_path, {})
+        instance = data.get("instance")
+        if not instance:
+            continue
+        base = load_json(os.path.join(serialized_dir, instance["pid"] + ".json"))
+        if not base or base.get("geometry_hash") != instance["geometry"] or "instance" in base:
+            stale.append(data["pid"])
+    return stale
@@ -0,0 +1,182 @@
+import os
+import time
+
+from OCC.Core.TopExp import TopExp_Explorer
+from OCC.Core.TopAbs import TopAbs_FACE, TopAbs_SOLID, TopAbs_OUT, TopAbs_REVERSED
+from OCC.Core.TopoDS import topods
+from OCC.Core.BRepAdaptor import BRepAdaptor_Surface
+from OCC.Core.GeomAbs import GeomAbs_Cylinder, GeomAbs_Plane
+from OCC.Core.BRepBndLib import brepbndlib
+from OCC.Core.Bnd import Bnd_Box
+from OCC.Core.GProp import GProp_GProps
+from OCC.Core.BRepGProp import brepgprop
+from OCC.Core.BRepClass3d import BRepClass3d_SolidClassifier
+from OCC.Core.gp import gp_Vec
+
+from utils import atomic_write_json, load_json
+
+# bump whenever the extraction rules change, so cached results are not reused
+FEATURES_VERSION = 1
+FEATURE_CACHE_DIR = "./feature_cache"
+
+# per-part time budget; extraction stops early (and says so) rather than stalling a batch on a pathological STEP
+FEATURE_TIME_BUDGET = 2.0  # seconds
+
+MIN_HOLE_DIAMETER = 3.5  # mm
+MIN_FACE_EXTENT = 5.0  # mm, in at least two dimensions
+MIN_FACE_AREA = 200.0  # mm^2
+EXTERIOR_OFFSET = 0.5  # mm
+CLASSIFIER_TOLERANCE = 1e-6
+
+
+def get_primary_axis(x, y, z):
+    axis_labels = ["X", "Y", "Z"]
+    components = [abs(x), abs(y), abs(z)]
+    return axis_labels[components.index(max(components))]
+
+
+def _round(values, digits=3):
+    return [round(v, digits) for v in values]
+
+
+def _attachment_point(surf, seen):
+    cylinder = surf.Cylinder()
+    radius = cylinder.Radius()
+    if radius * 2 < MIN_HOLE_DIAMETER:
+        return None
+
+    axis = cylinder.Axis()
+    location = axis.Location()
+    direction = axis.Direction()
+    center = [location.X(), location.Y(), location.Z()]
+    direction = [direction.X(), direction.Y(), direction.Z()]
+
+    # a hole is usually split into two half-cylinder faces sharing one axis
+    key = tuple(_round(center) + _round(direction))
+    if key in seen:
+        return None
+    seen.add(key)
+    return {"center": _round(center), "direction": _round(direction), "radius": round(radius, 3)}
+
+
+def _mating_face(face, surf, classifier):
+    # cheapest rejection first: face bounding box, then area, and only then the point classification
+    bbox = Bnd_Box()
+    brepbndlib.Add(face, bbox)
+    if bbox.IsVoid():
+        return None
+    xmin, ymin, zmin, xmax, ymax, zmax = bbox.Get()
+    if sum(1 for dim in (xmax - xmin, ymax - ymin, zmax - zmin) if dim > MIN_FACE_EXTENT) < 2:
+        return None
+
+    props = GProp_GProps()
+    brepgprop.SurfaceProperties(face, props)
+    if props.Mass() <= MIN_FACE_AREA:
+        return None
+
+    normal = surf.Plane().Axis().Direction()
+    if face.Orientation() == TopAbs_REVERSED:
+        normal.Reverse()
+
+    center = props.CentreOfMass()
+    classifier.Perform(center.Translated(gp_Vec(normal) * EXTERIOR_OFFSET), CLASSIFIER_TOLERANCE)
+    if classifier.State() != TopAbs_OUT:
+        return None
+
+    return {
+        "center": _round([center.X(), center.Y(), center.Z()]),
+        "normal": _round([normal.X(), normal.Y(), normal.Z()]),
+        "axis": get_primary_axis(normal.X(), normal.Y(), normal.Z()),
+        "area": round(props.Mass(), 1),
+    }
+
+
+def _solids(shape):
+    explorer = TopExp_Explorer(shape, TopAbs_SOLID)
+    solids = []
+    while explorer.More():
+        solids.append(explorer.Current())
+        explorer.Next()
+    # shell-only STEP exports have no solids; classify against the whole shape instead
+    return solids or [shape]
+
+
+def extract_features(shape, time_budget=FEATURE_TIME_BUDGET, seen=None):
+    # pass the same `seen` set when extracting a part one solid at a time, so a hole split across solids counts once
+    start = time.perf_counter()
+    attachment_points = []
+    mating_faces = []
+    seen = set() if seen is None else seen
+    truncated = False
+
+    for solid in _solids(shape):
+        # one classifier per solid, re-aimed with Perform() for every face
+        classifier = BRepClass3d_SolidClassifier(solid)
+        explorer = TopExp_Explorer(solid, TopAbs_FACE)
+
+        while explorer.More():
+            if time.perf_counter() - start > time_budget:
+                truncated = True
+                break
+
+            face = topods.Face(explorer.Current())
+            surf = BRepAdaptor_Surface(face, True)
+            surf_type = surf.GetType()
+
+            if surf_type == GeomAbs_Cylinder:
+                point = _attachment_point(surf, seen)
+                if point:
+                    attachment_points.append(point)
+            elif surf_type == GeomAbs_Plane:
+                mating_face = _mating_face(face, surf, classifier)
+                if mating_face:
+                    mating_faces.append(mating_face)
+
+            explorer.Next()
+
+        if truncated:
+            break
+
+    elapsed = time.perf_counter() - start
+    if truncated:
+        print(f"Feature extraction exceeded its {time_budget:.1f}s budget; results are partial")
+
+    return {
+        "attachment_points": attachment_points,
+        "mating_faces": mating_faces,
+        "truncated": truncated,
+        "seconds": round(elapsed, 3),
+    }
+
+
+def merge_features(results):
+    return {
+        "attachment_points": [p for r in results for p in r["attachment_points"]],
+        "mating_faces": [f for r in results for f in r["mating_faces"]],
+        "truncated": any(r["truncated"] for r in results),
+        "seconds": round(sum(r["seconds"] for r in results), 3),
+    }
+
+
+def _cache_path(part_hash, cache_dir):
+    return os.path.join(cache_dir, f"{part_hash}.v{FEATURES_VERSION}.json")
+
+
+def load_cached_features(part_hash, cache_dir=FEATURE_CACHE_DIR):
+    return load_json(_cache_path(part_hash, cache_dir))
+
+
+def store_features(part_hash, features, cache_dir=FEATURE_CACHE_DIR):
+    # partial results are not cached, so a later run with a larger budget can complete them
+    if not features["truncated"]:
+        atomic_write_json(_cache_path(part_hash, cache_dir), features)
+
+
+def cached_features(shape, part_hash, cache_dir=FEATURE_CACHE_DIR):
+    features = load_cached_features(part_hash, cache_dir)
+    if features is not None:
+        return features
+
+    features = extract_features(shape)
+    store_features(part_hash, features, cache_dir)
+    return features
@@ -0,0 +1,80 @@
+import json
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from catalog import CATALOG_PATH, load_catalog
+from llm_stub import LLM_STUB_PORT
+from metrics import percentile
+
+ROUTE_URL = "http://localhost:3000/api/generate-robot-part"
+
+
+def _post_json(url, body, timeout=300):
+    req = urllib.request.Request(url, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def run_session(url, part_names, steps):
+    # one "generate next part" click per step, carrying the placed parts forward the way page.tsx does
+    current = []
+    latencies = []
+    errors = 0
+    for _ in range(steps):
+        start = time.perf_counter()
+        try:
+            parts = _post_json(url, {"currentParts": current, "uncondensedParts": part_names})
+        except Exception as e:
+            errors += 1
+            print(f"Step failed: {e}")
+            continue
+        latencies.append(time.perf_counter() - start)
+        current += [{**part, "name": part["name"] + ".glb"} for part in parts]
+    return {"latencies": latencies, "errors": errors, "parts": len(current)}
+
+
+def load_test(url, part_names, sessions=1, steps=5):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        results = list(pool.map(lambda _: run_session(url, part_names, steps), range(sessions)))
+    wall = time.perf_counter() - start
+
+    latencies = [s for r in results for s in r["latencies"]]
+    report = {
+        "sessions": sessions,
+        "steps": steps,
+        "ok": len(latencies),
+        "errors": sum(r["errors"] for r in results),
+        "parts_placed": sum(r["parts"] for r in results),
+        "wall_seconds": round(wall, 3),
+        "steps_per_second": round(len(latencies) / wall, 2) if wall else None,
+    }
+    if latencies:
+        report["step_seconds"] = {
+            "p50": round(percentile(latencies, 0.5), 3),
+            "p95": round(percentile(latencies, 0.95), 3),
+            "max": round(max(latencies), 3),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Replay the two-stage generation loop against the route and measure end-to-end latency"
+    )
+    parser.add_argument("--url", default=ROUTE_URL, help="generate-robot-part route")
+    parser.add_argument("--sessions", type=int, default=1, help="concurrent design sessions")
+    parser.add_argument("--steps", type=int, default=5, help="generation steps per session")
+    parser.add_argument("--stub-port", type=int, default=LLM_STUB_PORT, help="llm_stub.py port to read stats from")
+    args = parser.parse_args()
+
+    part_names = load_catalog(CATALOG_PATH)["columns"]["pid"]
+    print(json.dumps(load_test(args.url, part_names, args.sessions, args.steps), indent=2))
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{args.stub_port}/stats", timeout=5) as response:
+            print("LLM stand-in:", json.dumps(json.loads(response.read()), indent=2))
+    except OSError:
+        pass
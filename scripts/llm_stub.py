@@ -0,0 +1,233 @@
+import re
+import json
+import time
+import random
+import threading
+import urllib.error
+import urllib.request
+
+from catalog import CATALOG_PATH
+from metrics import percentile
+from utils import atomic_write_json, json_sha256, load_json
+
+# bump whenever the key or the stored response changes, so old recordings are not replayed
+LLM_CACHE_VERSION = 1
+LLM_CACHE_DIR = "./llm_cache"
+LLM_STUB_PORT = 8766
+GROQ_URL = "https://api.groq.com/openai/v1"
+
+STUB_PARTS_PER_STEP = 4
+STUB_SPACING = 150.0  # mm between stub placements
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _message_text(message):
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        content = "".join(part.get("text", "") for part in content)
+    return content
+
+
+def normalize_prompt(messages):
+    # whitespace-insensitive, so re-indenting a prompt template does not invalidate the recordings
+    return [{"role": m["role"], "content": _WHITESPACE.sub(" ", _message_text(m)).strip()} for m in messages]
+
+
+def cache_key(request):
+    # the output format is part of the key: the same prompt in json mode and in text mode answers differently
+    return json_sha256(
+        {
+            "version": LLM_CACHE_VERSION,
+            "model": request.get("model"),
+            "messages": normalize_prompt(request.get("messages", [])),
+            "response_format": request.get("response_format"),
+        }
+    )
+
+
+def load_cached_response(key, cache_dir=LLM_CACHE_DIR):
+    return load_json(f"{cache_dir}/{key}.json")
+
+
+def store_response(key, response, cache_dir=LLM_CACHE_DIR):
+    atomic_write_json(f"{cache_dir}/{key}.json", response, indent=2)
+
+
+def _stub_names(part_names, rng):
+    names = rng.sample(part_names, min(STUB_PARTS_PER_STEP, len(part_names)))
+    return [{"name": name, "reasoning": "stub: deterministic pick"} for name in names]
+
+
+def _stub_poses(prompt):
+    # stage two lists the stage-one parts as one JSON object per line; lay them out on a grid around the origin
+    parts = []
+    for line in prompt.splitlines():
+        line = line.strip()
+        if not (line.startswith("{") and '"name"' in line):
+            continue
+        try:
+            parts.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+
+    poses = []
+    for i, part in enumerate(parts):
+        height = part.get("bbSize", [0, 0, 0])[1]
+        poses.append(
+            {
+                "name": part["name"],
+                "position": [((i % 4) - 1.5) * STUB_SPACING, max(height, 0) / 2, (i // 4) * STUB_SPACING],
+                "rotation": [0, 0, 0],
+                "reasoning": "stub: grid placement",
+            }
+        )
+    return poses
+
+
+def stub_completion(request, part_names):
+    # Deterministic for a given prompt: the key seeds every choice. The AI SDK's array output asks for an
+    # {"elements": [...]} object, and only the stage-two schema mentions "position"
+    prompt = "\n".join(_message_text(m) for m in request.get("messages", []))
+    key = cache_key(request)
+    if '"position"' in prompt:
+        elements = _stub_poses(prompt)
+    else:
+        elements = _stub_names(part_names, random.Random(key))
+    content = json.dumps({"elements": elements})
+
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": f"chatcmpl-stub-{key[:24]}",
+        "object": "chat.completion",
+        "created": 0,
+        "model": request.get("model"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def forward(upstream, request, authorization):
+    req = urllib.request.Request(
+        f"{upstream}/chat/completions",
+        data=json.dumps(request).encode(),
+        headers={"Content-Type": "application/json", "Authorization": authorization or ""},
+    )
+    with urllib.request.urlopen(req, timeout=120) as response:
+        return json.loads(response.read())
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "hits": 0, "misses": 0, "upstream": 0, "stub": 0, "errors": 0}
+        self.latencies_ms = []
+
+    def add(self, outcome, source, ms):
+        with self.lock:
+            self.counts["requests"] += 1
+            self.counts[outcome] += 1
+            if source:
+                self.counts[source] += 1
+            self.latencies_ms.append(ms)
+
+    def summary(self):
+        with self.lock:
+            latencies = list(self.latencies_ms)
+            summary = dict(self.counts)
+        if latencies:
+            summary["latency_ms"] = {
+                "p50": round(percentile(latencies, 0.5), 2),
+                "p95": round(percentile(latencies, 0.95), 2),
+                "max": round(max(latencies), 2),
+            }
+        return summary
+
+
+def serve(port=LLM_STUB_PORT, upstream=None, cache_dir=LLM_CACHE_DIR, catalog_path=CATALOG_PATH, latency_ms=0.0):
+    # Speaks the OpenAI chat-completions API that @ai-sdk/groq calls. Cached responses are replayed first;
+    # misses go to the upstream (and are recorded) when one is given, or to the deterministic stub otherwise
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    catalog = load_json(catalog_path)
+    part_names = catalog["columns"]["pid"] if catalog else []
+    stats = Stats()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/stats":
+                self.send_error(404)
+                return
+            self._send_json(200, stats.summary())
+
+        def do_POST(self):
+            if not self.path.endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if request.get("stream"):
+                self._send_json(400, {"error": {"message": "streaming is not supported by the stub"}})
+                return
+
+            start = time.perf_counter()
+            key = cache_key(request)
+            response = load_cached_response(key, cache_dir)
+            outcome, source = ("hits", None) if response else ("misses", "upstream" if upstream else "stub")
+            try:
+                if response is None and upstream:
+                    response = forward(upstream, request, self.headers.get("Authorization"))
+                    store_response(key, response, cache_dir)
+                elif response is None:
+                    time.sleep(latency_ms / 1000)
+                    response = stub_completion(request, part_names)
+            except urllib.error.HTTPError as e:
+                stats.add("errors", None, (time.perf_counter() - start) * 1000)
+                self._send_json(e.code, json.loads(e.read() or b"{}"))
+                return
+            except urllib.error.URLError as e:
+                stats.add("errors", None, (time.perf_counter() - start) * 1000)
+                self._send_json(502, {"error": {"message": f"upstream unreachable: {e.reason}"}})
+                return
+
+            stats.add(outcome, source, (time.perf_counter() - start) * 1000)
+            self._send_json(200, response)
+
+        def log_message(self, *args):
+            pass
+
+    mode = f"recording from {upstream}" if upstream else "stub"
+    print(f"LLM stand-in ({mode}) listening on http://127.0.0.1:{port}/openai/v1; set GROQ_BASE_URL to that")
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local OpenAI/Groq-compatible stand-in with a response cache")
+    parser.add_argument("--port", type=int, default=LLM_STUB_PORT)
+    parser.add_argument("--cache-dir", default=LLM_CACHE_DIR)
+    parser.add_argument(
+        "--record",
+        nargs="?",
+        const=GROQ_URL,
+        default=None,
+        metavar="URL",
+        help=f"forward cache misses to this API and record them (default {GROQ_URL})",
+    )
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated model latency for stub responses")
+    args = parser.parse_args()
+
+    serve(args.port, args.record, args.cache_dir, latency_ms=args.latency_ms)
@@ -0,0 +1,81 @@
+from itertools import chain
+
+import numpy as np
+
+from OCC.Core.BRep import BRep_Tool
+from OCC.Core.TopExp import TopExp_Explorer
+from OCC.Core.TopAbs import TopAbs_FACE, TopAbs_REVERSED
+from OCC.Core.TopLoc import TopLoc_Location
+from OCC.Core.TopoDS import topods
+
+
+def _transform_matrix(location):
+    transform = location.Transformation()
+    return np.array([[transform.Value(r, c) for c in range(1, 5)] for r in range(1, 4)])
+
+
+def shape_to_arrays(shape):
+    # Vertex/index buffers straight from a meshed shape's per-face triangulations, with no GLB in between. This is
+    # a copy, not a zero-copy view: pythonocc hands nodes and triangles over one element at a time, so they are
+    # streamed into preallocated arrays with np.fromiter rather than built up as lists of tuples.
+    # Faces are not welded to each other here; arrays_to_mesh merges the shared boundary vertices
+    vertex_chunks = []
+    triangle_chunks = []
+    offset = 0
+
+    explorer = TopExp_Explorer(shape, TopAbs_FACE)
+    while explorer.More():
+        face = topods.Face(explorer.Current())
+        location = TopLoc_Location()
+        triangulation = BRep_Tool.Triangulation(face, location)
+        explorer.Next()
+        if triangulation is None:
+            continue
+
+        node_count = triangulation.NbNodes()
+        nodes = np.fromiter(
+            chain.from_iterable(triangulation.Node(i).Coord() for i in range(1, node_count + 1)),
+            dtype=np.float64,
+            count=3 * node_count,
+        ).reshape(-1, 3)
+        if not location.IsIdentity():
+            matrix = _transform_matrix(location)
+            nodes = nodes @ matrix[:, :3].T + matrix[:, 3]
+
+        triangle_count = triangulation.NbTriangles()
+        triangles = np.fromiter(
+            chain.from_iterable(triangulation.Triangle(i).Get() for i in range(1, triangle_count + 1)),
+            dtype=np.int32,
+            count=3 * triangle_count,
+        ).reshape(-1, 3)
+        triangles -= 1  # OCC indices are 1-based
+        if face.Orientation() == TopAbs_REVERSED:
+            triangles = triangles[:, ::-1]
+
+        vertex_chunks.append(nodes)
+        triangle_chunks.append(triangles + offset)
+        offset += node_count
+
+    if not vertex_chunks:
+        return np.zeros((0, 3), dtype=np.float64), np.zeros((0, 3), dtype=np.int32)
+    return np.concatenate(vertex_chunks), np.concatenate(triangle_chunks)
+
+
+def arrays_to_mesh(vertices, triangles):
+    import open3d as o3d
+
+    mesh = o3d.geometry.TriangleMesh(
+        o3d.utility.Vector3dVector(vertices),
+        o3d.utility.Vector3iVector(np.ascontiguousarray(triangles)),
+    )
+    mesh.remove_duplicated_vertices()
+    return mesh
+
+
+def clean_mesh(mesh):
+    mesh.remove_duplicated_vertices()
+    mesh.remove_duplicated_triangles()
+    mesh.remove_degenerate_triangles()
+    mesh.remove_non_manifold_edges()
+    mesh.compute_vertex_normals()
+    return mesh
@@ -0,0 +1,147 @@
+import os
+import sys
+import json
+import time
+from contextlib import contextmanager
+
+METRICS_PATH = "./metrics.jsonl"
+
+# the record for the part this process is converting; batch.py opens and closes it around each file
+_current = None
+
+
+def _reset_peak_rss():
+    # Linux resets this process's high-water mark (VmHWM) when 5 is written to clear_refs, so the next reading
+    # covers only the current part; a worker's lifetime peak would repeat its largest part on every later record
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def rss_mb(pid="self"):
+    # current resident set of this process or of a worker; None where /proc is unavailable
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError):
+        return None
+
+
+def begin(filepath):
+    global _current
+    try:
+        input_bytes = os.path.getsize(filepath)
+    except OSError:
+        input_bytes = 0
+    _current = {
+        "file": filepath,
+        "input_bytes": input_bytes,
+        "stages": {},
+        "rss_mb": {},
+        "_peak_reset": _reset_peak_rss(),
+        "_sampled_peak": rss_mb(),
+    }
+
+
+def _sample_rss():
+    # the largest resident set seen at a stage boundary; the fallback peak where VmHWM can't be reset
+    current = rss_mb()
+    if current is not None and (_current["_sampled_peak"] or 0) < current:
+        _current["_sampled_peak"] = current
+    return current
+
+
+@contextmanager
+def stage(name):
+    if _current is None:
+        yield
+        return
+    _sample_rss()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        # stages can repeat (one decimation per LOD), so their times accumulate
+        _current["stages"][name] = round(_current["stages"].get(name, 0.0) + time.perf_counter() - start, 4)
+        _current["rss_mb"][name] = _sample_rss()
+
+
+def record(**values):
+    if _current is not None:
+        _current.update(values)
+
+
+def finish(seconds):
+    global _current
+    result, _current = _current, None
+    if result is not None:
+        result["seconds"] = round(seconds, 4)
+        reset, sampled = result.pop("_peak_reset"), result.pop("_sampled_peak")
+        peak = _peak_rss_mb() if reset else None
+        # this part's own peak: the reset high-water mark, or else the largest stage-boundary sample
+        result["peak_rss_mb"] = peak if peak is not None else sampled
+        result["peak_rss_source"] = "hwm" if peak is not None else "sampled"
+    return result
+
+
+def open_log(path=METRICS_PATH):
+    return open(path, "a", buffering=1)
+
+
+def load_records(path=METRICS_PATH):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def report(records, top=10):
+    if not records:
+        print("No metrics recorded")
+        return
+
+    print(f"\nSlowest {min(top, len(records))} of {len(records)} parts:")
+    for r in sorted(records, key=lambda r: r["seconds"], reverse=True)[:top]:
+        slowest_stage = max(r["stages"], key=r["stages"].get) if r["stages"] else "-"
+        print(
+            f"  {r['seconds']:8.2f}s  {os.path.basename(r['file']):40s} "
+            f"{r['input_bytes'] / 1e6:7.2f}MB in  "
+            f"{r.get('triangles_in', '-')} -> {r.get('triangles_out', '-')} tris  "
+            f"peak {r.get('peak_rss_mb')}MB  (slowest stage: {slowest_stage})"
+        )
+
+    stages = {}
+    for r in records:
+        for name, seconds in r["stages"].items():
+            stages.setdefault(name, []).append((seconds, r["file"]))
+
+    print("\nStages by total time:")
+    print(f"  {'stage':16s} {'total':>9s} {'p50':>8s} {'p95':>8s} {'max':>8s}  worst part")
+    for name, samples in sorted(stages.items(), key=lambda item: -sum(s for s, _ in item[1])):
+        times = [s for s, _ in samples]
+        worst_seconds, worst_file = max(samples)
+        print(
+            f"  {name:16s} {sum(times):8.2f}s {percentile(times, 0.5):7.3f}s "
+            f"{percentile(times, 0.95):7.3f}s {worst_seconds:7.3f}s  {os.path.basename(worst_file)}"
+        )
+
+
+if __name__ == "__main__":
+    report(load_records(sys.argv[1] if len(sys.argv) > 1 else METRICS_PATH))
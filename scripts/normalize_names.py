@@ -0,0 +1,255 @@
+import os
+import re
+import glob
+
+from utils import atomic_write_json, load_json
+
+MODELS_DIR = "./models"
+SERIALIZED_DIR = "./serialized"
+ATTRIBUTES_PATH = "./part_attributes.json"
+
+_WORD_SPLIT = re.compile(r"[-_]")
+
+
+def _camel(raw):
+    return "".join(chunk.capitalize() for chunk in _WORD_SPLIT.split(raw))
+
+
+def _number(text):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def _grid(m):
+    name, rows, cols = m.groups()
+    return f"{_camel(name)}{rows}x{cols}H", {"family": _camel(name), "grid": [int(rows), int(cols)]}
+
+
+def _single(m):
+    name, holes = m.groups()
+    return f"{_camel(name)}{holes}H", {"family": _camel(name), "holes": int(holes)}
+
+
+def _spacer_full(m):
+    id_val, name, od_val, length = m.groups()
+    attributes = {"family": _camel(name), "id": _number(id_val), "od": _number(od_val), "length": _number(length)}
+    return f"{_camel(name)}{id_val}ID{od_val}OD{length}", attributes
+
+
+def _spacer_len(m):
+    od_val, name, length = m.groups()
+    return f"{_camel(name)}{length}", {"family": _camel(name), "od": _number(od_val), "length": _number(length)}
+
+
+def _gear(m):
+    name, teeth = m.groups()
+    return f"{_camel(name)}{teeth}T", {"family": _camel(name), "teeth": int(teeth)}
+
+
+def _gear_spline(m):
+    gear_type, gear_teeth, spline_teeth = m.groups()
+    family = _camel(gear_type) + "Gear"
+    teeth = spline_teeth or gear_teeth
+    return f"{family}{teeth}T", {"family": family, "teeth": int(teeth)}
+
+
+def _standoff(m):
+    od_val, length_val = m.groups()
+    attributes = {"family": "Standoff"}
+    # either side may carry a unit or other text (6mmODx12mmStandoff); only a leading number is an attribute
+    for key, text in (("length", length_val), ("od", od_val)):
+        number = re.match(r"^(\d+(?:\.\d+)?)", text)
+        if number:
+            attributes[key] = _number(number.group(1))
+    return f"Standoff{length_val}", attributes
+
+
+# vendor file names -> (normalized stem, attributes), compiled once and tried in order; the first match wins
+SERIES_PATTERNS = [
+    # Grid-style holes (e.g. Grid_Plate_3_x_5_Hole)
+    (re.compile(r"^\d{4}_Series_([A-Za-z\-_]+)_(\d+)_x_(\d+)_Hole.*\.STEP$"), _grid),
+    # Single hole count (e.g. U-Beam_3_Hole)
+    (re.compile(r"^\d{4}_Series_([A-Za-z\-_]+)_(\d+)_Hole.*\.STEP$"), _single),
+    # Spacer with ID, OD, and Length
+    (
+        re.compile(r"^\d{4}_Series_(\d+(?:\.\d+)?)mm_ID_([A-Za-z\-_]+)_(\d+(?:\.\d+)?)mm_OD_(\d+(?:\.\d+)?)mm.*\.STEP$"),
+        _spacer_full,
+    ),
+    # Spacer with only length
+    (re.compile(r"^\d{4}_Series_(\d+)mm_OD_([A-Za-z\-_]+)_(\d+(?:\.\d+)?)mm.*\.STEP$"), _spacer_len),
+    # Gears: e.g. Aluminum_MOD_0.8_Hub_Mount_Gear_14mm_Bore_48_Tooth
+    (re.compile(r"^\d{4}_Series_.*?_(Hub[_\-]Mount[_\-]Gear).*?_(\d+)_Tooth.*\.STEP$"), _gear),
+    # Gear with possible spline teeth (e.g. Servo_Gear_25_Tooth_Spline_15_Tooth), anywhere in the name
+    (
+        re.compile(
+            r"^.*?_((?:Servo|Pinion|Hub[-_]Mount|Face[-_]Mount))[-_]Gear[_\w]*_(\d+)_Tooth(?:_Spline_(\d+)_Tooth)?",
+            re.IGNORECASE,
+        ),
+        _gear_spline,
+    ),
+]
+
+# *N*ODx*N*Standoff
+STANDOFF_PATTERNS = [(re.compile(r"^(.*)ODx(.*)Standoff\.STEP$"), _standoff)]
+
+VENDOR_PATTERNS = SERIES_PATTERNS + STANDOFF_PATTERNS
+
+# names the patterns above produce, e.g. GridPlate3x5H, UChannel9H, Spacer6ID8OD2, HubMountGear48T, Standoff12
+NORMALIZED_PATTERN = re.compile(
+    r"^(?P<family>[A-Za-z]+?)"
+    r"(?:(?P<rows>\d+)x(?P<cols>\d+)H"
+    r"|(?P<holes>\d+)H"
+    r"|(?P<id>\d+(?:\.\d+)?)ID(?P<od>\d+(?:\.\d+)?)OD(?P<length>\d+(?:\.\d+)?)"
+    r"|(?P<teeth>\d+)T"
+    r"|(?P<plain_length>\d+(?:\.\d+)?))?$"
+)
+
+# families whose bare trailing number is a length in mm (Standoff12, Shaft100); elsewhere it is a model number
+LENGTH_FAMILIES = re.compile(r"(?:Standoff|Shaft|Spacer|Channel|Beam|Rail|Tube|Extrusion)$")
+
+
+def match_vendor_name(filename, patterns=VENDOR_PATTERNS):
+    for pattern, build in patterns:
+        m = pattern.match(filename)
+        if m:
+            return build(m)
+    return None
+
+
+def part_attributes(pid):
+    # attributes of an already normalized name; names outside the scheme are their own family
+    m = NORMALIZED_PATTERN.match(pid)
+    if not m:
+        return {"family": pid}
+    groups = m.groupdict()
+    attributes = {"family": groups["family"]}
+    if groups["rows"]:
+        attributes["grid"] = [int(groups["rows"]), int(groups["cols"])]
+    elif groups["holes"]:
+        attributes["holes"] = int(groups["holes"])
+    elif groups["id"]:
+        attributes.update(id=_number(groups["id"]), od=_number(groups["od"]), length=_number(groups["length"]))
+    elif groups["teeth"]:
+        attributes["teeth"] = int(groups["teeth"])
+    elif groups["plain_length"]:
+        if not LENGTH_FAMILIES.search(groups["family"]):
+            return {"family": pid}  # e.g. Motor5203: a model number, not a length
+        attributes["length"] = _number(groups["plain_length"])
+    return attributes
+
+
+def plan_renames(models_dir=MODELS_DIR, patterns=VENDOR_PATTERNS):
+    # one pass over the directory: each file is matched once, and its attributes come from that same match
+    names = sorted(name for name in os.listdir(models_dir) if name.lower().endswith(".step"))
+    existing = set(names)
+    renames = []
+    index = {}
+    targets = {}
+
+    for name in names:
+        stem, extension = os.path.splitext(name)
+        match = match_vendor_name(name, patterns)
+        if match is None:
+            # not renamed in this pass; a vendor name still yields its attributes under the name it keeps
+            vendor = match_vendor_name(name)
+            index.setdefault(stem, vendor[1] if vendor else part_attributes(stem))
+            continue
+        new_stem, attributes = match
+        new_name = new_stem + extension
+        rename = {"from": name, "to": new_name, "attributes": attributes}
+        if new_name == name:
+            index[stem] = attributes
+            continue
+        if new_name in targets:
+            rename["conflict"] = f"also the target of {targets[new_name]}"
+        elif new_name in existing:
+            rename["conflict"] = "target already exists"
+        else:
+            targets[new_name] = name
+            index[new_stem] = attributes
+        if "conflict" in rename:
+            # not renamed, so the part keeps its current name and is indexed under it
+            index[stem] = attributes
+        renames.append(rename)
+
+    return {"renames": renames, "index": dict(sorted(index.items()))}
+
+
+def print_plan(plan):
+    for rename in plan["renames"]:
+        if "conflict" in rename:
+            print(f"Conflict: {rename['from']} → {rename['to']} ({rename['conflict']})")
+        else:
+            print(f"Renaming: {rename['from']} → {rename['to']}")
+    print(f"{len(plan['index'])} parts indexed")
+
+
+def merge_attributes(index, serialized_dir=SERIALIZED_DIR, pids=None):
+    # serialized parts carry their attributes, so consumers filter on fields instead of parsing names
+    updated = 0
+    if pids is None:
+        json_paths = glob.glob(os.path.join(serialized_dir, "*.json"))
+    else:
+        json_paths = [os.path.join(serialized_dir, pid + ".json") for pid in pids]
+    for json_path in json_paths:
+        data = load_json(json_path)
+        if data is None:
+            continue
+        attributes = index.get(data["pid"]) or part_attributes(data["pid"])
+        if data.get("attributes") != attributes:
+            data["attributes"] = attributes
+            atomic_write_json(json_path, data, indent=4)
+            updated += 1
+    return updated
+
+
+def normalize_file(filepath, index_path=ATTRIBUTES_PATH):
+    # a single file's share of plan_renames + apply_plan, for files that arrive one at a time; returns the new path
+    directory, name = os.path.split(filepath)
+    stem, extension = os.path.splitext(name)
+    match = match_vendor_name(name)
+    if match:
+        new_stem, attributes = match
+        target = os.path.join(directory, new_stem + extension)
+        if target == filepath or not os.path.exists(target):
+            if target != filepath:
+                print(f"Renaming: {name} → {new_stem + extension}")
+                os.rename(filepath, target)
+            filepath, stem = target, new_stem
+        else:
+            print(f"Conflict: {name} → {new_stem + extension} (target already exists)")
+    else:
+        attributes = part_attributes(stem)
+
+    index = load_json(index_path, {})
+    if index.get(stem) != attributes:
+        index[stem] = attributes
+        atomic_write_json(index_path, dict(sorted(index.items())), indent=2)
+    return filepath
+
+
+def apply_plan(plan, models_dir=MODELS_DIR, index_path=ATTRIBUTES_PATH, serialized_dir=SERIALIZED_DIR):
+    for rename in plan["renames"]:
+        if "conflict" in rename:
+            continue
+        os.rename(os.path.join(models_dir, rename["from"]), os.path.join(models_dir, rename["to"]))
+    atomic_write_json(index_path, plan["index"], indent=2)
+    updated = merge_attributes(plan["index"], serialized_dir)
+    print(f"Saved attribute index: {index_path}; updated {updated} serialized parts")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Normalize STEP file names and index their attributes")
+    parser.add_argument("--apply", action="store_true", help="rename the files and write the index (default: dry run)")
+    parser.add_argument("--models", default=MODELS_DIR, help="directory of STEP files")
+    parser.add_argument("--index", default=ATTRIBUTES_PATH, help="where to write the pid → attributes index")
+    args = parser.parse_args()
+
+    plan = plan_renames(args.models)
+    print_plan(plan)
+    if args.apply:
+        apply_plan(plan, args.models, args.index)
+    else:
+        print("Dry run; pass --apply to rename and write the index")
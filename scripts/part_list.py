@@ -0,0 +1,110 @@
+import re
+
+# Port of the condensing page.tsx used to run on every page load; the catalog now carries its output.
+# e.g. Standoff3..Standoff12, Standoff14, Standoff16, Standoff18 -> "Standoff:3-12,14-18x2"
+
+_TOKEN = re.compile(r"\d+|\D+")
+_PREFIX = re.compile(r"^[^\d]+")
+_NATURAL = re.compile(r"(\d+)")
+
+
+def _tokenize(part):
+    return _TOKEN.findall(part)
+
+
+def condense_numbers(nums):
+    # runs of 3+ numbers with a constant step of at most 4 become start-end, with xN for steps above 1
+    nums = sorted(set(nums))
+    result = []
+    i = 0
+    while i < len(nums):
+        start = nums[i]
+        j = i + 1
+        step = None
+        while j < len(nums):
+            diff = nums[j] - nums[j - 1]
+            if step is None:
+                step = diff
+            if diff != step:
+                break
+            j += 1
+
+        if (step is None or step <= 4) and j - i >= 3:
+            result.append(f"{start}-{nums[j - 1]}{'' if step == 1 else f'x{step}'}")
+        else:
+            result.extend(str(n) for n in nums[i:j])
+        i = j
+    return result
+
+
+def _group_by_prefix(parts):
+    # the text before the first number; dicts keep insertion order, like the JS object did
+    groups = {}
+    for part in parts:
+        prefix = ""
+        for token in _tokenize(part):
+            if token.isdigit():
+                break
+            prefix += token
+        groups.setdefault(prefix, []).append(part)
+    return groups
+
+
+def _cartesian(arrays):
+    combos = [[]]
+    for options in arrays:
+        combos = [combo + [option] for combo in combos for option in options]
+    return combos
+
+
+def _natural_key(text):
+    return [int(chunk) if chunk.isdigit() else chunk.casefold() for chunk in _NATURAL.split(text)]
+
+
+def _shared_prefix(strings):
+    if not strings:
+        return ""
+    prefix = strings[0]
+    for s in strings[1:]:
+        while not s.startswith(prefix):
+            prefix = prefix[:-1]
+            if not prefix:
+                return ""
+    return prefix
+
+
+def _condense_group(parts):
+    if len(parts) <= 1:
+        return parts
+
+    m = _PREFIX.match(parts[0])
+    prefix = m.group(0) if m else ""
+    suffixes = [p[len(prefix):] for p in parts]
+
+    # grid sizes like 3x5H are listed as-is rather than expanded into ranges
+    if any("x" in s for s in suffixes):
+        return [prefix + ",".join(sorted(suffixes, key=_natural_key))]
+
+    tokenized = [_tokenize(s) for s in suffixes]
+    options = []
+    for i, token in enumerate(tokenized[0]):
+        if all(i < len(tokens) and tokens[i].isdigit() for tokens in tokenized):
+            options.append(condense_numbers([int(tokens[i]) for tokens in tokenized]))
+        else:
+            options.append([token])
+
+    condensed = [prefix + "".join(tokens) for tokens in _cartesian(options)]
+    shared = _shared_prefix(condensed)
+    return [shared + ":" + ",".join(p[len(shared):] for p in condensed)]
+
+
+def condense_part_list(parts):
+    return [" ".join(_condense_group(group)) for group in _group_by_prefix(parts).values()]
+
+
+if __name__ == "__main__":
+    import sys
+    from catalog import CATALOG_PATH, load_catalog
+
+    catalog = load_catalog(sys.argv[1] if len(sys.argv) > 1 else CATALOG_PATH)
+    print("\n".join(condense_part_list(catalog["columns"]["pid"])))
@@ -4,6 +4,9 @@ from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
 from OCC.Extend.DataExchange import write_gltf_file
 import open3d as o3d
 
+from decimation import print_candidates, search_decimation
+from meshdata import arrays_to_mesh, shape_to_arrays
+
 
 def load_step(file_path):
     step_reader = STEPControl_Reader()
@@ -27,12 +30,24 @@ def shape_to_glb(shape, output_path):
     print(f"Saved GLB file: {output_path}")
 
 
+def shape_to_mesh(shape):
+    # in-memory hand-off from the OCC triangulation, instead of writing and re-reading a GLB
+    vertices, triangles = shape_to_arrays(shape)
+    return arrays_to_mesh(vertices, triangles)
+
+
 def simplify_glb_vertex_clustering(input_glb_path, output_glb_path, voxel_divisor=32):
     mesh = o3d.io.read_triangle_mesh(input_glb_path)
 
     if mesh.is_empty():
         raise Exception("Failed to load mesh from GLB file with Open3D")
 
+    simplified_mesh = simplify_mesh_vertex_clustering(mesh, voxel_divisor)
+    o3d.io.write_triangle_mesh(output_glb_path, simplified_mesh)
+    print(f"Simplified GLB saved: {output_glb_path}")
+
+
+def simplify_mesh_vertex_clustering(mesh, voxel_divisor=32):
     bbox = mesh.get_max_bound() - mesh.get_min_bound()
     voxel_size = max(bbox) / voxel_divisor
     print(f"Voxel size for clustering: {voxel_size:e}")
@@ -54,13 +69,13 @@ def simplify_glb_vertex_clustering(input_glb_path, output_glb_path, voxel_diviso
     )
 
     print("Is simplified mesh watertight? ", simplified_mesh.is_watertight())
-
-    o3d.io.write_triangle_mesh(output_glb_path, simplified_mesh)
-    print(f"Simplified GLB saved: {output_glb_path}")
+    return simplified_mesh
 
 def simplify_glb_decimation(input_glb_path, output_glb_path, decimation_factor=0.5):
     mesh = o3d.io.read_triangle_mesh(input_glb_path)
+    o3d.io.write_triangle_mesh(output_glb_path, simplify_mesh_decimation(mesh, decimation_factor))
 
+def simplify_mesh_decimation(mesh, decimation_factor=0.5):
     simplified_mesh = mesh.simplify_quadric_decimation(
         target_number_of_triangles=int(len(mesh.triangles) * decimation_factor)
     )
@@ -70,8 +85,7 @@ def simplify_glb_decimation(input_glb_path, output_glb_path, decimation_factor=0
     simplified_mesh.remove_degenerate_triangles()
     simplified_mesh.remove_non_manifold_edges()
     simplified_mesh.compute_vertex_normals()
-
-    o3d.io.write_triangle_mesh(output_glb_path, simplified_mesh)
+    return simplified_mesh
 
 if __name__ == "__main__":
     step_path = "./models/WormGearSet.STEP"
@@ -80,9 +94,11 @@ if __name__ == "__main__":
 
     shape = load_step(step_path)
     mesh_shape(shape, deflection=0.1)
+    # before shape_to_glb: write_gltf_file cleans the shape and remeshes it at its own default deflection
+    mesh = shape_to_mesh(shape)
     shape_to_glb(shape, glb_original)
 
-    simplify_glb_vertex_clustering(glb_original, f"{glb_simplified}_vc.glb", voxel_divisor=512)
-    simplify_glb_decimation(glb_original, f"{glb_simplified}_dc.glb", decimation_factor=0.5)
-    # for voxel_divisor in range(32, 68, 4):
-        # simplify_glb_vertex_clustering(glb_original, f"{glb_simplified}_{voxel_divisor}.glb", voxel_divisor=voxel_divisor)
+    o3d.io.write_triangle_mesh(f"{glb_simplified}_vc.glb", simplify_mesh_vertex_clustering(mesh, voxel_divisor=512))
+    o3d.io.write_triangle_mesh(f"{glb_simplified}_dc.glb", simplify_mesh_decimation(mesh, decimation_factor=0.5))
+    # the sweep serialize_and_reduce runs per part: both strategies over decimation.DECIMATION_GRID, scored by error and size
+    print_candidates(search_decimation(mesh))
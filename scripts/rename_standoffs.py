@@ -1,20 +1,9 @@
-import os
-import re
+from normalize_names import MODELS_DIR, STANDOFF_PATTERNS, apply_plan, plan_renames, print_plan
 
-FOLDER_PATH = "./models"
+FOLDER_PATH = MODELS_DIR
 
-for filename in os.listdir(FOLDER_PATH):
-    if filename.endswith(".STEP"):
-        # match pattern *N*ODx*N*Standoff
-        match = re.match(r"^(.*)ODx(.*)Standoff.STEP", filename)
-        if match:
-            od_value, standoff_value = match.groups()
-            new_name = f"Standoff{standoff_value}.STEP"
-
-            old_path = os.path.join(FOLDER_PATH, filename)
-            new_path = os.path.join(FOLDER_PATH, new_name)
-
-            print(f"Renaming: {filename} → {new_name}")
-            os.rename(old_path, new_path)
-        else:
-            print(f"Skipped: {filename} (pattern not matched)")
+# renames *N*ODx*N*Standoff files in place; normalize_names.py covers every pattern and has a dry run
+if __name__ == "__main__":
+    plan = plan_renames(FOLDER_PATH, STANDOFF_PATTERNS)
+    print_plan(plan)
+    apply_plan(plan, FOLDER_PATH)
@@ -1,38 +1,20 @@
-import wx
 import os
-import json
-import glob
 
+from batch import batch_options, find_step_files, make_parser, run_batch
+from features import cached_features
+from utils import atomic_output, atomic_write_json, file_sha256
+
+# the viewer (wx, SimpleGui, AIS) and the glTF exporter are imported where they are used, so a
+# headless conversion never loads a GUI toolkit
 from OCC.Core.STEPControl import STEPControl_Reader
 from OCC.Core.BRepBndLib import brepbndlib
 from OCC.Core.Bnd import Bnd_Box
-from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeSphere
-from OCC.Core.TopExp import TopExp_Explorer
-from OCC.Core.TopAbs import TopAbs_FACE
-from OCC.Core.GProp import GProp_GProps
-from OCC.Core.BRepGProp import brepgprop
-from OCC.Display.SimpleGui import init_display
-from OCC.Core.gp import gp_Pnt
-from OCC.Core.BRepAdaptor import BRepAdaptor_Surface
-from OCC.Core.GeomAbs import GeomAbs_Cylinder, GeomAbs_Plane
 from OCC.Core.IFSelect import IFSelect_RetDone
-from OCC.Extend.DataExchange import write_gltf_file
-from OCC.Core.TopoDS import topods
-from OCC.Core.AIS import AIS_Shape
-
-from OCC.Core.BRepClass3d import BRepClass3d_SolidClassifier
-from OCC.Core.TopAbs import TopAbs_OUT
-from OCC.Core.BRepAdaptor import BRepAdaptor_Surface
-from OCC.Core.gp import gp_Pnt, gp_Vec
-from OCC.Core.GeomLProp import GeomLProp_SLProps
-import open3d as o3d
 
 MODELS_DIR = "./models"
 GLB_DIR = "./glb"
 SERIALIZED_DIR = "./serialized"
 
-os.makedirs(GLB_DIR, exist_ok=True)
-os.makedirs(SERIALIZED_DIR, exist_ok=True)
 
 
 def get_bounding_box(shape):
@@ -46,186 +28,15 @@ def get_bounding_box(shape):
         "center": center,
     }
 
-def find_attachment_points(shape):
-    explorer = TopExp_Explorer(shape, TopAbs_FACE)
-    attachment_points = []
-    seen = set()
-
-    while explorer.More():
-        face = topods.Face(explorer.Current())
-        surf = BRepAdaptor_Surface(face, True)
-        surf_type = surf.GetType()
-
-        if surf_type == GeomAbs_Cylinder:
-            cylinder = surf.Cylinder()
-            radius = cylinder.Radius()
-            axis = cylinder.Axis()
-            location = axis.Location()
-            direction = axis.Direction()
-
-            if radius * 2 >= 3.5:  # Diameter filter
-                key = (
-                    round(location.X(), 3),
-                    round(location.Y(), 3),
-                    round(location.Z(), 3),
-                    round(direction.X(), 3),
-                    round(direction.Y(), 3),
-                    round(direction.Z(), 3),
-                )
-                if key not in seen:
-                    seen.add(key)
-                    attachment_points.append(
-                        {
-                            "center": [location.X(), location.Y(), location.Z()],
-                            "direction": [direction.X(), direction.Y(), direction.Z()],
-                            "radius": radius,
-                        }
-                    )
-        explorer.Next()
-
-    return attachment_points
-
-def get_primary_axis(x, y, z):
-    axis_labels = ["X", "Y", "Z"]
-    components = [abs(x), abs(y), abs(z)]
-    return axis_labels[components.index(max(components))]
-
-
-def get_face_normal_and_uv_samples(face, samples=3):
-    surf_adapt = BRepAdaptor_Surface(face, True)
-    u_min, u_max = surf_adapt.FirstUParameter(), surf_adapt.LastUParameter()
-    v_min, v_max = surf_adapt.FirstVParameter(), surf_adapt.LastVParameter()
-
-    geom_surface = surf_adapt.Surface().Surface()
-    normals = []
-    points = []
-
-    for i in range(samples):
-        for j in range(samples):
-            u = u_min + (u_max - u_min) * (i + 0.5) / samples
-            v = v_min + (v_max - v_min) * (j + 0.5) / samples
-            props = GeomLProp_SLProps(geom_surface, u, v, 1, 1e-6)
-
-            if props.IsNormalDefined():
-                norm = props.Normal()
-                pt = props.Value()
-                normals.append(norm)
-                points.append(pt)
-
-    return list(zip(points, normals))
-
-
-def is_exterior_face(face, solid_shape, offset_dist=0.5):
-    # Get surface properties to find center point
-    prop = GProp_GProps()
-    brepgprop.SurfaceProperties(face, prop)
-    center = prop.CentreOfMass()
-    surf_adapt = BRepAdaptor_Surface(face)
-
-    # Attempt to get normal from face center
-    try:
-        umin, umax, vmin, vmax = (
-            surf_adapt.FirstUParameter(),
-            surf_adapt.LastUParameter(),
-            surf_adapt.FirstVParameter(),
-            surf_adapt.LastVParameter(),
-        )
-        u = (umin + umax) / 2
-        v = (vmin + vmax) / 2
-        normal = surf_adapt.Normal(u, v)
-    except Exception:
-        return False  # whoops
-
-    # offset point
-    offset_vec = gp_Vec(normal) * offset_dist
-    offset_pt = center.Translated(offset_vec)
-
-    # check if outside solid
-    classifier = BRepClass3d_SolidClassifier(solid_shape, offset_pt, 1e-6)
-    return classifier.State() == TopAbs_OUT
-
-
-def find_mating_faces(shape):
-    explorer = TopExp_Explorer(shape, TopAbs_FACE)
-    mating_faces = []
 
-    while explorer.More():
-        face = topods.Face(explorer.Current())
-        surf = BRepAdaptor_Surface(face, True)
-        surf_type = surf.GetType()
-
-        props = GProp_GProps()
-        brepgprop.SurfaceProperties(face, props)
-        center = props.CentreOfMass()
-
-        # reject interior faces
-        bbox = Bnd_Box()
-        brepbndlib.Add(face, bbox)
-        xmin, ymin, zmin, xmax, ymax, zmax = bbox.Get()
-        if bbox.IsVoid():
-            explorer.Next()
-            continue
-
-        width, height, depth, area = xmax - xmin, ymax - ymin, zmax - zmin, props.Mass()
-
-        if surf_type == GeomAbs_Plane:
-            # only accept planar faces >= Xmm in both dimensions
-            if sum(1 for dim in (width, height, depth) if dim > 5.0) >= 2 and area > 200:
-                print(f"width, height, depth, area = {width}, {height}, {depth}, {area}")
-                print(f"is exterior face: {is_exterior_face(face, shape)}")
-                if is_exterior_face(face, shape):
-                    normal = surf.Plane().Axis().Direction()
-                    mating_faces.append({
-                        "face": face,
-                        "center": [center.X(), center.Y(), center.Z()],
-                        "axis": get_primary_axis(normal.X(), normal.Y(), normal.Z()),
-                    })
-
-        explorer.Next()
-
-    return mating_faces
-
-def process_step_file(filepath):
-    filename = os.path.basename(filepath)
-    part_id = os.path.splitext(filename)[0]
-    print(f"Processing {filename}...")
-
-    reader = STEPControl_Reader()
-    status = reader.ReadFile(filepath)
-    if status != IFSelect_RetDone:
-        print(f"Error reading {filename}")
-        return
-
-    reader.TransferRoots()
-    shape = reader.OneShape()
-
-    print(f"Loaded {filename}. Retrieving bounding box information...")
-    bbox_info = get_bounding_box(shape)
-    # attachments = find_attachment_points(shape)
-    # mating_faces = find_mating_faces(shape)
-
-    # Compute center points of mating faces
-    """
-    mating_data = []
-    for face in mating_faces:
-        mating_data.append({
-            "center": face["center"],
-            "axis": face["axis"]
-        })
-    """
-
-    data = {
-        "pid": part_id,
-        "bs": bbox_info["size"],
-        "bc": bbox_info["center"],
-        # "attachment_points": attachments,
-        # "mating_faces": mating_data,
-    }
-
-    with open(os.path.join(SERIALIZED_DIR, part_id + ".json"), "w") as f:
-        json.dump(data, f, indent=4)
+def show_part(shape, attachments, mating_faces):
+    import wx
+    from OCC.Display.SimpleGui import init_display
+    from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeSphere
+    from OCC.Core.AIS import AIS_Shape
+    from OCC.Core.Quantity import Quantity_Color, Quantity_TOC_RGB
+    from OCC.Core.gp import gp_Pnt
 
-    """
     display, start_display, _add_menu, _add_function_to_menu = init_display("wx")
     display.DisplayShape(shape, update=True)
 
@@ -235,8 +46,6 @@ def process_step_file(filepath):
         s = BRepPrimAPI_MakeSphere(p, pt["radius"] * 0.5).Shape()
         display.DisplayShape(s, color="RED")
 
-    from OCC.Core.Quantity import Quantity_Color, Quantity_TOC_RGB
-
     colors = [
         (1.0, 0.0, 0.0),  # red
         (0.0, 1.0, 0.0),  # green
@@ -246,9 +55,10 @@ def process_step_file(filepath):
         (0.0, 1.0, 1.0),  # cyan
     ]
 
+    # mating faces are serialized without their TopoDS_Face, so mark each one's center
     for i, entry in enumerate(mating_faces):
-        face_shape = entry["face"]
-        ais_shape = AIS_Shape(face_shape)
+        marker = BRepPrimAPI_MakeSphere(gp_Pnt(*entry["center"]), 2.0).Shape()
+        ais_shape = AIS_Shape(marker)
         color = colors[i % len(colors)]
         ais_shape.SetColor(Quantity_Color(*color, Quantity_TOC_RGB))
         display.Context.Display(ais_shape, True)
@@ -264,17 +74,60 @@ def process_step_file(filepath):
     display.register_select_callback(lambda *args, **kwargs: on_key())
 
     start_display()
-    """
+
+
+def process_step_file(filepath, view=False):
+    from OCC.Extend.DataExchange import write_gltf_file
+
+    filename = os.path.basename(filepath)
+    part_id = os.path.splitext(filename)[0]
+    print(f"Processing {filename}...")
+    os.makedirs(GLB_DIR, exist_ok=True)
+    os.makedirs(SERIALIZED_DIR, exist_ok=True)
+
+    reader = STEPControl_Reader()
+    status = reader.ReadFile(filepath)
+    if status != IFSelect_RetDone:
+        raise Exception(f"Error reading {filename}")
+
+    reader.TransferRoots()
+    shape = reader.OneShape()
+
+    print(f"Loaded {filename}. Retrieving bounding box information...")
+    bbox_info = get_bounding_box(shape)
+    features = cached_features(shape, file_sha256(filepath))
+
+    data = {
+        "pid": part_id,
+        "bs": bbox_info["size"],
+        "bc": bbox_info["center"],
+        "attachment_points": features["attachment_points"],
+        "mating_faces": features["mating_faces"],
+    }
+
+    json_path = os.path.join(SERIALIZED_DIR, part_id + ".json")
+    atomic_write_json(json_path, data, indent=4)
+
+    if view:
+        show_part(shape, data["attachment_points"], data["mating_faces"])
 
     glb_path = os.path.join(GLB_DIR, part_id + ".glb")
-    write_gltf_file(shape, glb_path, binary=True)
+    with atomic_output(glb_path) as tmp_path:
+        write_gltf_file(shape, tmp_path, binary=True)
     print(f"Saved GLB: {glb_path}\n")
 
+    return [json_path, glb_path]
 
-if __name__ == "__main__":
-    step_files = glob.glob(os.path.join(MODELS_DIR, "*.step")) + glob.glob(
-        os.path.join(MODELS_DIR, "*.STEP")
-    )
 
-    for filepath in step_files:
-        process_step_file(filepath)
+if __name__ == "__main__":
+    parser = make_parser("Convert STEP models to serialized JSON and GLB")
+    parser.add_argument("--view", action="store_true", help="show each part and its features in the OCC viewer (needs wx)")
+    args = parser.parse_args()
+    step_files = args.files or find_step_files(MODELS_DIR)
+
+    if args.view:
+        # the viewer blocks on its GUI loop, so parts are shown one at a time in this process
+        for filepath in step_files:
+            process_step_file(filepath, view=True)
+    else:
+        run_batch(step_files, process_step_file, **batch_options(args))
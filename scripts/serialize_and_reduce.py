@@ -1,43 +1,108 @@
-import wx
 import os
-import json
 import glob
 
+import numpy as np
+
+from batch import batch_options, find_step_files, make_parser
+from compression import COMPRESSION_VERSION, MESHOPT_COMPRESSION, POSITION_BITS, compress_glb, print_report
+from build_cache import incremental_build, part_id_for
+from catalog import build_catalog, write_catalog
+from content_store import STORE_DIR, publish_store
+from features import (
+    FEATURE_TIME_BUDGET,
+    FEATURES_VERSION,
+    cached_features,
+    extract_features,
+    load_cached_features,
+    merge_features,
+    store_features,
+)
+from dedup import (
+    DEDUP_VERSION,
+    GEOMETRY_DECIMALS,
+    GEOMETRY_INDEX_DIR,
+    find_instance,
+    geometry_keys,
+    instance_points,
+    prism_keys,
+    publish,
+    release_claims,
+    stale_instances,
+)
+from decimation import DECIMATION_GRID, DECIMATION_VERSION, ERROR_TOLERANCE_RATIO, choose_decimation
+from meshdata import arrays_to_mesh, clean_mesh, shape_to_arrays
+from normalize_names import ATTRIBUTES_PATH, merge_attributes
+from shape_index import update_shape_index
+from snap import LATTICE_VERSION, hole_lattice
+import metrics
+from utils import atomic_output, atomic_write_json, file_sha256, load_json, remove_temp_files
+
+# Only the OCC modules every part needs are imported here. Open3D and the glTF/XCAF writer stack are
+# imported inside the stages that use them, so workers and CLI runs never pay for (or require) a GUI toolkit.
 from OCC.Core.STEPControl import STEPControl_Reader
 from OCC.Core.BRepBndLib import brepbndlib
-from OCC.Core.Bnd import Bnd_Box
-from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeSphere
-from OCC.Core.TopExp import TopExp_Explorer
-from OCC.Core.TopAbs import TopAbs_FACE
-from OCC.Core.GProp import GProp_GProps
-from OCC.Core.BRepGProp import brepgprop
-from OCC.Display.SimpleGui import init_display
-from OCC.Core.gp import gp_Pnt
-from OCC.Core.BRepAdaptor import BRepAdaptor_Surface
-from OCC.Core.GeomAbs import GeomAbs_Cylinder, GeomAbs_Plane
+from OCC.Core.Bnd import Bnd_Box, Bnd_OBB
 from OCC.Core.IFSelect import IFSelect_RetDone
-from OCC.Extend.DataExchange import write_gltf_file
-from OCC.Core.TopoDS import topods
-from OCC.Core.AIS import AIS_Shape
-
-from OCC.Core.BRepClass3d import BRepClass3d_SolidClassifier
-from OCC.Core.TopAbs import TopAbs_OUT
-from OCC.Core.BRepAdaptor import BRepAdaptor_Surface
-from OCC.Core.gp import gp_Pnt, gp_Vec
-from OCC.Core.GeomLProp import GeomLProp_SLProps
-import open3d as o3d
+from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
+from OCC.Core.BRepTools import breptools
+from OCC.Core.TopExp import TopExp_Explorer
+from OCC.Core.TopAbs import TopAbs_SOLID
 
 MODELS_DIR = "./models"
 GLB_DIR = "./glb"
 SERIALIZED_DIR = "./serialized"
 
-os.makedirs(GLB_DIR, exist_ok=True)
-os.makedirs(SERIALIZED_DIR, exist_ok=True)
+# bump whenever a change to this script alters its outputs
+PIPELINE_VERSION = 11
+TARGET_TRIANGLES_RATIO = 0.5
+DECIMATE_MIN_TRIANGLES = 30000
+# meshes under SMALL_MESH_TRIANGLES keep more of their triangles
+SMALL_MESH_TRIANGLES = 50000
+SMALL_MESH_RATIO = 0.6
+
+# "auto" searches decimation.DECIMATION_GRID per part for the smallest mesh within tolerance;
+# "quadric" always applies simplify_mesh's fixed ratio
+DECIMATION_MODE = "auto"
+
+# "adaptive" meshes once at a deflection scaled to the part size and writes the GLB straight from that
+# triangulation; "occ-default" keeps write_gltf_file's fixed meshing followed by the read-decimate-rewrite pass
+TESSELLATION_MODE = "adaptive"
+LINEAR_DEFLECTION_RATIO = 0.002  # fraction of the bounding box diagonal
+LINEAR_DEFLECTION_LIMITS = (0.01, 1.0)  # mm
+ANGULAR_DEFLECTION = 0.35  # radians
+
+# triangle budgets for LOD 1.., each decimated from the previous level; the last LOD is always a bounding box proxy
+LOD_TRIANGLE_BUDGETS = [8000, 1500]
+LOD_DIR = os.path.join(GLB_DIR, "lod")
+
+# convex hull vertex cap; 0 disables the hull
+HULL_MAX_VERTICES = 64
+
+# quantize every GLB output (compression.py); the viewer's GLTFLoader decodes KHR_mesh_quantization natively
+GLB_COMPRESSION = True
+
+# parts whose tessellation matches an already converted part (exactly, or as a longer/shorter prism of the same
+# cross-section) reuse its GLBs through an "instance" transform instead of getting their own; adaptive mode only
+GEOMETRY_DEDUP = True
+
+# STEP files at least this large are transferred and tessellated one solid at a time, so a worker's peak memory
+# follows the largest solid rather than the whole assembly; 0 always loads the file whole
+STREAM_MIN_BYTES = 20 * 1024 * 1024
+
+
+def make_output_dirs():
+    os.makedirs(GLB_DIR, exist_ok=True)
+    os.makedirs(LOD_DIR, exist_ok=True)
+    os.makedirs(SERIALIZED_DIR, exist_ok=True)
 
 
 def get_bounding_box(shape):
     bbox = Bnd_Box()
     brepbndlib.Add(shape, bbox)
+    return bounding_box_info(bbox)
+
+
+def bounding_box_info(bbox):
     xmin, ymin, zmin, xmax, ymax, zmax = bbox.Get()
     center = [round(v, 2) for v in [(xmin + xmax) / 2, (ymin + ymax) / 2, (zmin + zmax) / 2]]
     size = [round(v, 2) for v in [xmax - xmin, ymax - ymin, zmax - zmin]]
@@ -46,78 +111,565 @@ def get_bounding_box(shape):
         "center": center,
     }
 
+def get_oriented_bounding_box(shape):
+    # optimal OBB from the exact geometry; unlike bs/bc this stays tight for parts modelled off-axis
+    obb = Bnd_OBB()
+    brepbndlib.AddOBB(shape, obb, False, True, False)
+    return oriented_box_info(obb)
+
+
+def oriented_box_info(obb):
+    center = obb.Center()
+    axes = [obb.XDirection(), obb.YDirection(), obb.ZDirection()]
+    # stored unrounded: rounded axes would no longer be exactly orthonormal
+    return {
+        "center": [center.X(), center.Y(), center.Z()],
+        "axes": [[a.X(), a.Y(), a.Z()] for a in axes],
+        "half_size": [obb.XHSize(), obb.YHSize(), obb.ZHSize()],
+    }
+
+
+def get_convex_hull(points, max_vertices=HULL_MAX_VERTICES):
+    import open3d as o3d
+
+    if len(points) < 4:
+        return None
+    cloud = o3d.geometry.PointCloud(o3d.utility.Vector3dVector(points))
+    hull, _ = cloud.compute_convex_hull()
+
+    if len(hull.vertices) > max_vertices:
+        # a closed triangle mesh has V = T / 2 + 2, so this triangle target lands near the vertex cap;
+        # decimation can dent the surface, so take the hull of what is left
+        reduced = hull.simplify_quadric_decimation(2 * max_vertices - 4)
+        hull, _ = o3d.geometry.PointCloud(reduced.vertices).compute_convex_hull()
+
+    return [[round(v, 3) for v in vertex] for vertex in hull.vertices]
+
+
 def simplify_glb(path, target_triangles_ratio=0.5):
+    import open3d as o3d
+
     print(f"Loading GLB for simplification: {path}")
-    mesh = o3d.io.read_triangle_mesh(path, enable_post_processing=True)
+    with metrics.stage("o3d_load"):
+        mesh = o3d.io.read_triangle_mesh(path, enable_post_processing=True)
     if mesh.is_empty():
         raise Exception(f"Failed to load mesh from {path}")
 
+    simplified_mesh = simplify_mesh(mesh, target_triangles_ratio)
+    if simplified_mesh is mesh:
+        return mesh
+
+    # the original stays in place until the simplified file is complete
+    with metrics.stage("glb_write"), atomic_output(path) as tmp_path:
+        o3d.io.write_triangle_mesh(tmp_path, simplified_mesh)
+    print(f"Simplified GLB saved: {path}")
+    return simplified_mesh
+
+
+def simplify_mesh(mesh, target_triangles_ratio=0.5):
+    # returns the input mesh itself when it is too small to be worth decimating
     orig_triangles = len(mesh.triangles)
+    if orig_triangles < SMALL_MESH_TRIANGLES:
+        target_triangles_ratio = SMALL_MESH_RATIO
     target_triangles = int(orig_triangles * target_triangles_ratio)
     print(f"Original triangles: {orig_triangles}, target: {target_triangles}")
 
-    if orig_triangles < 30000:
+    if orig_triangles < DECIMATE_MIN_TRIANGLES:
         print("Too few original triangles, will not decimate")
-        return
-    
-    if orig_triangles < 50000:
-        target_triangles_ratio = 0.6
+        return mesh
 
-    os.remove(path)
-    simplified_mesh = mesh.simplify_quadric_decimation(target_triangles)
-
-    # Clean up errors
-    simplified_mesh.remove_duplicated_vertices()
-    simplified_mesh.remove_duplicated_triangles()
-    simplified_mesh.remove_degenerate_triangles()
-    simplified_mesh.remove_non_manifold_edges()
-    simplified_mesh.compute_vertex_normals()
+    with metrics.stage("decimate"):
+        simplified_mesh = mesh.simplify_quadric_decimation(target_triangles)
+    with metrics.stage("cleanup"):
+        clean_mesh(simplified_mesh)
 
     print(f"Simplified triangles: {len(simplified_mesh.triangles)}")
+    return simplified_mesh
 
-    o3d.io.write_triangle_mesh(path, simplified_mesh)
-    print(f"Simplified GLB saved: {path}")
+
+def decimate(mesh, part_hash):
+    # the same DECIMATE_MIN_TRIANGLES floor applies in both modes; the input mesh comes back when nothing was removed
+    if DECIMATION_MODE != "auto" or len(mesh.triangles) < DECIMATE_MIN_TRIANGLES:
+        return simplify_mesh(mesh, TARGET_TRIANGLES_RATIO)
+    with metrics.stage("decimate"):
+        simplified, choice = choose_decimation(mesh, part_hash)
+    if choice:
+        metrics.record(decimation=f"{choice['strategy']}({choice['param']})", hausdorff=choice["hausdorff"])
+    return simplified
+
+
+def lod_source(vertices, faces, part_hash):
+    # The Open3D mesh the LOD chain decimates from, or None when the part is already under every budget.
+    # Any part over the smallest budget needs it; only parts over the largest are worth decimating first
+    if len(faces) <= LOD_TRIANGLE_BUDGETS[-1]:
+        return None
+    mesh = arrays_to_mesh(vertices, faces)
+    if len(faces) > LOD_TRIANGLE_BUDGETS[0]:
+        mesh = decimate(mesh, part_hash)
+    return mesh
+
+
+def bounding_proxy(bbox_info):
+    import open3d as o3d
+
+    width, height, depth = bbox_info["size"]
+    # create_box rejects zero extents, which flat sheet-metal parts can have
+    proxy = o3d.geometry.TriangleMesh.create_box(max(width, 1e-3), max(height, 1e-3), max(depth, 1e-3))
+    proxy.translate([c - s / 2 for c, s in zip(bbox_info["center"], bbox_info["size"])])
+    proxy.compute_vertex_normals()
+    return proxy
+
+
+def lod_path(part_id, level):
+    return os.path.join(LOD_DIR, f"{part_id}.lod{level}.glb")
+
+
+def generate_lods(mesh, part_id, glb_path, bbox_info, triangles=None):
+    import open3d as o3d
+
+    # LOD 0 is the viewer's GLB itself; paths are stored relative to GLB_DIR so they map onto /glb/ URLs.
+    # mesh may be None when the part is already under every budget, since only the proxy is needed then
+    triangles = len(mesh.triangles) if mesh is not None else triangles
+    lods = [{"level": 0, "file": os.path.relpath(glb_path, GLB_DIR), "triangles": triangles}]
+    source = mesh
+
+    for budget in LOD_TRIANGLE_BUDGETS:
+        if triangles <= budget:
+            continue
+        source = clean_mesh(source.simplify_quadric_decimation(budget))
+        triangles = len(source.triangles)
+        path = lod_path(part_id, len(lods))
+        with atomic_output(path) as tmp_path:
+            o3d.io.write_triangle_mesh(tmp_path, source)
+        lods.append({"level": len(lods), "file": os.path.relpath(path, GLB_DIR), "triangles": len(source.triangles)})
+
+    proxy = bounding_proxy(bbox_info)
+    path = lod_path(part_id, len(lods))
+    with atomic_output(path) as tmp_path:
+        o3d.io.write_triangle_mesh(tmp_path, proxy)
+    lods.append({"level": len(lods), "file": os.path.relpath(path, GLB_DIR), "triangles": len(proxy.triangles), "proxy": True})
+
+    print(f"Saved {len(lods)} LODs: {', '.join(str(lod['triangles']) for lod in lods)} triangles")
+    return lods
+
+
+def pick_lod(lods, triangle_budget):
+    # most detailed level within budget, falling back to the cheapest level
+    for lod in lods:
+        if lod["triangles"] <= triangle_budget:
+            return lod
+    return lods[-1]
+
+
+def deflection_for(bbox_info, axis=None):
+    # from the bounding box diagonal, or with axis, from the diagonal of the cross-section across that axis
+    diagonal = sum(v * v for i, v in enumerate(bbox_info["size"]) if i != axis) ** 0.5
+    low, high = LINEAR_DEFLECTION_LIMITS
+    return min(max(diagonal * LINEAR_DEFLECTION_RATIO, low), high), ANGULAR_DEFLECTION
+
+
+def mesh_shape(shape, linear_deflection, angular_deflection):
+    mesh = BRepMesh_IncrementalMesh(shape, linear_deflection, False, angular_deflection, True)
+    mesh.Perform()
+    if not mesh.IsDone():
+        raise Exception("Meshing not completed")
+
+
+def write_glb(shape, glb_path):
+    # same writer as write_gltf_file, minus its Clean() + default remesh, so the existing triangulation is exported
+    from OCC.Core.TDocStd import TDocStd_Document
+    from OCC.Core.XCAFDoc import XCAFDoc_DocumentTool
+    from OCC.Core.RWGltf import RWGltf_CafWriter
+    from OCC.Core.TColStd import TColStd_IndexedDataMapOfStringString
+    from OCC.Core.TCollection import TCollection_AsciiString
+    from OCC.Core.Message import Message_ProgressRange
+
+    doc = TDocStd_Document("autoftc-glb")
+    shape_tool = XCAFDoc_DocumentTool.ShapeTool(doc.Main())
+    shape_tool.AddShape(shape, False)
+
+    writer = RWGltf_CafWriter(TCollection_AsciiString(glb_path), True)
+    writer.Perform(doc, TColStd_IndexedDataMapOfStringString(), Message_ProgressRange())
 
 
 def process_step_file(filepath):
+    if STREAM_MIN_BYTES and os.path.getsize(filepath) >= STREAM_MIN_BYTES:
+        return process_step_file_streamed(filepath)
+    try:
+        return convert_step_file(filepath)
+    finally:
+        # a failed conversion must not leave parts with identical geometry waiting on its claim
+        release_claims()
+
+
+def warm_up(_filepath):
+    # a no-op job: a worker imports this module (and OCC) to run it, so convert_service.py can preload its workers
+    import open3d  # noqa: F401
+
+    return []
+
+
+def convert_step_file(filepath):
     filename = os.path.basename(filepath)
     part_id = os.path.splitext(filename)[0]
     print(f"Processing {filename}...")
+    make_output_dirs()
 
     reader = STEPControl_Reader()
-    status = reader.ReadFile(filepath)
+    with metrics.stage("step_read"):
+        status = reader.ReadFile(filepath)
     if status != IFSelect_RetDone:
-        print(f"Error reading {filename}")
-        return
+        raise Exception(f"Error reading {filename}")
 
-    reader.TransferRoots()
-    shape = reader.OneShape()
+    with metrics.stage("transfer"):
+        reader.TransferRoots()
+        shape = reader.OneShape()
 
     print(f"Loaded {filename}. Retrieving bounding box information...")
-    bbox_info = get_bounding_box(shape)
+    with metrics.stage("bbox"):
+        bbox_info = get_bounding_box(shape)
+        obb_info = get_oriented_bounding_box(shape)
+    part_hash = file_sha256(filepath)
+    with metrics.stage("features"):
+        features = cached_features(shape, part_hash)
+
+    data = {
+        "pid": part_id,
+        "bs": bbox_info["size"],
+        "bc": bbox_info["center"],
+        "obb": obb_info,
+        "attachment_points": features["attachment_points"],
+        "mating_faces": features["mating_faces"],
+        "hole_lattice": hole_lattice(features["attachment_points"]),
+    }
+
+    glb_path = os.path.join(GLB_DIR, part_id + ".glb")
+    keys = None
+    if TESSELLATION_MODE == "adaptive":
+        linear_deflection, angular_deflection = deflection_for(bbox_info)
+        with metrics.stage("mesh"):
+            mesh_shape(shape, linear_deflection, angular_deflection)
+        with metrics.stage("mesh_arrays"):
+            vertices, faces = shape_to_arrays(shape)
+        if GEOMETRY_DEDUP:
+            prisms = prism_keys(vertices, faces)
+            if prisms:
+                # Lengths of one series only share a prism key when their cross-sections are tessellated alike, and
+                # a length-scaled deflection would give each length its own circles. Prisms are meshed again at a
+                # deflection set by the cross-section alone; they are simple shapes, so this costs little
+                linear_deflection, angular_deflection = deflection_for(bbox_info, prisms[0]["axis"])
+                breptools.Clean(shape)
+                with metrics.stage("mesh"):
+                    mesh_shape(shape, linear_deflection, angular_deflection)
+                with metrics.stage("mesh_arrays"):
+                    vertices, faces = shape_to_arrays(shape)
+        triangles = len(faces)
+        print(f"Meshed {triangles} triangles at {linear_deflection:.3f}mm deflection")
+
+        if GEOMETRY_DEDUP:
+            with metrics.stage("dedup"):
+                keys = geometry_keys(vertices, faces)
+                instance, base = find_instance(keys, part_id, SERIALIZED_DIR, GLB_DIR)
+            data["geometry_hash"] = keys["geometry"]
+            if instance:
+                return save_instance(data, instance, base, triangles)
+
+        # decimation works on the in-memory buffers, so the GLB is written exactly once and never read back
+        mesh = lod_source(vertices, faces, part_hash)
+
+        with metrics.stage("glb_write"), atomic_output(glb_path) as tmp_path:
+            if mesh is not None and len(mesh.triangles) < triangles:
+                import open3d as o3d
+
+                o3d.io.write_triangle_mesh(tmp_path, mesh)
+            else:
+                write_glb(shape, tmp_path)
+        print(f"Saved GLB: {glb_path}")
+    else:
+        # DataExchange pulls in every OCC importer/exporter, so only load it in this mode
+        from OCC.Extend.DataExchange import write_gltf_file
+
+        # Export original glb
+        with metrics.stage("glb_write"), atomic_output(glb_path) as tmp_path:
+            write_gltf_file(shape, tmp_path, binary=True)
+        print(f"Saved GLB: {glb_path}")
+
+        # Export simplified glb (if necessary)
+        mesh = simplify_glb(glb_path, TARGET_TRIANGLES_RATIO)
+        triangles = None
+
+    with metrics.stage("lods"):
+        data["lods"] = generate_lods(mesh, part_id, glb_path, bbox_info, triangles)
+    metrics.record(triangles_in=triangles or data["lods"][0]["triangles"], triangles_out=data["lods"][0]["triangles"])
+
+    if HULL_MAX_VERTICES:
+        # both tessellation modes leave the full-resolution triangulation on the shape
+        with metrics.stage("hull"):
+            if TESSELLATION_MODE != "adaptive":
+                vertices, _ = shape_to_arrays(shape)
+            data["hull"] = get_convex_hull(vertices)
+
+    outputs = save_part_data(data)
+    if keys:
+        publish(keys, part_id, SERIALIZED_DIR, GLB_DIR)
+    return outputs
+
+
+def compress_outputs(lods):
+    # every LOD, once all of them are written; the JSON goes last, so a serialized part always has final GLBs
+    reports = []
+    for lod in lods:
+        path = os.path.join(GLB_DIR, lod["file"])
+        report = compress_glb(path)
+        print_report(path, report)
+        reports.append(report)
+    main = reports[0]
+    metrics.record(
+        glb_raw_bytes=main["raw_bytes"],
+        glb_bytes=main["bytes"],
+        lod_raw_bytes=sum(r["raw_bytes"] for r in reports),
+        lod_bytes=sum(r["bytes"] for r in reports),
+    )
+
+
+def save_part_data(data):
+    if GLB_COMPRESSION:
+        with metrics.stage("compress"):
+            compress_outputs(data["lods"])
+    json_path = os.path.join(SERIALIZED_DIR, data["pid"] + ".json")
+    atomic_write_json(json_path, data, indent=4)
+    return [json_path] + [os.path.join(GLB_DIR, lod["file"]) for lod in data["lods"]]
+
+
+def save_instance(data, instance, base, triangles):
+    # an alias owns no GLBs: it lists the base's LOD files plus the transform that maps the base onto it
+    axis = "" if instance["axis"] is None else f" scaled {instance['scale']}x along {'xyz'[instance['axis']]}"
+    print(f"Geometry matches {base['pid']}{axis}; reusing its GLBs")
+    data["instance"] = instance
+    data["lods"] = base["lods"]
+    if base.get("hull"):
+        data["hull"] = instance_points(base["hull"], instance)
+    metrics.record(triangles_in=triangles, triangles_out=base["lods"][0]["triangles"], instance_of=base["pid"])
+
+    # GLBs from an earlier build, when this part still had its own
+    for path in [os.path.join(GLB_DIR, data["pid"] + ".glb")] + glob.glob(lod_path(data["pid"], "*")):
+        if os.path.exists(path):
+            os.remove(path)
 
+    json_path = os.path.join(SERIALIZED_DIR, data["pid"] + ".json")
+    atomic_write_json(json_path, data, indent=4)
+    return [json_path]
+
+
+def iter_step_solids(reader):
+    # transfers one root at a time and releases its shapes before the next, so only one root's B-rep is resident
+    for root in range(1, reader.NbRootsForTransfer() + 1):
+        with metrics.stage("transfer"):
+            transferred = reader.TransferRoot(root)
+        if not transferred:
+            print(f"Skipping root {root}: transfer failed")
+            continue
+
+        for index in range(1, reader.NbShapes() + 1):
+            shape = reader.Shape(index)
+            explorer = TopExp_Explorer(shape, TopAbs_SOLID)
+            if not explorer.More():
+                # shell-only exports have no solids
+                yield shape
+            while explorer.More():
+                yield explorer.Current()
+                explorer.Next()
+        reader.ClearShapes()
+
+
+def process_step_file_streamed(filepath):
+    # Same outputs as process_step_file, built one solid at a time: each solid is meshed, copied into arrays,
+    # decimated and then stripped of its triangulation, so only the largest solid is ever held at full resolution.
+    # Deflection follows each solid's own size, since the assembly's size isn't known until every root is read.
+    filename = os.path.basename(filepath)
+    part_id = os.path.splitext(filename)[0]
+    print(f"Processing {filename} one solid at a time...")
+    make_output_dirs()
+
+    reader = STEPControl_Reader()
+    with metrics.stage("step_read"):
+        status = reader.ReadFile(filepath)
+    if status != IFSelect_RetDone:
+        raise Exception(f"Error reading {filename}")
+
+    part_hash = file_sha256(filepath)
+    features = load_cached_features(part_hash)
+    feature_results = []
+    seen_holes = set()
+
+    bbox = Bnd_Box()
+    obb = None
+    vertex_chunks = []
+    triangle_chunks = []
+    hull_points = []
+    offset = 0
+    triangles_in = 0
+    solids = 0
+
+    for solid in iter_step_solids(reader):
+        solids += 1
+        with metrics.stage("bbox"):
+            brepbndlib.Add(solid, bbox)
+            solid_obb = Bnd_OBB()
+            brepbndlib.AddOBB(solid, solid_obb, False, True, False)
+            if obb is None:
+                obb = solid_obb
+            else:
+                obb.Add(solid_obb)
+
+        if features is None:
+            with metrics.stage("features"):
+                budget = FEATURE_TIME_BUDGET - sum(r["seconds"] for r in feature_results)
+                feature_results.append(extract_features(solid, max(budget, 0.0), seen_holes))
+
+        with metrics.stage("mesh"):
+            mesh_shape(solid, *deflection_for(get_bounding_box(solid)))
+        with metrics.stage("mesh_arrays"):
+            vertices, faces = shape_to_arrays(solid)
+        breptools.Clean(solid)
+        triangles_in += len(faces)
+        if not len(faces):
+            continue
+
+        if HULL_MAX_VERTICES and len(vertices) >= 4:
+            # the hull of the per-solid hulls is the hull of the whole part
+            with metrics.stage("hull"):
+                try:
+                    hull_points.append(np.asarray(get_convex_hull(vertices, max_vertices=len(vertices))))
+                except RuntimeError as e:
+                    # Qhull rejects flat or coplanar solids (a shim); the part's hull just leaves this one out
+                    print(f"Skipped the convex hull of solid {solids}: {str(e).splitlines()[0]}")
+
+        if len(faces) > LOD_TRIANGLE_BUDGETS[0]:
+            # each solid is its own decimation input, so it gets its own cache key
+            mesh = decimate(arrays_to_mesh(vertices, faces), f"{part_hash}:{solids}")
+            vertices, faces = np.asarray(mesh.vertices), np.asarray(mesh.triangles)
+        vertex_chunks.append(vertices)
+        triangle_chunks.append(faces + offset)
+        offset += len(vertices)
+
+    if not vertex_chunks:
+        raise Exception(f"No geometry could be meshed in {filename}")
+    print(f"Meshed {solids} solids, {triangles_in} triangles")
+
+    if features is None:
+        features = merge_features(feature_results)
+        store_features(part_hash, features)
+
+    bbox_info = bounding_box_info(bbox)
     data = {
         "pid": part_id,
         "bs": bbox_info["size"],
         "bc": bbox_info["center"],
+        # merged per-solid boxes: it encloses the part but, unlike a whole-shape OBB, is not the tightest fit
+        "obb": oriented_box_info(obb),
+        "attachment_points": features["attachment_points"],
+        "mating_faces": features["mating_faces"],
+        "hole_lattice": hole_lattice(features["attachment_points"]),
     }
 
-    with open(os.path.join(SERIALIZED_DIR, part_id + ".json"), "w") as f:
-        json.dump(data, f, indent=4)
+    mesh = arrays_to_mesh(np.concatenate(vertex_chunks), np.concatenate(triangle_chunks))
+    del vertex_chunks, triangle_chunks
+    mesh.compute_vertex_normals()
+
+    import open3d as o3d
 
-    # Export original glb
     glb_path = os.path.join(GLB_DIR, part_id + ".glb")
-    write_gltf_file(shape, glb_path, binary=True)
+    with metrics.stage("glb_write"), atomic_output(glb_path) as tmp_path:
+        o3d.io.write_triangle_mesh(tmp_path, mesh)
     print(f"Saved GLB: {glb_path}")
 
-    # Export simplified glb (if necessary)
-    simplify_glb(glb_path)
+    with metrics.stage("lods"):
+        data["lods"] = generate_lods(mesh, part_id, glb_path, bbox_info)
+    metrics.record(triangles_in=triangles_in, triangles_out=data["lods"][0]["triangles"], solids=solids)
+
+    if hull_points:
+        with metrics.stage("hull"):
+            try:
+                data["hull"] = get_convex_hull(np.concatenate(hull_points))
+            except RuntimeError as e:
+                # consumers already treat the hull as optional
+                print(f"No convex hull for {filename}: {str(e).splitlines()[0]}")
+
+    return save_part_data(data)
+
+
+def pipeline_params():
+    # everything that changes the output bytes; a change here invalidates the whole build cache
+    return {
+        "version": PIPELINE_VERSION,
+        "target_triangles_ratio": TARGET_TRIANGLES_RATIO,
+        "tessellation": {
+            "mode": TESSELLATION_MODE,
+            "linear_deflection_ratio": LINEAR_DEFLECTION_RATIO,
+            "linear_deflection_limits": LINEAR_DEFLECTION_LIMITS,
+            "angular_deflection": ANGULAR_DEFLECTION,
+        },
+        "decimate_min_triangles": DECIMATE_MIN_TRIANGLES,
+        "features_version": FEATURES_VERSION,
+        "lattice_version": LATTICE_VERSION,
+        "hull_max_vertices": HULL_MAX_VERTICES,
+        "lod_triangle_budgets": LOD_TRIANGLE_BUDGETS,
+        "stream_min_bytes": STREAM_MIN_BYTES,
+        "decimation": {
+            "mode": DECIMATION_MODE,
+            "version": DECIMATION_VERSION,
+            "grid": DECIMATION_GRID,
+            "tolerance_ratio": ERROR_TOLERANCE_RATIO,
+            "small_mesh": [SMALL_MESH_TRIANGLES, SMALL_MESH_RATIO],
+        },
+        "dedup": {
+            "enabled": GEOMETRY_DEDUP,
+            "version": DEDUP_VERSION,
+            "decimals": GEOMETRY_DECIMALS,
+        },
+        "compression": {
+            "enabled": GLB_COMPRESSION,
+            "version": COMPRESSION_VERSION,
+            "position_bits": POSITION_BITS,
+            "meshopt": MESHOPT_COMPRESSION,
+        },
+    }
 
 
 if __name__ == "__main__":
-    step_files = glob.glob(os.path.join(MODELS_DIR, "*.step")) + glob.glob(
-        os.path.join(MODELS_DIR, "*.STEP")
+    parser = make_parser("Convert STEP models to serialized JSON and decimated GLB")
+    parser.add_argument("--force", action="store_true", help="rebuild every part, ignoring the build manifest")
+    args = parser.parse_args()
+    step_files = args.files or find_step_files(MODELS_DIR)
+    # a worker killed mid-write leaves its temp file behind; the published outputs are never partial
+    for directory in (GLB_DIR, LOD_DIR, SERIALIZED_DIR, GEOMETRY_INDEX_DIR):
+        remove_temp_files(directory)
+
+    # only prune when building the whole library; an explicit file list is a partial build
+    incremental_build(
+        step_files,
+        process_step_file,
+        pipeline_params(),
+        force=args.force,
+        prune=not args.files,
+        **batch_options(args),
     )
 
-    for filepath in step_files:
-        process_step_file(filepath)
+    # aliases of a base that changed in this build are converted again, now that the new base is final
+    stale = set(stale_instances(SERIALIZED_DIR))
+    if stale:
+        print(f"Rebuilding {len(stale)} parts whose shared geometry changed")
+        incremental_build(
+            [f for f in find_step_files(MODELS_DIR) if part_id_for(f) in stale],
+            process_step_file,
+            pipeline_params(),
+            force=True,
+            prune=False,
+            **batch_options(args),
+        )
+    # outside the build cache: attributes come from names, so an index change never reconverts a part
+    merge_attributes(load_json(ATTRIBUTES_PATH, {}), SERIALIZED_DIR)
+    publish_store(SERIALIZED_DIR, GLB_DIR, STORE_DIR)
+    write_catalog(build_catalog(SERIALIZED_DIR, GLB_DIR, STORE_DIR))
+    update_shape_index(SERIALIZED_DIR, GLB_DIR)
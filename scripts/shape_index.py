@@ -0,0 +1,225 @@
+import os
+import glob
+import json
+import time
+
+import numpy as np
+
+from catalog import GLB_DIR, SERIALIZED_DIR
+from compression import read_glb_arrays
+from utils import atomic_write_json, file_sha256, load_json
+
+# bump whenever the descriptor changes, so every part is described again
+DESCRIPTOR_VERSION = 1
+SHAPE_INDEX_PATH = "./shape_index.json"
+SHAPE_INDEX_PORT = 8769
+
+D2_SAMPLES = 4096  # point pairs per part
+D2_BINS = 16
+D2_RANGE = 3.0  # histogram covers 0..3x the mean pair distance, which makes it scale-invariant
+
+# relative weight of each descriptor block in the similarity distance
+D2_WEIGHT = 1.0
+RATIO_WEIGHT = 1.0
+SIZE_WEIGHT = 0.25  # per unit of log(longest extent)
+HOLE_WEIGHT = 0.1  # per unit of log(1 + hole count)
+
+
+def sample_surface(vertices, triangles, count, rng):
+    # area-weighted points on the triangles, so dense tessellation in one spot doesn't skew the distribution
+    corners = vertices[triangles]
+    areas = np.linalg.norm(np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]), axis=1)
+    if areas.sum() <= 0:
+        return vertices[rng.integers(0, len(vertices), count)]
+    chosen = corners[rng.choice(len(triangles), count, p=areas / areas.sum())]
+    u, v = rng.random((2, count, 1))
+    flip = u + v > 1
+    u, v = np.where(flip, 1 - u, u), np.where(flip, 1 - v, v)
+    return chosen[:, 0] + u * (chosen[:, 1] - chosen[:, 0]) + v * (chosen[:, 2] - chosen[:, 0])
+
+
+def d2_histogram(points, rng):
+    # Osada et al.'s D2 shape distribution: distances between random surface point pairs
+    first = points[rng.integers(0, len(points), D2_SAMPLES)]
+    second = points[rng.integers(0, len(points), D2_SAMPLES)]
+    distances = np.linalg.norm(first - second, axis=1)
+    mean = distances.mean()
+    if mean <= 0:
+        return [0.0] * D2_BINS
+    histogram, _ = np.histogram(distances / mean, bins=D2_BINS, range=(0, D2_RANGE))
+    return (histogram / D2_SAMPLES).round(4).tolist()
+
+
+def part_extents(data):
+    # full OBB sizes, longest first; the AABB stands in for parts serialized before OBBs were stored
+    if data.get("obb"):
+        extents = [2 * h for h in data["obb"]["half_size"]]
+    else:
+        extents = list(data["bs"])
+    return sorted((round(e, 3) for e in extents), reverse=True)
+
+
+def part_points(data, glb_dir=GLB_DIR):
+    # surface samples from the cheapest LOD that is still the real shape (box proxies are not), in part space
+    meshes = [lod for lod in data.get("lods", []) if not lod.get("proxy")]
+    if meshes:
+        vertices, triangles = read_glb_arrays(os.path.join(glb_dir, meshes[-1]["file"]))
+        if len(triangles):
+            instance = data.get("instance")
+            if instance and instance["axis"] is not None:
+                vertices = vertices.copy()
+                vertices[:, instance["axis"]] = instance["offset"] + instance["scale"] * vertices[:, instance["axis"]]
+            return vertices, triangles
+    # no usable mesh: the convex hull's vertices still give a coarse distribution
+    return np.array(data.get("hull") or [[0.0, 0.0, 0.0]], dtype=np.float64), None
+
+
+def part_descriptor(data, glb_dir=GLB_DIR):
+    rng = np.random.default_rng(DESCRIPTOR_VERSION)  # fixed seed: the same part always gets the same descriptor
+    vertices, triangles = part_points(data, glb_dir)
+    points = sample_surface(vertices, triangles, D2_SAMPLES, rng) if triangles is not None else vertices
+    extents = part_extents(data)
+    return {
+        "d2": d2_histogram(points, rng),
+        "extents": extents,
+        "ratios": [round(e / extents[0], 4) if extents[0] > 0 else 0.0 for e in extents[1:]],
+        "holes": sum(len(group["holes"]) for group in data.get("hole_lattice") or []),
+    }
+
+
+def update_shape_index(serialized_dir=SERIALIZED_DIR, glb_dir=GLB_DIR, path=SHAPE_INDEX_PATH, pids=None):
+    # Incremental: a part is described again only when its serialized JSON (which changes with its GLBs)
+    # hashes differently from the last build. Parts that are gone are dropped. With pids, only those parts are
+    # looked at and every other entry is kept as it is, so one changed part doesn't re-hash the whole library
+    index = load_json(path, {})
+    if index.get("version") != DESCRIPTOR_VERSION:
+        index = {"version": DESCRIPTOR_VERSION, "parts": {}}
+        pids = None
+    if pids is None:
+        parts = {}
+        json_paths = sorted(glob.glob(os.path.join(serialized_dir, "*.json")))
+    else:
+        parts = {pid: entry for pid, entry in index["parts"].items() if pid not in pids}
+        json_paths = [os.path.join(serialized_dir, f"{pid}.json") for pid in sorted(pids)]
+        json_paths = [p for p in json_paths if os.path.exists(p)]
+    described = 0
+    for json_path in json_paths:
+        pid = os.path.splitext(os.path.basename(json_path))[0]
+        digest = file_sha256(json_path)
+        entry = index["parts"].get(pid)
+        if entry is None or entry["hash"] != digest:
+            with open(json_path) as f:
+                data = json.load(f)
+            try:
+                entry = {"hash": digest, **part_descriptor(data, glb_dir)}
+            except Exception as e:
+                print(f"Skipped {pid}: {e}")
+                continue
+            described += 1
+        parts[pid] = entry
+
+    index["parts"] = parts
+    atomic_write_json(path, index, separators=(",", ":"))
+    print(f"Saved shape index of {len(parts)} parts ({described} described): {path}")
+    return index
+
+
+class ShapeIndex:
+    # the descriptors as one matrix, so a query is a single vectorised distance over every part
+    def __init__(self, index):
+        self.pids = sorted(index["parts"])
+        self.rows = {pid: row for row, pid in enumerate(self.pids)}
+        entries = [index["parts"][pid] for pid in self.pids]
+        self.extents = np.array([e["extents"] for e in entries], dtype=np.float64).reshape(-1, 3)
+        self.vectors = np.array(
+            [
+                np.concatenate(
+                    [
+                        D2_WEIGHT * np.array(e["d2"]),
+                        RATIO_WEIGHT * np.array(e["ratios"]),
+                        [SIZE_WEIGHT * np.log(max(e["extents"][0], 1e-3))],
+                        [HOLE_WEIGHT * np.log1p(e["holes"])],
+                    ]
+                )
+                for e in entries
+            ]
+        ).reshape(len(entries), D2_BINS + 4)
+
+    @classmethod
+    def load(cls, path=SHAPE_INDEX_PATH):
+        return cls(load_json(path, {"parts": {}}))
+
+    def similar(self, pid, k=24):
+        # the k parts nearest to pid, nearest first, with their distances
+        row = self.rows.get(pid)
+        if row is None:
+            return []
+        distances = np.linalg.norm(self.vectors - self.vectors[row], axis=1)
+        distances[row] = np.inf
+        k = min(k, len(self.pids) - 1)
+        if k <= 0:
+            return []
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [(self.pids[i], round(float(distances[i]), 4)) for i in nearest]
+
+    def fits(self, envelope, k=None):
+        # Parts whose box fits inside the envelope (mm) in some axis-aligned orientation, i.e. their sorted extents
+        # are each within the envelope's. Fullest first: the parts that use the most of the space
+        envelope = np.sort(np.asarray(envelope, dtype=np.float64))[::-1]
+        fitting = np.nonzero(np.all(self.extents <= envelope, axis=1))[0]
+        fill = np.prod(self.extents[fitting], axis=1) / max(np.prod(envelope), 1e-9)
+        order = np.argsort(-fill)[:k]
+        return [(self.pids[fitting[i]], round(float(fill[i]), 4)) for i in order]
+
+
+def serve(port=SHAPE_INDEX_PORT, path=SHAPE_INDEX_PATH):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    index = ShapeIndex.load(path)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            start = time.perf_counter()
+            if self.path == "/similar":
+                results = [{"name": pid, "distance": d} for pid, d in index.similar(body["name"], body.get("k", 24))]
+            elif self.path == "/fits":
+                results = [{"name": pid, "fill": f} for pid, f in index.fits(body["envelope"], body.get("k"))]
+            else:
+                self.send_error(404)
+                return
+            payload = json.dumps({"results": results, "ms": (time.perf_counter() - start) * 1000}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    print(f"Shape index of {len(index.pids)} parts listening on http://127.0.0.1:{port} (/similar, /fits)")
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Shape-descriptor index for finding similar or fitting parts")
+    parser.add_argument("--build", action="store_true", help=f"describe new and changed parts in {SERIALIZED_DIR}")
+    parser.add_argument("--similar", metavar="PID", help="list the parts most similar to this one")
+    parser.add_argument("--fits", nargs=3, type=float, metavar=("X", "Y", "Z"), help="list the parts fitting in this envelope (mm)")
+    parser.add_argument("-k", type=int, default=24, help="number of results")
+    parser.add_argument("--serve", action="store_true", help="run as a local HTTP service instead")
+    parser.add_argument("--port", type=int, default=SHAPE_INDEX_PORT)
+    args = parser.parse_args()
+
+    if args.build:
+        update_shape_index()
+    if args.serve:
+        serve(args.port)
+    elif args.similar or args.fits:
+        index = ShapeIndex.load()
+        start = time.perf_counter()
+        results = index.similar(args.similar, args.k) if args.similar else index.fits(args.fits, args.k)
+        print(f"{len(results)} results in {(time.perf_counter() - start) * 1000:.3f}ms")
+        for pid, score in results:
+            print(f"  {pid}: {score}")
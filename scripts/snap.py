@@ -0,0 +1,209 @@
+import json
+import math
+import time
+
+from catalog import CATALOG_PATH
+from collision import catalog_parts_info, euler_matrix, strip_glb
+
+# bump whenever the lattice layout changes, so the build cache reconverts parts
+LATTICE_VERSION = 1
+
+HOLE_PITCH = 24.0  # mm
+# Radial reach: on a square lattice the nearest hole can be up to half a diagonal away (12 * sqrt(2) ~ 17mm at a
+# 24mm pitch), so half the pitch alone would leave poses near a cell's corner unsnapped
+SNAP_DISTANCE = HOLE_PITCH * math.sqrt(2) / 2
+AXIAL_SLACK = 24.0  # mm; hole centers sit anywhere on their axis, so matches may be this far apart along it
+ALIGN_TOLERANCE = 0.5  # mm; offsets proposed by different holes vote together when this close
+PARALLEL_COS = 0.99
+ROTATION_SNAP = math.radians(15)  # angles this close to a multiple of 90 degrees are squared up
+SNAP_PORT = 8767
+
+
+def _dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def _canonical_direction(direction):
+    # a hole axis has no sign; the first non-zero component is made positive so both halves of a hole group together
+    for v in direction:
+        if abs(v) > 1e-6:
+            return [round(c if v > 0 else -c, 3) + 0.0 for c in direction]
+    return list(direction)
+
+
+def _pitch(holes, direction):
+    # most common nearest-neighbour spacing across the axis, e.g. 24.0 for goBILDA-style patterns
+    if len(holes) < 2:
+        return None
+    spacings = {}
+    for i, a in enumerate(holes):
+        nearest = None
+        for j, b in enumerate(holes):
+            if i == j:
+                continue
+            offset = [b[k] - a[k] for k in range(3)]
+            along = _dot(offset, direction)
+            across = math.sqrt(max(_dot(offset, offset) - along * along, 0.0))
+            if across > ALIGN_TOLERANCE and (nearest is None or across < nearest):
+                nearest = across
+        if nearest is not None:
+            key = round(nearest * 2) / 2
+            spacings[key] = spacings.get(key, 0) + 1
+    return max(spacings, key=lambda k: (spacings[k], -k)) if spacings else None
+
+
+def hole_lattice(attachment_points):
+    # attachment points grouped by hole axis, each group with its pitch; stored with the part for the snap solver
+    groups = {}
+    for point in attachment_points:
+        direction = tuple(_canonical_direction(point["direction"]))
+        hole = point["center"] + [point["radius"]]
+        holes = groups.setdefault(direction, [])
+        if hole not in holes:
+            holes.append(hole)
+    return [
+        {"direction": list(direction), "pitch": _pitch(holes, direction), "holes": holes}
+        for direction, holes in sorted(groups.items())
+    ]
+
+
+def snap_rotation(rotation):
+    quarter = math.pi / 2
+    snapped = []
+    for angle in rotation:
+        nearest = round(angle / quarter) * quarter
+        snapped.append(round(nearest, 6) if abs(angle - nearest) <= ROTATION_SNAP else angle)
+    return snapped
+
+
+def world_holes(lattice, rotation, position):
+    matrix = euler_matrix(rotation)
+    holes = []
+    for group in lattice:
+        direction = [_dot(matrix[i], group["direction"]) for i in range(3)]
+        for hole in group["holes"]:
+            center = [position[i] + _dot(matrix[i], hole) for i in range(3)]
+            holes.append((center, direction))
+    return holes
+
+
+class HoleHash:
+    # spatial hash over world hole centers; a query only visits the cells within its search radius
+    def __init__(self, cell_size=SNAP_DISTANCE):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def _cell(self, point):
+        return tuple(math.floor(v / self.cell_size) for v in point)
+
+    def insert(self, center, direction):
+        self.cells.setdefault(self._cell(center), []).append((center, direction))
+
+    def near(self, point, radius):
+        low = self._cell([v - radius for v in point])
+        high = self._cell([v + radius for v in point])
+        for i in range(low[0], high[0] + 1):
+            for j in range(low[1], high[1] + 1):
+                for k in range(low[2], high[2] + 1):
+                    yield from self.cells.get((i, j, k), ())
+
+
+def best_offset(holes, hole_hash):
+    # Every pair of parallel holes within reach proposes the offset that puts them on one axis (the along-axis part
+    # is dropped, so parts are never pushed into each other). The offset most candidate holes agree on wins, and
+    # among equals the smallest move
+    votes = {}
+    reach = math.hypot(SNAP_DISTANCE, AXIAL_SLACK)
+    for index, (center, direction) in enumerate(holes):
+        for other, other_direction in hole_hash.near(center, reach):
+            if abs(_dot(direction, other_direction)) < PARALLEL_COS:
+                continue
+            offset = [other[k] - center[k] for k in range(3)]
+            along = _dot(offset, direction)
+            if abs(along) > AXIAL_SLACK:
+                continue
+            offset = [offset[k] - along * direction[k] for k in range(3)]
+            if _dot(offset, offset) > SNAP_DISTANCE * SNAP_DISTANCE:
+                continue
+            key = tuple(round(v / ALIGN_TOLERANCE) for v in offset)
+            votes.setdefault(key, (offset, set()))[1].add(index)
+
+    if not votes:
+        return None, 0
+    offset, matched = max(votes.values(), key=lambda vote: (len(vote[1]), -_dot(vote[0], vote[0])))
+    return offset, len(matched)
+
+
+def snap_placements(parts_info, placed, candidates):
+    # candidates snap to the placed parts and to the candidates before them, in order, as the viewer would add them
+    hole_hash = HoleHash()
+    for part in placed:
+        info = parts_info(strip_glb(part["name"]))
+        for center, direction in world_holes((info or {}).get("hole_lattice") or [], part["rotation"], part["position"]):
+            hole_hash.insert(center, direction)
+
+    results = []
+    for part in candidates:
+        info = parts_info(strip_glb(part["name"])) or {}
+        rotation = snap_rotation(part["rotation"])
+        position = list(part["position"])
+        holes = world_holes(info.get("hole_lattice") or [], rotation, position)
+
+        offset, matched = best_offset(holes, hole_hash)
+        if offset:
+            position = [position[i] + offset[i] for i in range(3)]
+        for center, direction in holes:
+            hole_hash.insert([center[i] + (offset[i] if offset else 0.0) for i in range(3)], direction)
+
+        results.append(
+            {
+                "name": part["name"],
+                "position": [round(v, 3) for v in position],
+                "rotation": rotation,
+                "matched_holes": matched,
+                "moved": round(math.sqrt(_dot(offset, offset)), 3) if offset else 0.0,
+            }
+        )
+    return results
+
+
+def serve(port=SNAP_PORT, catalog_path=CATALOG_PATH):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    parts_info = catalog_parts_info(catalog_path)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/snap":
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            start = time.perf_counter()
+            results = snap_placements(parts_info, body.get("placed", []), body.get("candidates", []))
+            payload = json.dumps({"results": results, "ms": (time.perf_counter() - start) * 1000}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    print(f"Snap service listening on http://127.0.0.1:{port}/snap")
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Snap proposed part placements to hole alignments")
+    parser.add_argument("placements", nargs="?", help="JSON file with {placed, candidates} lists in the route's format")
+    parser.add_argument("--serve", action="store_true", help="run as a local HTTP service instead")
+    parser.add_argument("--port", type=int, default=SNAP_PORT)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port)
+    else:
+        with open(args.placements) as f:
+            body = json.load(f)
+        for result in snap_placements(catalog_parts_info(), body["placed"], body["candidates"]):
+            print(json.dumps(result))
@@ -0,0 +1,71 @@
+import math
+
+import numpy as np
+import pytest
+
+from assembly import decompose, instance_matrix, placement_matrix, quaternion
+from collision import euler_matrix
+
+
+def rotation_from_quaternion(q):
+    x, y, z, w = q
+    return np.array(
+        [
+            [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+            [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+            [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+        ]
+    )
+
+
+def recompose(translation, q, scale):
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation_from_quaternion(q) * scale
+    matrix[:3, 3] = translation
+    return matrix
+
+
+# includes half turns about each axis, which take the quaternion's non-trace branches
+ROTATIONS = [
+    (0, 0, 0),
+    (math.pi, 0, 0),
+    (0, math.pi, 0),
+    (0, 0, math.pi),
+    (0.3, -1.2, 2.9),
+    (math.pi, 0.5, -math.pi / 2),
+]
+
+
+@pytest.mark.parametrize("rotation", ROTATIONS)
+def test_quaternion_round_trip(rotation):
+    matrix = np.array(euler_matrix(rotation))
+    q = quaternion(matrix)
+    assert math.isclose(np.linalg.norm(q), 1.0)
+    assert np.allclose(rotation_from_quaternion(q), matrix)
+
+
+def test_random_quaternions_round_trip():
+    rng = np.random.default_rng(0)
+    for rotation in rng.uniform(-math.pi, math.pi, (200, 3)):
+        matrix = np.array(euler_matrix(rotation))
+        assert np.allclose(rotation_from_quaternion(quaternion(matrix)), matrix)
+
+
+@pytest.mark.parametrize("rotation", ROTATIONS)
+def test_length_scaled_instance_decomposes_to_trs(rotation):
+    # a length-series alias: the base stretched along its axis, then placed
+    instance = {"axis": 2, "scale": 2.5, "offset": -4.0}
+    matrix = placement_matrix((120.0, -48.0, 24.0), rotation) @ instance_matrix(instance)
+    translation, q, scale = decompose(matrix)
+    assert np.allclose(scale, [1.0, 1.0, 2.5])
+    assert np.allclose(recompose(translation, q, scale), matrix)
+
+
+def test_shear_and_reflection_are_rejected():
+    # stretching along an axis the rotation has tilted shears the result
+    stretch = instance_matrix({"axis": 0, "scale": 3.0, "offset": 0.0})
+    assert decompose(stretch @ placement_matrix((0, 0, 0), (0, 0, 0.5))) is None
+    mirror = np.diag([-1.0, 1.0, 1.0, 1.0])
+    assert decompose(mirror) is None
+    collapsed = np.diag([0.0, 1.0, 1.0, 1.0])
+    assert decompose(collapsed) is None
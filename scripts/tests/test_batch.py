@@ -0,0 +1,76 @@
+import os
+import time
+
+from batch import WorkerPool, load_quarantine, run_batch
+
+
+# tasks run in worker processes, so they live at module level and pickle by reference
+def convert(filepath):
+    with open(filepath + ".attempts", "a") as f:
+        f.write("attempt\n")
+    with open(filepath) as f:
+        behaviour = f.read()
+    if behaviour == "crash":
+        os._exit(3)
+    if behaviour == "hang":
+        time.sleep(60)
+    if behaviour == "raise":
+        raise ValueError("bad geometry")
+    return [filepath + ".json"]
+
+
+def step_file(tmp_path, name, behaviour):
+    path = tmp_path / name
+    path.write_text(behaviour)
+    return str(path)
+
+
+def attempts(filepath):
+    with open(filepath + ".attempts") as f:
+        return len(f.readlines())
+
+
+def drain(pool):
+    results = []
+    while pool.busy():
+        results += pool.poll(timeout=0.1)
+    pool.close()
+    return {os.path.basename(r["file"]): r for r in results}
+
+
+def test_crashes_and_hangs_are_retried_then_reported(tmp_path):
+    files = [step_file(tmp_path, f"{b}.step", b) for b in ("ok", "raise", "crash", "hang")]
+    pool = WorkerPool(workers=2, timeout=1.0, max_attempts=2)
+    for filepath in files:
+        pool.submit(convert, filepath)
+    results = drain(pool)
+
+    assert results["ok.step"]["ok"] and results["ok.step"]["outputs"] == [files[0] + ".json"]
+    # an exception is an ordinary failure: the worker survives and the file is not retried
+    assert not results["raise.step"]["ok"] and "ValueError: bad geometry" in results["raise.step"]["error"]
+    assert attempts(files[1]) == 1
+    assert results["crash.step"]["crashed"] and "crashed (exit code 3)" in results["crash.step"]["error"]
+    assert attempts(files[2]) == 2
+    assert results["hang.step"]["crashed"] and "timed out" in results["hang.step"]["error"]
+    assert attempts(files[3]) == 2
+
+
+def test_crashed_files_are_quarantined_until_they_change(tmp_path):
+    quarantine_path = str(tmp_path / "quarantine.json")
+    crash = step_file(tmp_path, "crash.step", "crash")
+    ok = step_file(tmp_path, "ok.step", "ok")
+    options = {"timeout": 5.0, "max_attempts": 1, "metrics_path": None, "quarantine_path": quarantine_path}
+
+    run_batch([crash, ok], convert, workers=2, **options)
+    assert list(load_quarantine(quarantine_path)) == [crash]
+
+    results = run_batch([crash, ok], convert, workers=2, **options)
+    assert attempts(crash) == 1  # skipped the second time
+    assert [r for r in results if r.get("quarantined")][0]["file"] == crash
+
+    # a fixed file gets another chance, and a success clears its entry
+    with open(crash, "w") as f:
+        f.write("fixed")
+    run_batch([crash], convert, workers=1, **options)
+    assert attempts(crash) == 2
+    assert load_quarantine(quarantine_path) == {}
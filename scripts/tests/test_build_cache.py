@@ -0,0 +1,85 @@
+import os
+
+from build_cache import plan_build, prune_removed, record_results
+
+PARAMS = {"linear_deflection": 0.1}
+
+
+def built(step_files, params=PARAMS):
+    # a manifest as it stands after converting every file successfully
+    manifest = {"parts": {}}
+    todo, sources = plan_build(step_files, manifest, params)
+    results = []
+    for filepath in todo:
+        output = filepath + ".json"
+        with open(output, "w") as f:
+            f.write("{}")
+        results.append({"file": filepath, "ok": True, "outputs": [output]})
+    record_results(manifest, sources, results)
+    return manifest
+
+
+def step_files(tmp_path, *names):
+    paths = []
+    for name in names:
+        path = tmp_path / name
+        path.write_text(f"ISO-10303-21; {name}")
+        paths.append(str(path))
+    return paths
+
+
+def test_unchanged_files_are_skipped(tmp_path):
+    files = step_files(tmp_path, "Plate.step", "Gear.step")
+    manifest = built(files)
+    todo, _ = plan_build(files, manifest, PARAMS)
+    assert todo == []
+    assert plan_build(files, manifest, PARAMS, force=True)[0] == files
+
+
+def test_changed_content_is_rebuilt(tmp_path):
+    files = step_files(tmp_path, "Plate.step", "Gear.step")
+    manifest = built(files)
+    with open(files[1], "a") as f:
+        f.write(" revised")
+    assert plan_build(files, manifest, PARAMS)[0] == [files[1]]
+
+
+def test_touched_but_identical_file_is_skipped(tmp_path):
+    files = step_files(tmp_path, "Plate.step")
+    manifest = built(files)
+    os.utime(files[0], ns=(0, 0))
+    todo, sources = plan_build(files, manifest, PARAMS)
+    # the size/mtime shortcut misses, so the file is hashed again, and the hash still matches
+    assert todo == []
+    assert sources[files[0]]["mtime_ns"] == 0
+
+
+def test_params_change_rebuilds_everything(tmp_path):
+    files = step_files(tmp_path, "Plate.step", "Gear.step")
+    manifest = built(files)
+    assert plan_build(files, manifest, {"linear_deflection": 0.05})[0] == files
+
+
+def test_missing_output_is_rebuilt(tmp_path):
+    files = step_files(tmp_path, "Plate.step", "Gear.step")
+    manifest = built(files)
+    os.remove(manifest["parts"]["Plate"]["outputs"][0])
+    assert plan_build(files, manifest, PARAMS)[0] == [files[0]]
+
+
+def test_failed_conversions_are_not_recorded(tmp_path):
+    files = step_files(tmp_path, "Plate.step")
+    manifest = {"parts": {}}
+    _, sources = plan_build(files, manifest, PARAMS)
+    record_results(manifest, sources, [{"file": files[0], "ok": False, "error": "boom"}])
+    assert manifest["parts"] == {}
+    assert plan_build(files, manifest, PARAMS)[0] == files
+
+
+def test_removed_files_are_pruned(tmp_path):
+    files = step_files(tmp_path, "Plate.step", "Gear.step")
+    manifest = built(files)
+    output = manifest["parts"]["Gear"]["outputs"][0]
+    assert prune_removed(files[:1], manifest) == ["Gear"]
+    assert list(manifest["parts"]) == ["Plate"]
+    assert not os.path.exists(output)
@@ -0,0 +1,76 @@
+import itertools
+import math
+import random
+
+import numpy as np
+import pytest
+
+from collision import CONTACT_TOLERANCE, CollisionIndex, euler_matrix, overlap_depth, rotated_aabb, transform_box
+
+
+def corners_aabb(obb, rotation, position):
+    # brute force: every corner of the OBB, rotated and moved, then the min/max over them
+    axes = np.array(obb["axes"])
+    corners = [
+        np.array(obb["center"]) + sum(sign * h * axis for sign, h, axis in zip(signs, obb["half_size"], axes))
+        for signs in itertools.product((-1, 1), repeat=3)
+    ]
+    world = np.array(corners) @ np.array(euler_matrix(rotation)).T + np.array(position)
+    return world.min(axis=0), world.max(axis=0)
+
+
+def tilted_obb():
+    c, s = math.cos(0.4), math.sin(0.4)
+    axes = [[c, s, 0.0], [-s, c, 0.0], [0.0, 0.0, 1.0]]
+    return {"center": [5.0, -3.0, 12.0], "axes": axes, "half_size": [30.0, 4.0, 2.5]}
+
+
+@pytest.mark.parametrize("rotation", [(0, 0, 0), (math.pi / 2, 0, 0), (0.3, -1.1, 2.0), (math.pi, math.pi / 4, 0.7)])
+def test_rotated_aabb_matches_the_rotated_corners(rotation):
+    obb = tilted_obb()
+    low, high = rotated_aabb(obb, rotation, (100.0, -20.0, 7.0))
+    expected_low, expected_high = corners_aabb(obb, rotation, (100.0, -20.0, 7.0))
+    assert np.allclose(low, expected_low) and np.allclose(high, expected_high)
+
+
+def test_rotated_aabb_with_identity_axes_is_transform_box():
+    obb = {"center": [1.0, 2.0, 3.0], "axes": [[1, 0, 0], [0, 1, 0], [0, 0, 1]], "half_size": [4.0, 5.0, 6.0]}
+    rotation, position = (0.2, 0.5, -0.9), (10.0, 0.0, -4.0)
+    a = rotated_aabb(obb, rotation, position)
+    b = transform_box(obb["center"], obb["half_size"], rotation, position)
+    assert np.allclose(a, b)
+
+
+def cube_parts(size=10.0):
+    info = {"bs": [size, size, size], "bc": [0.0, 0.0, 0.0]}
+    return lambda name: info if name == "Cube" else None
+
+
+def test_grid_query_matches_brute_force():
+    index = CollisionIndex(cube_parts())
+    rng = random.Random(3)
+    for key in range(200):
+        index.insert(key, "Cube", [rng.uniform(-300, 300) for _ in range(3)], (0, rng.uniform(0, 3), 0))
+    for _ in range(50):
+        position, rotation = [rng.uniform(-300, 300) for _ in range(3)], (rng.uniform(0, 3), 0, 0)
+        box = index.box_for("Cube", position, rotation)
+        expected = sorted(k for k, other in index.boxes.items() if overlap_depth(box, other) > CONTACT_TOLERANCE)
+        assert index.query("Cube", position, rotation) == expected
+
+
+def test_touching_parts_are_not_collisions():
+    index = CollisionIndex(cube_parts())
+    index.insert("a", "Cube", (0, 0, 0), (0, 0, 0))
+    assert index.query("Cube", (10.0, 0, 0), (0, 0, 0)) == []
+    assert index.query("Cube", (10.0 - 2 * CONTACT_TOLERANCE, 0, 0), (0, 0, 0)) == ["a"]
+
+
+def test_removed_parts_leave_the_grid():
+    index = CollisionIndex(cube_parts())
+    index.insert("a", "Cube", (0, 0, 0), (0, 0, 0))
+    index.insert("b", "Cube", (200, 0, 0), (0, 0, 0))
+    index.remove("a")
+    assert index.query("Cube", (0, 0, 0), (0, 0, 0)) == []
+    assert all("a" not in bucket for bucket in index.cells.values())
+    with pytest.raises(KeyError):
+        index.query("Missing", (0, 0, 0), (0, 0, 0))
@@ -0,0 +1,58 @@
+import os
+import json
+import time
+
+from content_store import GC_GRACE_SECONDS, collect_garbage, load_store_manifest, publish_store
+
+
+def write_part(tmp_path, glb_bytes):
+    (tmp_path / "serialized").mkdir(exist_ok=True)
+    (tmp_path / "glb").mkdir(exist_ok=True)
+    (tmp_path / "glb" / "Plate.glb").write_bytes(glb_bytes)
+    (tmp_path / "serialized" / "Plate.json").write_text(json.dumps({"lods": [{"file": "Plate.glb"}]}))
+
+
+def publish(tmp_path):
+    return publish_store(str(tmp_path / "serialized"), str(tmp_path / "glb"), str(tmp_path / "store"))
+
+
+def test_grace_period_starts_when_an_object_drops_out(tmp_path):
+    store = tmp_path / "store"
+    write_part(tmp_path, b"first build")
+    old = publish(tmp_path)["parts"]["Plate"]["lods"][0]
+    # published long ago and unchanged since, then rebuilt a minute ago
+    day_ago = time.time() - 2 * GC_GRACE_SECONDS
+    os.utime(store / old, (day_ago, day_ago))
+    write_part(tmp_path, b"second build")
+    new = publish(tmp_path)["parts"]["Plate"]["lods"][0]
+
+    assert collect_garbage(str(store)) == 0
+    assert (store / old).exists() and (store / new).exists()
+
+    manifest = load_store_manifest(str(store))
+    manifest["unreferenced"][old] = day_ago
+    (store / "manifest.json").write_text(json.dumps(manifest))
+    assert collect_garbage(str(store)) == 1
+    assert not (store / old).exists() and (store / new).exists()
+    assert old not in load_store_manifest(str(store))["unreferenced"]
+
+
+def test_object_referenced_again_loses_its_stamp(tmp_path):
+    write_part(tmp_path, b"first build")
+    old = publish(tmp_path)["parts"]["Plate"]["lods"][0]
+    write_part(tmp_path, b"second build")
+    assert old in publish(tmp_path)["unreferenced"]
+    write_part(tmp_path, b"first build")
+    assert old not in publish(tmp_path)["unreferenced"]
+
+
+def test_old_orphans_go_by_mtime(tmp_path):
+    store = tmp_path / "store"
+    write_part(tmp_path, b"build")
+    publish(tmp_path)
+    orphan = store / ("0" * 64 + ".glb")
+    orphan.write_bytes(b"left by an interrupted publish")
+    assert collect_garbage(str(store)) == 0
+    day_ago = time.time() - 2 * GC_GRACE_SECONDS
+    os.utime(orphan, (day_ago, day_ago))
+    assert collect_garbage(str(store)) == 1
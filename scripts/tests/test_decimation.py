@@ -0,0 +1,32 @@
+import pytest
+
+o3d = pytest.importorskip("open3d")
+decimation = pytest.importorskip("decimation")
+
+
+def fine_sphere():
+    mesh = o3d.geometry.TriangleMesh.create_sphere(radius=50.0, resolution=120)
+    mesh.compute_vertex_normals()
+    return mesh
+
+
+def test_same_surface_scores_no_error():
+    mesh = fine_sphere()
+    error = decimation.surface_error(mesh, mesh)
+    assert error["hausdorff"] < 1e-3
+
+
+def test_batched_candidates_are_scored_against_their_own_surface():
+    mesh = fine_sphere()
+    coarse = o3d.geometry.TriangleMesh.create_sphere(radius=50.0, resolution=4)
+    errors = decimation.surface_errors(mesh, [mesh, coarse, mesh])
+    assert errors[0]["hausdorff"] < 1e-3 and errors[2]["hausdorff"] < 1e-3
+    assert errors[1]["hausdorff"] > 1.0
+
+
+def test_lightly_decimated_mesh_is_accepted():
+    mesh = fine_sphere()
+    search = decimation.search_decimation(mesh, grid=[("quadric", 0.5)])
+    assert search["best"] is not None
+    assert search["best"]["triangles"] < len(mesh.triangles)
+    assert search["best"]["hausdorff"] <= search["tolerance"]
@@ -0,0 +1,69 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from dedup import instance_bases, prism_keys, stale_instances
+
+
+def extrusion(length, segments=24, radius=4.0, bore=1.5):
+    # a tube like a standoff: an annulus cross-section along z, with triangles only on its walls and end faces
+    ring = [(math.cos(2 * math.pi * i / segments), math.sin(2 * math.pi * i / segments)) for i in range(segments)]
+    vertices = []
+    for z in (0.0, length):
+        vertices += [(radius * x, radius * y, z) for x, y in ring]
+        vertices += [(bore * x, bore * y, z) for x, y in ring]
+
+    def outer(end, i):
+        return end * 2 * segments + i % segments
+
+    def inner(end, i):
+        return end * 2 * segments + segments + i % segments
+
+    triangles = []
+    for i in range(segments):
+        for end in (0, 1):
+            triangles += [(outer(end, i), outer(end, i + 1), inner(end, i))]
+            triangles += [(inner(end, i), outer(end, i + 1), inner(end, i + 1))]
+        triangles += [(outer(0, i), outer(0, i + 1), outer(1, i)), (outer(1, i), outer(0, i + 1), outer(1, i + 1))]
+        triangles += [(inner(0, i), inner(1, i), inner(0, i + 1)), (inner(1, i), inner(1, i + 1), inner(0, i + 1))]
+    return np.array(vertices), np.array(triangles)
+
+
+def test_lengths_of_one_series_share_a_prism_key():
+    short = {k["axis"]: k for k in prism_keys(*extrusion(3.0))}
+    long = {k["axis"]: k for k in prism_keys(*extrusion(18.0))}
+    assert short[2]["key"] == long[2]["key"]
+    assert long[2]["extent"] / short[2]["extent"] == pytest.approx(6.0)
+
+
+def test_different_cross_sections_do_not_match():
+    plain = {k["axis"]: k["key"] for k in prism_keys(*extrusion(10.0))}
+    wider = {k["axis"]: k["key"] for k in prism_keys(*extrusion(10.0, radius=5.0))}
+    assert plain[2] != wider[2]
+
+
+def test_cross_section_deflection_ignores_length():
+    serialize_and_reduce = pytest.importorskip("serialize_and_reduce")
+    short = serialize_and_reduce.deflection_for({"size": [8.0, 8.0, 3.0], "center": [0, 0, 0]}, axis=2)
+    long = serialize_and_reduce.deflection_for({"size": [8.0, 8.0, 18.0], "center": [0, 0, 0]}, axis=2)
+    assert short == long
+
+
+def test_stale_instances_checks_only_the_given_aliases(tmp_path):
+    def part(pid, geometry_hash, base=None):
+        data = {"pid": pid, "geometry_hash": geometry_hash}
+        if base:
+            data["instance"] = {"pid": base, "geometry": "old"}
+        (tmp_path / f"{pid}.json").write_text(json.dumps(data))
+
+    part("Standoff6", "new")
+    part("Standoff12", "b", base="Standoff6")
+    part("Spacer3", "new")
+    part("Spacer9", "c", base="Spacer3")
+
+    assert instance_bases(str(tmp_path)) == {"Standoff12": "Standoff6", "Spacer9": "Spacer3"}
+    assert stale_instances(str(tmp_path)) == ["Spacer9", "Standoff12"]
+    assert stale_instances(str(tmp_path), ["Standoff12", "Gone"]) == ["Standoff12"]
+    assert stale_instances(str(tmp_path), []) == []
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+o3d = pytest.importorskip("open3d")
+serialize_and_reduce = pytest.importorskip("serialize_and_reduce")
+
+
+def test_mid_size_part_gets_a_decimated_lod(tmp_path, monkeypatch):
+    # between the two LOD budgets: no decimation search, but the 1500-triangle level still needs a mesh
+    monkeypatch.chdir(tmp_path)
+    serialize_and_reduce.make_output_dirs()
+    sphere = o3d.geometry.TriangleMesh.create_sphere(radius=20.0, resolution=50)
+    vertices, faces = np.asarray(sphere.vertices), np.asarray(sphere.triangles)
+    assert serialize_and_reduce.LOD_TRIANGLE_BUDGETS[-1] < len(faces) < serialize_and_reduce.LOD_TRIANGLE_BUDGETS[0]
+
+    mesh = serialize_and_reduce.lod_source(vertices, faces, "sphere-hash")
+    assert mesh is not None
+    assert len(mesh.triangles) == len(faces)
+
+    glb_path = tmp_path / "glb" / "Sphere.glb"
+    glb_path.touch()
+    bbox_info = {"size": [40.0, 40.0, 40.0], "center": [0.0, 0.0, 0.0]}
+    lods = serialize_and_reduce.generate_lods(mesh, "Sphere", str(glb_path), bbox_info)
+    assert [lod["level"] for lod in lods] == [0, 1, 2]
+    assert lods[1]["triangles"] <= serialize_and_reduce.LOD_TRIANGLE_BUDGETS[-1]
+    assert lods[2]["proxy"]
+
+
+def test_small_part_needs_no_mesh():
+    vertices = np.zeros((3, 3))
+    faces = np.array([[0, 1, 2]] * 100)
+    assert serialize_and_reduce.lod_source(vertices, faces, "tiny") is None
@@ -0,0 +1,38 @@
+from normalize_names import match_vendor_name, part_attributes, plan_renames
+
+
+def test_length_families_parse_their_length():
+    assert part_attributes("Standoff12") == {"family": "Standoff", "length": 12}
+    assert part_attributes("Shaft100") == {"family": "Shaft", "length": 100}
+    assert part_attributes("AluminumSpacer2.5") == {"family": "AluminumSpacer", "length": 2.5}
+
+
+def test_model_number_is_not_a_length():
+    assert part_attributes("Motor5203") == {"family": "Motor5203"}
+    assert part_attributes("Servo2000") == {"family": "Servo2000"}
+
+
+def test_other_schemes_are_unchanged():
+    assert part_attributes("GridPlate3x5H") == {"family": "GridPlate", "grid": [3, 5]}
+    assert part_attributes("UChannel9H") == {"family": "UChannel", "holes": 9}
+    assert part_attributes("Spacer6ID8OD2") == {"family": "Spacer", "id": 6, "od": 8, "length": 2}
+    assert part_attributes("HubMountGear48T") == {"family": "HubMountGear", "teeth": 48}
+
+
+def test_vendor_standoff_names():
+    assert match_vendor_name("6ODx12Standoff.STEP") == ("Standoff12", {"family": "Standoff", "length": 12, "od": 6})
+    stem, attributes = match_vendor_name("6mmODx12mmStandoff.STEP")
+    assert stem == "Standoff12mm"
+    assert attributes == {"family": "Standoff", "length": 12, "od": 6}
+
+
+def test_conflicting_renames_are_indexed_under_their_current_name(tmp_path):
+    for name in ("6ODx12Standoff.STEP", "6mmODx12Standoff.STEP", "Standoff18.STEP", "6ODx18Standoff.STEP"):
+        (tmp_path / name).write_text("")
+    plan = plan_renames(str(tmp_path))
+
+    conflicts = {r["from"]: r["conflict"] for r in plan["renames"] if "conflict" in r}
+    assert set(conflicts) == {"6mmODx12Standoff.STEP", "6ODx18Standoff.STEP"}
+    assert plan["index"]["6ODx18Standoff"] == {"family": "Standoff", "length": 18, "od": 6}
+    assert plan["index"]["6mmODx12Standoff"] == {"family": "Standoff", "length": 12, "od": 6}
+    assert plan["index"]["Standoff12"] == {"family": "Standoff", "length": 12, "od": 6}
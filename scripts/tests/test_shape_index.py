@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+
+from shape_index import D2_BINS, ShapeIndex, update_shape_index
+
+
+def entry(extents, d2_peak=0, holes=0):
+    d2 = [0.0] * D2_BINS
+    d2[d2_peak] = 1.0
+    extents = sorted(extents, reverse=True)
+    return {"hash": "h", "d2": d2, "extents": extents, "ratios": [e / extents[0] for e in extents[1:]], "holes": holes}
+
+
+def library():
+    return ShapeIndex(
+        {
+            "parts": {
+                "Standoff12": entry([12, 6, 6], d2_peak=3),
+                "Standoff18": entry([18, 6, 6], d2_peak=3),
+                "Standoff24": entry([24, 6, 6], d2_peak=3),
+                "GridPlate3x5": entry([120, 72, 2.5], d2_peak=8, holes=15),
+                "GridPlate5x5": entry([120, 120, 2.5], d2_peak=8, holes=25),
+            }
+        }
+    )
+
+
+def test_similar_orders_nearest_first():
+    results = library().similar("Standoff18", k=3)
+    assert [pid for pid, _ in results][:2] in (["Standoff12", "Standoff24"], ["Standoff24", "Standoff12"])
+    distances = [d for _, d in results]
+    assert distances == sorted(distances)
+    assert "Standoff18" not in [pid for pid, _ in results]
+
+
+def test_similar_edge_cases():
+    index = library()
+    assert len(index.similar("GridPlate3x5", k=100)) == 4  # k past the part count returns every other part
+    assert index.similar("Missing") == []
+    assert index.similar("Standoff12", k=0) == []
+    single = ShapeIndex({"parts": {"Only": entry([1, 1, 1])}})
+    assert single.similar("Only") == []
+
+
+def test_fits_in_any_orientation_fullest_first():
+    index = library()
+    # the envelope's axes are given in any order; a 24mm standoff fits lying down
+    results = index.fits([7, 30, 7])
+    assert [pid for pid, _ in results] == ["Standoff24", "Standoff18", "Standoff12"]
+    assert index.fits([7, 30, 7], k=1) == results[:1]
+    assert [pid for pid, _ in index.fits([3, 125, 125])][:2] == ["GridPlate5x5", "GridPlate3x5"]
+    assert index.fits([1, 1, 1]) == []
+
+
+def test_empty_index():
+    index = ShapeIndex({"parts": {}})
+    assert index.similar("Anything") == []
+    assert index.fits([100, 100, 100]) == []
+    assert index.fits([100, 100, 100], k=5) == []
+
+
+def test_update_shape_index_by_pid(tmp_path):
+    serialized = tmp_path / "serialized"
+    serialized.mkdir()
+    path = str(tmp_path / "shape_index.json")
+    for pid, hull in (("Cube", [[0, 0, 0], [10, 10, 10]]), ("Bar", [[0, 0, 0], [50, 5, 5]])):
+        (serialized / f"{pid}.json").write_text(json.dumps({"pid": pid, "bs": [10, 10, 10], "hull": hull}))
+    index = update_shape_index(str(serialized), str(tmp_path), path)
+    assert sorted(index["parts"]) == ["Bar", "Cube"]
+
+    # only the named parts are looked at: an untouched entry is kept even though its JSON changed
+    (serialized / "Bar.json").write_text(json.dumps({"pid": "Bar", "bs": [60, 5, 5], "hull": [[0, 0, 0]]}))
+    (serialized / "Cube.json").unlink()
+    index = update_shape_index(str(serialized), str(tmp_path), path, pids={"Cube"})
+    assert list(index["parts"]) == ["Bar"]
+    assert np.isclose(index["parts"]["Bar"]["extents"][0], 10)
+    index = update_shape_index(str(serialized), str(tmp_path), path, pids={"Bar"})
+    assert np.isclose(index["parts"]["Bar"]["extents"][0], 60)
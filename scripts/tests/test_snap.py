@@ -0,0 +1,28 @@
+from snap import HOLE_PITCH, snap_placements
+
+
+def grid(rows, cols):
+    holes = [[c * HOLE_PITCH, r * HOLE_PITCH, 0.0, 2.0] for r in range(rows) for c in range(cols)]
+    return [{"direction": [0.0, 0.0, 1.0], "pitch": HOLE_PITCH, "holes": holes}]
+
+
+PARTS = {"Plate": {"hole_lattice": grid(10, 10)}, "Bracket": {"hole_lattice": grid(2, 2)}}
+
+
+def snap(position):
+    placed = [{"name": "Plate", "position": [0.0, 0.0, 0.0], "rotation": [0, 0, 0]}]
+    candidates = [{"name": "Bracket", "position": position, "rotation": [0, 0, 0]}]
+    return snap_placements(PARTS.get, placed, candidates)[0]
+
+
+def test_pose_near_a_cell_corner_snaps():
+    # 12.2mm from the nearest hole: farther than half the pitch, within half the cell diagonal
+    result = snap([2 * HOLE_PITCH + 10.0, 2 * HOLE_PITCH + 7.0, 3.0])
+    assert result["position"][:2] == [2 * HOLE_PITCH, 2 * HOLE_PITCH]
+    assert result["matched_holes"] == 4
+
+
+def test_aligned_pose_stays_put():
+    result = snap([HOLE_PITCH, HOLE_PITCH, 3.0])
+    assert result["moved"] == 0.0
+    assert result["matched_holes"] == 4
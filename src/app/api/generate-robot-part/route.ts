@@ -1,11 +1,16 @@
 import { generateObject } from "ai"
-import { groq } from "@ai-sdk/groq"
+import { createGroq } from "@ai-sdk/groq"
 import { z } from "zod"
 import { readFileSync } from "fs"
 import { join } from "path"
+import { loadCatalog, getCatalogPart, glbUrl, partNameSet, rotatedAabb } from "@/lib/catalog"
+import { condensePartList } from "@/lib/partList"
 
 const llmName = "meta-llama/llama-4-maverick-17b-128e-instruct"
 
+// Optional: point at scripts/llm_stub.py (http://127.0.0.1:8766/openai/v1) to replay recorded or stub responses offline
+const groq = createGroq({ baseURL: process.env.GROQ_BASE_URL })
+
 const StageOneSchema = z.object({
     name: z.string().describe("The name of the part to add from the available parts list"),
     reasoning: z.string().describe("Brief explanation of why this part was chosen and positioned here"),
@@ -18,9 +23,56 @@ const StageTwoSchema = z.object({
     reasoning: z.string().describe("Brief explanation of why this part was chosen and positioned here"),
 })
 
+// Optional: scripts/collision.py --serve; placements that overlap existing parts are dropped before the viewer sees them
+const collisionServiceUrl = process.env.COLLISION_SERVICE_URL
+
+async function rejectOverlappingParts(currentParts, candidates) {
+    if (!collisionServiceUrl) return candidates
+    try {
+        const response = await fetch(`${collisionServiceUrl}/check`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ placed: currentParts, candidates }),
+        })
+        const { results } = await response.json()
+        const accepted = candidates.filter((_, i) => results[i].ok)
+        console.log(`Rejected ${candidates.length - accepted.length} s2 components that overlap placed parts`)
+        return accepted
+    } catch (e) {
+        console.error("Collision service unavailable, skipping overlap check", e)
+        return candidates
+    }
+}
+
+// Optional: scripts/snap.py --serve; proposed poses are moved onto the nearest hole alignment with the placed parts
+const snapServiceUrl = process.env.SNAP_SERVICE_URL
+
+async function snapToHoles<T extends { position: number[]; rotation: number[] }>(currentParts, candidates: T[]): Promise<T[]> {
+    if (!snapServiceUrl) return candidates
+    try {
+        const response = await fetch(`${snapServiceUrl}/snap`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ placed: currentParts, candidates }),
+        })
+        const { results } = await response.json()
+        console.log(`Snapped ${results.filter(r => r.matched_holes > 0).length} s2 components to hole alignments`)
+        return candidates.map((part, i) => ({ ...part, position: results[i].position, rotation: results[i].rotation }))
+    } catch (e) {
+        console.error("Snap service unavailable, keeping proposed poses", e)
+        return candidates
+    }
+}
+
 export async function POST(request: Request) {
     try {
-        const { currentParts, uncondensedParts, condensedParts } = await request.json()
+        const { currentParts, uncondensedParts } = await request.json()
+
+        // both come precomputed with the catalog; without one, fall back to the listing the client sent
+        const catalog = loadCatalog()
+        const condensedParts = catalog?.condensed ?? condensePartList(uncondensedParts)
+        const validNames = catalog ? partNameSet(catalog) : new Set<string>(uncondensedParts)
+        const partCount = catalog?.count ?? uncondensedParts.length
 
         const currentPartsDescription =
             currentParts.length === 0 ? "No parts have been added yet" : currentParts.map(
@@ -33,7 +85,7 @@ CURRENT ROBOT STATE:
 ${currentPartsDescription}
 
 AVAILABLE PARTS:
-You have access to ${uncondensedParts.length} total robot parts from the following list:
+You have access to ${partCount} total robot parts from the following list:
 ${condensedParts.join("\n")}
 
 DESIGN GUIDELINES:
@@ -82,14 +134,22 @@ If inserting multiple parts of the same name, only output the name once and spec
         })
 
         // Filter out parts with invalid names
-        let filteredParts = stageOneResult.object.filter(part => uncondensedParts.includes(part.name))
+        const filteredParts = stageOneResult.object.filter(part => validNames.has(part.name))
         console.log(`Filtered out ${stageOneResult.object.length - filteredParts.length} s1 components with invalid names`)
 
         if (!filteredParts) return Response.json([])
-        
+
         const stageOneParts = await Promise.all(filteredParts.map(async part => {
             let bbSize: [number, number, number] = [-1, -1, -1]
             let bbCenter: [number, number, number] = [-1, -1, -1]
+            const catalogPart = catalog && getCatalogPart(catalog, part.name)
+            if (catalogPart) {
+                return {
+                    ...part,
+                    bbSize: catalogPart.bs,
+                    bbCenter: catalogPart.bc
+                }
+            }
             try {
                 const jsonDirectory = join(process.cwd(), "public", "serialized", `${part.name}.json`)
                 const data = JSON.parse(readFileSync(jsonDirectory, "utf8"))
@@ -174,12 +234,34 @@ Output example:
             prompt: stageTwoPrompt
         })
         // Filter out parts with invalid names
-        filteredParts = stageTwoResult.object.filter(part => uncondensedParts.includes(part.name))
-        console.log(`Filtered out ${stageTwoResult.object.length - filteredParts.length} s2 components with invalid names`)
+        const validStageTwo = stageTwoResult.object.filter(part => validNames.has(part.name))
+        console.log(`Filtered out ${stageTwoResult.object.length - validStageTwo.length} s2 components with invalid names`)
+
+        // snapped before the corners are computed, so they describe the final pose
+        const snappedParts = await snapToHoles(currentParts, validStageTwo)
 
-        const stageTwoParts = stageTwoResult.object.map(part => {
+        const stageTwoParts = snappedParts.map(part => {
             const mPart = stageOneParts.find(p => p.name == part.name)
 
+            // the OBB accounts for the part's rotation; bbSize/bbCenter only describe the unrotated part
+            const catalogPart = catalog && getCatalogPart(catalog, part.name)
+            // the viewer loads an instance's base GLB and applies its axis scale
+            const instance = catalogPart?.instance ?? undefined
+            // content-addressed when the part is in the store, so the browser can keep it across library rebuilds
+            const url = catalogPart ? glbUrl(catalogPart) : undefined
+            const obb = catalogPart?.obb
+            if (obb) {
+                const [minCorner, maxCorner] = rotatedAabb(obb, part.rotation, part.position)
+                return {
+                    ...mPart,
+                    ...part,
+                    instance,
+                    glbUrl: url,
+                    minCorner: minCorner.map(v => v.toPrecision(2)),
+                    maxCorner: maxCorner.map(v => v.toPrecision(2))
+                }
+            }
+
             const minCorner = mPart? [
                 part.position[0] + mPart.bbCenter[0] - mPart.bbSize[0] / 2,
                 part.position[1] + mPart.bbCenter[1] - mPart.bbSize[1] / 2,
@@ -195,12 +277,14 @@ Output example:
             return {
                 ...mPart,
                 ...part,
+                instance,
+                glbUrl: url,
                 minCorner,
                 maxCorner
             }
         })
 
-        return Response.json(stageTwoParts)
+        return Response.json(await rejectOverlappingParts(currentParts, stageTwoParts))
     } catch (error) {
         console.error("Error generating robot part:", error)
         return Response.json({ error: "Failed to generate robot part" }, { status: 500 })
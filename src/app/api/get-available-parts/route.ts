@@ -1,8 +1,12 @@
 import { readdir } from "fs/promises"
 import { join } from "path"
+import { loadCatalog } from "@/lib/catalog"
 
 export async function GET() {
     try {
+        const catalog = loadCatalog()
+        if (catalog) return Response.json(catalog.columns.pid.map(pid => `${pid}.glb`))
+
         const glbDirectory = join(process.cwd(), "public", "glb")
         const files = await readdir(glbDirectory)
 
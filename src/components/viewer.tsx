@@ -10,9 +10,12 @@ import {
     EdgesGeometry,
     LineBasicMaterial,
     LineSegments,
+    BufferAttribute,
     BufferGeometry,
-    Group
+    Group,
+    Matrix4
 } from "three"
+import type { PartInstance } from "@/lib/catalog"
 import { useMemo } from "react"
 import { mergeGeometries } from "three/examples/jsm/utils/BufferGeometryUtils"
 
@@ -25,6 +28,37 @@ export interface RobotPart {
     rotation: [number, number, number]
     minCorner: [number, number, number]
     maxCorner: [number, number, number]
+    instance?: PartInstance
+    glbUrl?: string
+}
+
+// an instance's base GLB, stretched along the instance axis for length-series parts
+function instanceMatrix(instance?: PartInstance) {
+    const matrix = new Matrix4()
+    if (!instance || instance.axis === null) return matrix
+    const scale = [1, 1, 1]
+    const offset = [0, 0, 0]
+    scale[instance.axis] = instance.scale
+    offset[instance.axis] = instance.offset
+    return matrix.makeScale(scale[0], scale[1], scale[2]).setPosition(offset[0], offset[1], offset[2])
+}
+
+// pipeline GLBs store quantized (integer) positions and normals; applyMatrix4 would write
+// transformed floats back into those integer arrays, so the edge geometry is converted first
+function toFloatGeometry(geometry: BufferGeometry) {
+    for (const name of Object.keys(geometry.attributes)) {
+        const attribute = geometry.getAttribute(name)
+        if (attribute.array instanceof Float32Array && !("isInterleavedBufferAttribute" in attribute)) continue
+        const array = new Float32Array(attribute.count * attribute.itemSize)
+        const getters = [attribute.getX, attribute.getY, attribute.getZ, attribute.getW]
+        for (let i = 0; i < attribute.count; i++) {
+            for (let k = 0; k < attribute.itemSize; k++) {
+                array[i * attribute.itemSize + k] = getters[k].call(attribute, i)
+            }
+        }
+        geometry.setAttribute(name, new BufferAttribute(array, attribute.itemSize))
+    }
+    return geometry
 }
 
 interface RobotPartProps {
@@ -32,21 +66,25 @@ interface RobotPartProps {
 }
 
 function RobotPartComponent({ part }: RobotPartProps) {
-    const { scene } = useGLTF(`/glb/${part.name}`)
+    const { scene } = useGLTF(part.glbUrl ?? `/glb/${part.instance ? `${part.instance.pid}.glb` : part.name}`)
     const merged = useMemo(() => {
         const geometries: BufferGeometry[] = []
         const group = new Group()
+        const transform = instanceMatrix(part.instance)
 
+        // meshes sit under dequantization nodes, so take their transform relative to the scene root
+        scene.updateMatrixWorld(true)
         scene.traverse((child: any) => {
             if (child.isMesh) {
                 child.material = new MeshStandardMaterial({ color: part.name.includes("Wheel") ? 0x000000 : 0x708090 })
-                child.updateMatrix()
-                const geom = child.geometry.clone()
-                geom.applyMatrix4(child.matrix)
+                const geom = toFloatGeometry(child.geometry.clone())
+                geom.applyMatrix4(child.matrixWorld).applyMatrix4(transform)
                 geometries.push(geom)
             }
         })
-        group.add(scene.clone())
+        const model = scene.clone()
+        model.applyMatrix4(transform)
+        group.add(model)
 
         if (!part.name.includes("Wheel")) {
             const mergedGeometry = mergeGeometries(geometries, false)
@@ -0,0 +1,167 @@
+import { readFileSync, statSync } from "fs"
+import { join } from "path"
+
+export interface CatalogLod {
+    level: number
+    file: string
+    triangles: number
+    proxy?: boolean
+}
+
+export interface OrientedBox {
+    center: [number, number, number]
+    axes: [number, number, number][]
+    half_size: [number, number, number]
+}
+
+// Parts whose geometry matches another part's reuse its GLBs. axis is null for an exact duplicate; otherwise the base
+// is stretched along that axis (x' = offset + scale * x), for length series that share a cross-section
+export interface PartInstance {
+    pid: string
+    geometry: string
+    axis: 0 | 1 | 2 | null
+    scale: number
+    offset: number
+}
+
+// Parsed from the normalized part name by scripts/normalize_names.py; only the fields the name encodes are present
+export interface PartAttributes {
+    family: string
+    holes?: number
+    grid?: [number, number]
+    id?: number
+    od?: number
+    length?: number
+    teeth?: number
+}
+
+// Holes sharing one axis direction, as [x, y, z, radius] in the part's frame; pitch is their usual spacing in mm
+export interface HoleGroup {
+    direction: [number, number, number]
+    pitch: number | null
+    holes: [number, number, number, number][]
+}
+
+// Content-addressed names under /store of the part's metadata and LOD GLBs; they never change, so they are cached forever
+export interface StoredPart {
+    json: string
+    lods: string[]
+}
+
+export interface CatalogPart {
+    pid: string
+    bs: [number, number, number]
+    bc: [number, number, number]
+    glb_bytes: number
+    triangles: number
+    lods: CatalogLod[]
+    obb: OrientedBox | null
+    instance: PartInstance | null
+    attributes: PartAttributes | null
+    hole_lattice: HoleGroup[] | null
+    store: StoredPart | null
+}
+
+interface CatalogFile {
+    version: string
+    count: number
+    columns: { [K in keyof CatalogPart]: CatalogPart[K][] }
+    // the prompt's part listing, condensed by scripts/part_list.py when the catalog is built
+    condensed?: string[]
+    index: Record<string, number>
+}
+
+const catalogPath = join(process.cwd(), "public", "catalog.json")
+
+let cached: CatalogFile | null = null
+let cachedMtime = 0
+
+// Parsed once per server process and re-read only when the pipeline rewrites the file
+export function loadCatalog(): CatalogFile | null {
+    try {
+        const mtime = statSync(catalogPath).mtimeMs
+        if (!cached || mtime !== cachedMtime) {
+            cached = JSON.parse(readFileSync(catalogPath, "utf8"))
+            cachedMtime = mtime
+        }
+        return cached
+    } catch {
+        return null
+    }
+}
+
+const partNameSets = new WeakMap<CatalogFile, Set<string>>()
+
+// Built once per catalog load, for O(1) validation of the names the model returns
+export function partNameSet(catalog: CatalogFile): Set<string> {
+    let names = partNameSets.get(catalog)
+    if (!names) {
+        names = new Set(catalog.columns.pid)
+        partNameSets.set(catalog, names)
+    }
+    return names
+}
+
+export function getCatalogPart(catalog: CatalogFile, pid: string): CatalogPart | null {
+    const row = catalog.index[pid]
+    if (row === undefined) return null
+
+    const { columns } = catalog
+    return {
+        pid,
+        bs: columns.bs[row],
+        bc: columns.bc[row],
+        glb_bytes: columns.glb_bytes[row],
+        triangles: columns.triangles[row],
+        lods: columns.lods[row],
+        obb: columns.obb[row],
+        instance: columns.instance?.[row] ?? null,
+        attributes: columns.attributes?.[row] ?? null,
+        hole_lattice: columns.hole_lattice?.[row] ?? null,
+        store: columns.store?.[row] ?? null,
+    }
+}
+
+// Most detailed LOD within the triangle budget, falling back to the cheapest level
+export function pickLod(part: CatalogPart, triangleBudget: number): CatalogLod | null {
+    if (part.lods.length === 0) return null
+    return part.lods.find(lod => lod.triangles <= triangleBudget) ?? part.lods[part.lods.length - 1]
+}
+
+// The stored, immutable GLB when the part has been published to the store, else its mutable /glb path
+export function glbUrl(part: CatalogPart, level = 0): string {
+    const stored = part.store?.lods[level]
+    if (stored) return `/store/${stored}`
+    return `/glb/${part.lods[level]?.file ?? `${part.pid}.glb`}`
+}
+
+// three.js default "XYZ" Euler order, matching how the viewer applies part.rotation
+function eulerMatrix([x, y, z]: number[]): number[][] {
+    const a = Math.cos(x), b = Math.sin(x)
+    const c = Math.cos(y), d = Math.sin(y)
+    const e = Math.cos(z), f = Math.sin(z)
+    return [
+        [c * e, -c * f, d],
+        [a * f + b * e * d, a * e - b * f * d, -b * c],
+        [b * f - a * e * d, b * e + a * f * d, a * c],
+    ]
+}
+
+// World-space AABB of a posed part from its precomputed OBB; no mesh access needed
+export function rotatedAabb(obb: OrientedBox, rotation: number[], position: number[]): [number[], number[]] {
+    const rot = eulerMatrix(rotation)
+    const minCorner: number[] = []
+    const maxCorner: number[] = []
+    for (let i = 0; i < 3; i++) {
+        let center = position[i]
+        let half = 0
+        for (let j = 0; j < 3; j++) {
+            center += rot[i][j] * obb.center[j]
+            const axis = rot[i][0] * obb.axes[j][0] + rot[i][1] * obb.axes[j][1] + rot[i][2] * obb.axes[j][2]
+            half += Math.abs(axis) * obb.half_size[j]
+        }
+        minCorner.push(center - half)
+        maxCorner.push(center + half)
+    }
+    return [minCorner, maxCorner]
+}
@@ -0,0 +1,148 @@
+// Fallback for when no catalog has been built; scripts/part_list.py produces the same listing into catalog.json
+export function condensePartList(parts: string[]): string[] {
+    function tokenize(part) {
+        return part.match(/(\d+|\D+)/g);
+    }
+
+    // Condense numbers into ranges (step 1, 2, or 4 with len >= 3)
+    function condenseNumbers(nums: number[]) {
+        nums = Array.from(new Set(nums)).sort((a, b) => a - b);
+
+        const result = [];
+        let i = 0;
+
+        while (i < nums.length) {
+            let start = nums[i];
+            let j = i + 1;
+            let step = null;
+
+            while (j < nums.length) {
+                const diff = nums[j] - nums[j - 1];
+                if (step === null) step = diff;
+                if (diff !== step) break;
+                j++;
+            }
+
+            const count = j - i;
+
+            if ((step <= 4) && count >= 3) {
+                result.push(`${start}-${nums[j - 1]}${step === 1 ? '' : `x${step}`}`);
+            } else {
+                for (let k = i; k < j; k++) {
+                    result.push(nums[k].toString());
+                }
+            }
+
+            i = j;
+        }
+
+        return result;
+    }
+
+    // Group parts by prefix (before first number)
+    function groupByPrefix(parts) {
+        const groups = {};
+
+        for (const part of parts) {
+            const tokens = tokenize(part);
+            let prefix = '';
+            for (const t of tokens) {
+                if (/\d/.test(t)) break;
+                prefix += t;
+            }
+
+            if (!groups[prefix]) groups[prefix] = [];
+            groups[prefix].push(part);
+        }
+
+        return groups;
+    }
+
+    // Cartesian product
+    function cartesian(arrays) {
+        return arrays.reduce((acc, curr) => {
+            const res = [];
+            acc.forEach(a => {
+                curr.forEach(b => {
+                    res.push(a.concat([b]));
+                });
+            });
+            return res;
+        }, [[]]);
+    }
+
+    function condenseGroup(parts) {
+        if (parts.length <= 1) return parts;
+
+        const first = parts[0];
+        const prefixMatch = first.match(/^[^\d]+/);
+        const prefix = prefixMatch ? prefixMatch[0] : '';
+
+        // Get suffixes by stripping the shared prefix
+        const suffixes = parts.map(p => p.slice(prefix.length));
+
+        // If ANY suffix contains an "x", skip numeric condensing
+        if (suffixes.some(s => s.includes('x'))) {
+            const sorted = suffixes.sort((a, b) => a.localeCompare(b, undefined, { numeric: true }));
+            return [prefix + sorted.join(',')];
+        }
+
+        // Tokenize suffixes
+        const tokenized = suffixes.map(s => s.match(/(\d+|\D+)/g));
+        const tokenCount = tokenized[0].length;
+        const isNumberToken = [];
+
+        for (let i = 0; i < tokenCount; i++) {
+            isNumberToken.push(tokenized.every(tokens => /^\d+$/.test(tokens[i])));
+        }
+
+        const staticTokens = [];
+        const numbersAtIndex = [];
+
+        for (let i = 0; i < tokenCount; i++) {
+            if (isNumberToken[i]) {
+                const nums = tokenized.map(tokens => parseInt(tokens[i], 10));
+                numbersAtIndex[i] = condenseNumbers(nums);
+                staticTokens[i] = null;
+            } else {
+                staticTokens[i] = tokenized[0][i];
+                numbersAtIndex[i] = null;
+            }
+        }
+
+        const arraysForCartesian = staticTokens.map((tok, i) =>
+            tok !== null ? [tok] : numbersAtIndex[i]
+        );
+
+        const combos = cartesian(arraysForCartesian);
+        const condensedParts = combos.map(tokens => prefix + tokens.join(''));
+
+        const sharedPrefix = findLongestSharedPrefix(condensedParts);
+        const shortened = condensedParts.map(p => p.slice(sharedPrefix.length));
+
+        return [sharedPrefix + ":" + shortened.join(',')];
+    }
+
+    // Find longest shared string prefix in array
+    function findLongestSharedPrefix(strings) {
+        if (strings.length === 0) return '';
+        let prefix = strings[0];
+        for (let i = 1; i < strings.length; i++) {
+            while (!strings[i].startsWith(prefix)) {
+                prefix = prefix.slice(0, -1);
+                if (prefix === '') return '';
+            }
+        }
+        return prefix;
+    }
+
+    const groups = groupByPrefix(parts);
+    const outputLines = [];
+
+    for (const groupParts of Object.values(groups)) {
+        const condensed = condenseGroup(groupParts);
+        outputLines.push(condensed.join(' '));
+    }
+
+    return outputLines;
+}